@@ -0,0 +1,101 @@
+"""Tool-call throughput of the MCP transports: stdio subprocesses vs streamable HTTP.
+
+Run from the repository root:
+
+    python benchmarks/bench_mcp_transport.py [--concurrency 1 8 32] [--calls 500] [--sessions 2]
+
+Serves the example tools (`mcp_bridge_example.py`) once as stdio servers,
+one subprocess per pooled session as `mcp_bridge.py` spawns them, and once
+as a single `--mcp-http` server that every session connects to over a
+keep-alive connection. The same `MCPSessionPool` then makes `--calls`
+calls of a trivial tool with `--concurrency` in flight, so the numbers are
+transport overhead, not tool work.
+"""
+import argparse
+import asyncio
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from mcp import StdioServerParameters  # noqa: E402
+
+from bridge_mcp_pool import MCPSessionPool  # noqa: E402
+
+EXAMPLE = str(ROOT / "mcp_bridge_example.py")
+TOOL = "get_elf_name"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+async def throughput(pool: MCPSessionPool, calls: int, concurrency: int) -> float:
+    gate = asyncio.Semaphore(concurrency)
+
+    async def one() -> None:
+        async with gate:
+            result = await pool.call_tool(TOOL, {})
+            assert not result.isError, result
+
+    await one()  # warm-up
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    return calls / (time.perf_counter() - started)
+
+
+async def measure(server_params, args) -> list[float]:
+    pool = MCPSessionPool(server_params, size=args.sessions, max_concurrency=max(args.concurrency))
+    await pool.start()
+    await asyncio.gather(*(s.ready.wait() for s in pool.sessions))
+    try:
+        return [await throughput(pool, args.calls, c) for c in args.concurrency]
+    finally:
+        await pool.close()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--sessions", type=int, default=2)
+    args = parser.parse_args()
+
+    stdio = await measure(StdioServerParameters(command=sys.executable, args=[EXAMPLE, "--mcp-server"]), args)
+
+    port = free_port()
+    server = subprocess.Popen([sys.executable, EXAMPLE, "--mcp-http", str(port)], stderr=subprocess.DEVNULL)
+    try:
+        await wait_for_port(port)
+        http = await measure(f"http://127.0.0.1:{port}/mcp", args)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{args.calls} calls of '{TOOL}'; {args.sessions} pooled sessions")
+    print(f"{'in flight':>10} {'stdio (calls/s)':>16} {'http (calls/s)':>15} {'http/stdio':>11}")
+    for concurrency, a, b in zip(args.concurrency, stdio, http):
+        print(f"{concurrency:>10} {a:>16.1f} {b:>15.1f} {b / a:>10.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
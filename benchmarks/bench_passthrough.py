@@ -0,0 +1,65 @@
+"""Cost of handling the final llamafile response: re-encode vs pass-through.
+
+Run from the repository root:
+
+    python benchmarks/bench_passthrough.py [--tokens 256 1024 4096] [--iterations 2000]
+
+For a completion of each size, compares what the Flask bridge used to do
+(`requests`' `response.json()` then `jsonify`) with what it does now
+(`bridge_json.loads` on the bytes, which are then forwarded as they are).
+`bridge_json` uses orjson when it is installed.
+"""
+import argparse
+import json
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from flask import Flask  # noqa: E402
+
+import bridge_json  # noqa: E402
+
+WORDS = "the elves gathered under the mallorn trees as dusk settled over the wood".split()
+
+
+def upstream_body(tokens: int) -> bytes:
+    """A llamafile chat completion whose answer is about `tokens` tokens long."""
+    content = " ".join(WORDS[i % len(WORDS)] for i in range(tokens))
+    return json.dumps({
+        "id": "chatcmpl-1", "object": "chat.completion", "created": 0, "model": "local-model",
+        "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 512, "completion_tokens": tokens, "total_tokens": 512 + tokens},
+    }).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tokens", type=int, nargs="+", default=[256, 1024, 4096])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    print(f"JSON library: {'orjson' if bridge_json.orjson is not None else 'json'}")
+    print(f"{'tokens':>8} {'bytes':>8} {'re-encode (us)':>16} {'pass-through (us)':>18} {'speedup':>8}")
+    with app.app_context():
+        for tokens in args.tokens:
+            body = upstream_body(tokens)
+
+            def reencode():
+                # requests' Response.json() decodes the bytes, then Flask serializes again
+                return app.json.response(json.loads(body.decode("utf-8"))).get_data()
+
+            def passthrough():
+                bridge_json.loads(body)
+                return app.response_class(body, mimetype=bridge_json.CONTENT_TYPE).get_data()
+
+            timings = [min(timeit.repeat(fn, number=args.iterations, repeat=5)) / args.iterations * 1e6
+                       for fn in (reencode, passthrough)]
+            print(f"{tokens:>8} {len(body):>8} {timings[0]:>16.1f} {timings[1]:>18.1f} "
+                  f"{timings[0] / timings[1]:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Micro-benchmark and fuzz check: tool_call_parser vs the old regex parser.
+
+Run from the repository root:
+
+    python benchmarks/bench_tool_call_parser.py [--iterations 20000] [--fuzz 2000]
+
+Correctness is measured on the hand-written corpus in
+`tool_call_corpus.jsonl` and on randomly generated calls (seeded) whose
+expected arguments are known. Random truncations and mutations of those
+calls check that the parser never raises, and chunked feeding checks that
+the streaming parser returns the same calls as the one-shot parser.
+"""
+import argparse
+import json
+import random
+import re
+import string
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tool_call_parser import ToolCallStreamParser, parse_tool_call, parse_tool_calls  # noqa: E402
+
+CORPUS = Path(__file__).with_name("tool_call_corpus.jsonl")
+
+
+def legacy_extract(text):
+    """The regex parser previously used by mcp_bridge_flask.extract_tool_call."""
+    match = re.search(r'TOOL_CALL:\s*(\w+)\((.*?)\)', text, re.IGNORECASE | re.MULTILINE)
+    if not match:
+        return None
+    arguments = {}
+    args_str = match.group(2).strip()
+    if args_str:
+        for arg_pair in args_str.split(','):
+            if '=' in arg_pair:
+                key, value = arg_pair.split('=', 1)
+                key = key.strip()
+                value = value.strip()
+                try:
+                    value = int(value)
+                except ValueError:
+                    value = value.strip('"\'')
+                arguments[key] = value
+    return match.group(1), arguments
+
+
+def new_extract(text):
+    call = parse_tool_call(text)
+    return (call.name, call.arguments) if call else None
+
+
+def load_corpus():
+    cases = []
+    with open(CORPUS, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                case = json.loads(line)
+                expected = (case["name"], case["arguments"]) if case["name"] else None
+                cases.append((case["text"], expected))
+    return cases
+
+
+def _random_value(rng):
+    kind = rng.randrange(6)
+    if kind == 0:
+        return rng.randint(-1000, 1000)
+    if kind == 1:
+        return rng.choice([True, False])
+    if kind == 2:
+        return round(rng.uniform(-10, 10), 3)
+    alphabet = string.ascii_letters + " ,()'=-:."
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 24)))
+
+
+def _format_value(value):
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str):
+        return "'" + value.replace("\\", "\\\\").replace("'", "\\'") + "'"
+    return repr(value)
+
+
+def random_case(rng):
+    name = rng.choice(["get_elf_name", "get_location_description", "get_random_event", "plan_story"])
+    arguments = {f"arg{i}": _random_value(rng) for i in range(rng.randint(0, 4))}
+    if arguments and rng.random() < 0.2:
+        call = f"{name}({json.dumps(arguments)})"
+    else:
+        call = f"{name}(" + ", ".join(f"{k}={_format_value(v)}" for k, v in arguments.items()) + ")"
+    prefix = rng.choice(["", "Sure.\n", "Let me look that up. ", "Thinking...\n\n"])
+    suffix = rng.choice(["", "\n", "\nI'll wait for the result."])
+    return f"{prefix}TOOL_CALL: {call}{suffix}", (name, arguments)
+
+
+def accuracy(parser, cases):
+    return sum(1 for text, expected in cases if parser(text) == expected) / len(cases)
+
+
+def check_robustness(rng, cases, rounds):
+    """Truncated and mutated inputs must never raise."""
+    for _ in range(rounds):
+        text, _ = rng.choice(cases)
+        if rng.random() < 0.5:
+            text = text[:rng.randrange(len(text) + 1)]
+        else:
+            chars = list(text)
+            for _ in range(rng.randint(1, 4)):
+                chars.insert(rng.randrange(len(chars) + 1), rng.choice("()[]{},='\"\\:\n"))
+            text = "".join(chars)
+        parse_tool_calls(text)
+
+
+def check_streaming(rng, cases):
+    for text, _ in cases:
+        parser = ToolCallStreamParser()
+        calls = []
+        i = 0
+        while i < len(text):
+            size = rng.randint(1, 8)
+            calls.extend(parser.feed(text[i:i + size]))
+            i += size
+        calls.extend(parser.close())
+        if calls != parse_tool_calls(text):
+            raise AssertionError(f"streaming mismatch for {text!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--fuzz", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = load_corpus()
+    generated = [random_case(rng) for _ in range(args.fuzz)]
+
+    print(f"{'':24} {'regex':>10} {'tokenizer':>10}")
+    for label, cases in (("corpus accuracy", corpus), ("generated accuracy", generated)):
+        print(f"{label:24} {accuracy(legacy_extract, cases):>10.1%} {accuracy(new_extract, cases):>10.1%}")
+
+    check_robustness(rng, corpus + generated, args.fuzz)
+    check_streaming(rng, corpus + generated[:200])
+    print("robustness and streaming checks passed")
+
+    filler = "The elves gathered under the mallorn trees as dusk settled over the wood. " * 20
+    inputs = {
+        "short call": "TOOL_CALL: get_elf_name(count=1)",
+        "call with text": "Sure, let me find a name.\nTOOL_CALL: get_location_description(style='detailed')\n",
+        "final answer (no call)": filler,
+    }
+    print(f"\n{'per parse (us)':24} {'regex':>10} {'tokenizer':>10}")
+    for label, text in inputs.items():
+        timings = []
+        for fn in (legacy_extract, new_extract):
+            seconds = min(timeit.repeat(lambda: fn(text), number=args.iterations, repeat=5))
+            timings.append(seconds / args.iterations * 1e6)
+        print(f"{label:24} {timings[0]:>10.2f} {timings[1]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Average tool-loop iterations per request with and without the tool grammar.
+
+Start llamafile and the example bridge first (`python mcp_bridge_example.py`),
+then run from the repository root:
+
+    python benchmarks/bench_tool_grammar.py [--url http://127.0.0.1:8081] [--requests 20]
+
+Each prompt is sent `--requests` times with `X-Tool-Grammar: 0` and with
+`X-Tool-Grammar: 1`; the bridge reports the llamafile calls it needed in
+the `X-Tool-Iterations` response header.
+"""
+import argparse
+import statistics
+import time
+
+import requests
+
+PROMPTS = [
+    "Generate an elf name and a detailed location, then write two sentences about them.",
+    "Call get_elf_name(count=2) and introduce both elves in one sentence.",
+    "Pick a random event and tell a three-sentence story about an elf in a brief location.",
+    "Write a short story about an elf. Use the tools for the name and the event.",
+]
+
+
+def run(url: str, grammar: bool, repeats: int, max_tokens: int) -> dict:
+    iterations, latencies, failures = [], [], 0
+    for _ in range(repeats):
+        for prompt in PROMPTS:
+            started = time.perf_counter()
+            response = requests.post(
+                f"{url}/v1/chat/completions",
+                json={"messages": [{"role": "user", "content": prompt}], "max_tokens": max_tokens},
+                # Bypass the response cache and coalescing so every request runs the loop
+                headers={"X-Tool-Grammar": "1" if grammar else "0", "X-Cache-Bypass": "1",
+                         "Cache-Control": "no-store", "X-Coalesce": "0"},
+                timeout=600,
+            )
+            latencies.append(time.perf_counter() - started)
+            if response.status_code != 200:
+                failures += 1
+            iterations.append(int(response.headers.get("X-Tool-Iterations", 0)))
+    return {
+        "requests": len(iterations),
+        "failures": failures,
+        "mean_iterations": statistics.mean(iterations),
+        "max_iterations": max(iterations),
+        "mean_latency_s": statistics.mean(latencies),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8081")
+    parser.add_argument("--requests", type=int, default=5, help="repetitions of each prompt")
+    parser.add_argument("--max-tokens", type=int, default=300)
+    args = parser.parse_args()
+
+    print(f"{'grammar':8} {'requests':>8} {'failures':>8} {'mean iter':>10} {'max iter':>9} {'mean s':>8}")
+    for grammar in (False, True):
+        r = run(args.url, grammar, args.requests, args.max_tokens)
+        print(f"{'on' if grammar else 'off':8} {r['requests']:>8} {r['failures']:>8} "
+              f"{r['mean_iterations']:>10.2f} {r['max_iterations']:>9} {r['mean_latency_s']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Concurrent tool-call throughput of mcp_server: inline vs thread offload.
+
+Run from the repository root:
+
+    python benchmarks/bench_tool_offload.py [--concurrency 1 4 16 32] [--calls 64] [--block-ms 20]
+
+Serves a tool whose sync handler blocks for `--block-ms` (a stand-in for a
+file lookup or a RAG search) through `create_mcp_server`, over the in-memory
+MCP transport so no subprocess or pipe is measured. `--calls` calls are made
+with `--concurrency` in flight, once with the handler running inline on the
+event loop (how `_call_tool` used to call sync handlers) and once on the
+server's worker threads. The last column checks 'max_concurrency': the same
+tool limited to 4 calls at a time.
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mcp.shared.memory import create_connected_server_and_client_session  # noqa: E402
+from mcp.types import Tool  # noqa: E402
+
+from mcp_server import EXECUTOR_INLINE, create_mcp_server  # noqa: E402
+
+LIMIT = 4
+
+
+def blocking_tools(block_seconds: float, **options) -> dict:
+    def lookup(arguments: dict) -> str:
+        time.sleep(block_seconds)
+        return f"found {arguments.get('key')}"
+
+    return {"lookup": {"tool": Tool(name="lookup", inputSchema={"type": "object"}), "handler": lookup, **options}}
+
+
+async def throughput(tools: dict, calls: int, concurrency: int, max_workers: int) -> float:
+    server = create_mcp_server(tools, server_name="bench", max_workers=max_workers)
+    async with create_connected_server_and_client_session(server) as client:
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one(i: int) -> None:
+            async with gate:
+                result = await client.call_tool("lookup", {"key": i})
+                assert not result.isError, result
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(calls)))
+        return calls / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    parser.add_argument("--calls", type=int, default=64)
+    parser.add_argument("--block-ms", type=float, default=20.0)
+    parser.add_argument("--workers", type=int, default=32)
+    args = parser.parse_args()
+
+    block = args.block_ms / 1000
+    print(f"handler blocks {args.block_ms:.0f} ms; {args.calls} calls; {args.workers} worker threads")
+    print(f"{'in flight':>10} {'inline (calls/s)':>17} {'threads (calls/s)':>18} {'speedup':>8} "
+          f"{f'max_concurrency={LIMIT}':>20}")
+    for concurrency in args.concurrency:
+        inline = await throughput(blocking_tools(block, executor=EXECUTOR_INLINE), args.calls, concurrency,
+                                  args.workers)
+        threaded = await throughput(blocking_tools(block), args.calls, concurrency, args.workers)
+        limited = await throughput(blocking_tools(block, max_concurrency=LIMIT), args.calls, concurrency,
+                                   args.workers)
+        print(f"{concurrency:>10} {inline:>17.1f} {threaded:>18.1f} {threaded / inline:>7.1f}x {limited:>20.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,82 @@
+"""Concurrent throughput of a CPU-bound tool in mcp_server: threads vs processes.
+
+Run from the repository root:
+
+    python benchmarks/bench_tool_process.py [--concurrency 1 4 8] [--calls 32] [--work 200000]
+
+Serves a tool whose handler is pure Python computation (`--work` loop
+iterations; a stand-in for parsing, scoring or hashing) through
+`create_mcp_server` over the in-memory MCP transport, once on the worker
+threads (where the GIL serializes it) and once with `executor="process"` on
+warm worker processes. The process pool is started before timing, as
+`start_mcp_server` does at start-up.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from mcp.shared.memory import create_connected_server_and_client_session  # noqa: E402
+from mcp.types import Tool  # noqa: E402
+
+from mcp_server import EXECUTOR_PROCESS, ToolRunner, create_mcp_server  # noqa: E402
+
+
+def checksum(arguments: dict) -> str:
+    total = 0
+    for i in range(arguments["work"]):
+        total = (total * 31 + i) % 1_000_003
+    return str(total)
+
+
+def cpu_tools(**options) -> dict:
+    return {"checksum": {"tool": Tool(name="checksum", inputSchema={"type": "object"}), "handler": checksum,
+                         **options}}
+
+
+async def throughput(runner: ToolRunner, calls: int, concurrency: int, work: int) -> float:
+    server = create_mcp_server(runner.tools, server_name="bench", runner=runner)
+    async with create_connected_server_and_client_session(server) as client:
+        gate = asyncio.Semaphore(concurrency)
+
+        async def one() -> None:
+            async with gate:
+                result = await client.call_tool("checksum", {"work": work})
+                assert not result.isError, result
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(calls)))
+        return calls / (time.perf_counter() - started)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--calls", type=int, default=32)
+    parser.add_argument("--work", type=int, default=200_000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    threads = ToolRunner(cpu_tools(), max_workers=32)
+    processes = ToolRunner(cpu_tools(executor=EXECUTOR_PROCESS), process_workers=args.processes)
+    started = time.perf_counter()
+    processes.warm()
+    print(f"{args.processes} worker processes started in {time.perf_counter() - started:.2f}s; "
+          f"{args.calls} calls of {args.work} iterations")
+    print(f"{'in flight':>10} {'threads (calls/s)':>18} {'processes (calls/s)':>20} {'speedup':>8}")
+    try:
+        for concurrency in args.concurrency:
+            threaded = await throughput(threads, args.calls, concurrency, args.work)
+            pooled = await throughput(processes, args.calls, concurrency, args.work)
+            print(f"{concurrency:>10} {threaded:>18.1f} {pooled:>20.1f} {pooled / threaded:>7.1f}x")
+    finally:
+        threads.shutdown()
+        processes.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
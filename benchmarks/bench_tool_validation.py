@@ -0,0 +1,63 @@
+"""Cost of checking tool arguments: per-call jsonschema vs precompiled validators.
+
+Run from the repository root:
+
+    python benchmarks/bench_tool_validation.py [--iterations 20000]
+
+For the example tools' schemas and a richer one, compares what the MCP SDK
+does by default on every `tools/call` (`jsonschema.validate`, which builds
+a validator from the schema each time) with `tool_validation`'s compiled
+validator, which also coerces the arguments and fills in defaults.
+"""
+import argparse
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import jsonschema  # noqa: E402
+
+from tool_validation import compile_validator  # noqa: E402
+
+CASES = [
+    ("get_elf_name", {"type": "object", "properties": {"count": {"type": "integer", "default": 1}}},
+     {"count": 2}),
+    ("get_location_description",
+     {"type": "object", "properties": {"style": {"type": "string", "enum": ["brief", "detailed"], "default": "brief"}}},
+     {"style": "detailed"}),
+    ("search_lore", {
+        "type": "object",
+        "properties": {
+            "query": {"type": "string", "minLength": 1},
+            "limit": {"type": "integer", "minimum": 1, "maximum": 50, "default": 5},
+            "books": {"type": "array", "items": {"type": "string"}},
+            "exact": {"type": "boolean", "default": False},
+        },
+        "required": ["query"],
+    }, {"query": "Fëanor", "limit": 10, "books": ["Quenta Silmarillion"], "exact": True}),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=20000)
+    args = parser.parse_args()
+
+    print(f"{'tool':>26} {'jsonschema.validate (us)':>25} {'compiled (us)':>14} {'speedup':>8}")
+    for name, schema, arguments in CASES:
+        validator = compile_validator({"name": name, "inputSchema": schema})
+
+        def per_call():
+            jsonschema.validate(instance=arguments, schema=schema)
+
+        def compiled():
+            validator(arguments)
+
+        timings = [min(timeit.repeat(fn, number=args.iterations, repeat=3)) / args.iterations * 1e6
+                   for fn in (per_call, compiled)]
+        print(f"{name:>26} {timings[0]:>25.2f} {timings[1]:>14.2f} {timings[0] / timings[1]:>7.0f}x")
+
+
+if __name__ == "__main__":
+    main()
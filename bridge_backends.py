@@ -0,0 +1,221 @@
+"""Load balancing across several llamafile backends.
+
+A box often runs more than one llamafile (for example Gemma and DeepSeek with
+different `-ngl` settings). `BackendPool` keeps the list of backends, routes
+each request to the healthy backend with the fewest outstanding requests
+(scaled by its weight), and probes every backend in a background thread so
+failing ones are ejected and re-admitted once they answer again.
+
+A request leases one backend for its whole tool loop (`pool.lease()`), so all
+iterations hit the same llamafile and reuse its prompt cache.
+
+Backends are configured in code or through the `LLAMAFILE_BACKENDS`
+environment variable, either as JSON::
+
+    [{"url": "http://localhost:8080", "model": "gemma", "weight": 2},
+     {"url": "http://localhost:8090", "model": "deepseek"}]
+
+or as a comma-separated list of `url;key=value` entries::
+
+    http://localhost:8080;model=gemma;weight=2,http://localhost:8090;model=deepseek
+"""
+import json
+import os
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from bridge_logging import get_logger
+
+log = get_logger(__name__)
+
+BACKENDS_ENV = "LLAMAFILE_BACKENDS"
+
+DEFAULT_PROBE_INTERVAL = 10.0
+DEFAULT_PROBE_TIMEOUT = 2.0
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_PROBE_PATH = "/health"
+
+
+class NoHealthyBackendError(Exception):
+    """Raised when no backend can serve a request."""
+    status_code = 503
+
+
+@dataclass
+class Backend:
+    """One llamafile server."""
+    url: str
+    weight: float = 1.0
+    model: Optional[str] = None
+    # Decode slots on this backend; used as its admission-control limit
+    slots: Optional[int] = None
+    outstanding: int = field(default=0, compare=False)
+    healthy: bool = field(default=True, compare=False)
+    consecutive_failures: int = field(default=0, compare=False)
+    last_error: Optional[str] = field(default=None, compare=False)
+    last_probe: float = field(default=0.0, compare=False)
+
+    def __post_init__(self):
+        self.url = self.url.rstrip("/")
+        if self.weight <= 0:
+            raise ValueError(f"Backend weight must be positive: {self.url}")
+
+
+def parse_backends(spec: str) -> list[Backend]:
+    """Parse a backend list from JSON or from `url;key=value,...` syntax."""
+    spec = spec.strip()
+    if not spec:
+        return []
+    if spec.startswith("["):
+        return [Backend(**entry) for entry in json.loads(spec)]
+
+    backends = []
+    for entry in spec.split(","):
+        parts = [p.strip() for p in entry.split(";") if p.strip()]
+        if not parts:
+            continue
+        options: dict = {}
+        for option in parts[1:]:
+            key, _, value = option.partition("=")
+            key = key.strip()
+            if key == "weight":
+                options[key] = float(value)
+            elif key == "slots":
+                options[key] = int(value)
+            elif key == "model":
+                options[key] = value.strip()
+            else:
+                raise ValueError(f"Unknown backend option: {key}")
+        backends.append(Backend(url=parts[0], **options))
+    return backends
+
+
+class BackendPool:
+    """Least-outstanding-requests router with background health probing."""
+
+    def __init__(self, backends: Iterable[Backend],
+                 probe_interval: float = DEFAULT_PROBE_INTERVAL,
+                 probe_timeout: float = DEFAULT_PROBE_TIMEOUT,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 probe_path: str = DEFAULT_PROBE_PATH):
+        self.backends = list(backends)
+        if not self.backends:
+            raise ValueError("BackendPool needs at least one backend")
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.failure_threshold = failure_threshold
+        self.probe_path = probe_path
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @classmethod
+    def from_env(cls, default_url: str, **kwargs) -> "BackendPool":
+        """Build a pool from `LLAMAFILE_BACKENDS`, or a single `default_url` backend."""
+        backends = parse_backends(os.environ.get(BACKENDS_ENV, ""))
+        return cls(backends or [Backend(url=default_url)], **kwargs)
+
+    def slot_limits(self) -> dict[str, int]:
+        """Per-backend concurrency limits for an `AdmissionController`."""
+        return {b.url: b.slots for b in self.backends if b.slots}
+
+    def pick(self, model: Optional[str] = None) -> Backend:
+        """Return the healthy backend with the fewest outstanding requests per weight.
+
+        When `model` names the model of one or more backends only those are
+        considered; any other value (e.g. "local-model") matches every backend.
+        """
+        with self._lock:
+            return self._pick_locked(model)
+
+    def _pick_locked(self, model: Optional[str]) -> Backend:
+        candidates = self.backends
+        if model and any(b.model == model for b in candidates):
+            candidates = [b for b in candidates if b.model == model]
+        healthy = [b for b in candidates if b.healthy]
+        if not healthy:
+            raise NoHealthyBackendError(
+                f"No healthy llamafile backend for model {model or '*'}")
+        return min(healthy, key=lambda b: (b.outstanding / b.weight, -b.weight))
+
+    @contextmanager
+    def lease(self, model: Optional[str] = None):
+        """Pin one backend for the duration of a request."""
+        with self._lock:
+            backend = self._pick_locked(model)
+            backend.outstanding += 1
+        try:
+            yield backend
+        finally:
+            with self._lock:
+                backend.outstanding -= 1
+
+    def mark_success(self, backend: Backend) -> None:
+        with self._lock:
+            backend.consecutive_failures = 0
+            backend.last_error = None
+            if not backend.healthy:
+                log.info("backend_recovered", extra={"fields": {"backend": backend.url}})
+            backend.healthy = True
+
+    def mark_failure(self, backend: Backend, error: str) -> None:
+        """Record a failed call or probe; eject the backend past the threshold."""
+        with self._lock:
+            backend.consecutive_failures += 1
+            backend.last_error = error
+            if backend.healthy and backend.consecutive_failures >= self.failure_threshold:
+                backend.healthy = False
+                log.warning("backend_ejected", extra={"fields": {"backend": backend.url, "error": error}})
+
+    def probe(self, backend: Backend) -> bool:
+        """Probe one backend synchronously and update its health."""
+        backend.last_probe = time.time()
+        try:
+            with urllib.request.urlopen(backend.url + self.probe_path, timeout=self.probe_timeout) as resp:
+                ok = 200 <= resp.status < 300
+        except Exception as e:
+            self.mark_failure(backend, str(e))
+            return False
+        if ok:
+            self.mark_success(backend)
+        else:
+            self.mark_failure(backend, f"probe returned HTTP {resp.status}")
+        return ok
+
+    def probe_all(self) -> None:
+        for backend in self.backends:
+            self.probe(backend)
+
+    def _probe_loop(self) -> None:
+        while not self._stop.wait(self.probe_interval):
+            self.probe_all()
+
+    def start(self) -> None:
+        """Start the background health-probe thread (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._probe_loop, name="backend-probe", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def stats(self) -> list[dict]:
+        with self._lock:
+            return [
+                {
+                    "url": b.url,
+                    "model": b.model,
+                    "weight": b.weight,
+                    "outstanding": b.outstanding,
+                    "healthy": b.healthy,
+                    "consecutive_failures": b.consecutive_failures,
+                    "last_error": b.last_error,
+                }
+                for b in self.backends
+            ]
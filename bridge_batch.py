@@ -0,0 +1,319 @@
+"""Batch completions for offline story generation.
+
+`POST /v1/batch` takes a JSONL body, one chat request per line, either in
+the OpenAI batch format::
+
+    {"custom_id": "story-1", "method": "POST", "url": "/v1/chat/completions", "body": {"messages": [...]}}
+
+or as bare chat request bodies (the line number becomes the `custom_id`).
+Every item runs through the normal tool loop, with batch priority, on
+`concurrency` worker threads per backend. Results stream back as JSONL in
+completion order::
+
+    {"custom_id": "story-1", "response": {"status_code": 200, "body": {...}}, "error": null}
+
+Each job is persisted under `BRIDGE_BATCH_DIR` (default `batch_jobs/`) as
+`<job_id>/requests.jsonl` and an append-only `<job_id>/results.jsonl`.
+Posting again with the same `X-Batch-Id` (the body may be empty) resumes
+the job: successful results are replayed and only the remaining or failed
+items run. The job keeps running when the client disconnects;
+`GET /v1/batch/<job_id>` reports progress and
+`GET /v1/batch/<job_id>/results` streams the results.
+"""
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from typing import Any, Callable, Iterator, Optional
+
+from bridge_logging import get_logger
+
+log = get_logger(__name__)
+
+BATCH_DIR_ENV = "BRIDGE_BATCH_DIR"
+BATCH_ID_HEADER = "X-Batch-Id"
+CONTENT_TYPE = "application/x-ndjson"
+
+DEFAULT_BATCH_DIR = "batch_jobs"
+DEFAULT_BATCH_CONCURRENCY = 2
+# Attempts per item when the bridge is saturated (AdmissionError and the like)
+DEFAULT_MAX_RETRIES = 20
+
+_JOB_ID_RE = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+
+
+class BatchError(Exception):
+    """Invalid batch request."""
+    status_code = 400
+
+
+class BatchNotFoundError(BatchError):
+    status_code = 404
+
+
+class BatchConflictError(BatchError):
+    """The job is already running in this process."""
+    status_code = 409
+
+
+def parse_batch(text: str) -> list[dict]:
+    """Parse a JSONL batch into `{"custom_id": ..., "body": ...}` items."""
+    items = []
+    seen = set()
+    for number, line in enumerate(text.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError as e:
+            raise BatchError(f"Line {number}: invalid JSON ({e})") from None
+        if not isinstance(entry, dict):
+            raise BatchError(f"Line {number}: expected a JSON object")
+        if "body" in entry:
+            custom_id, body = str(entry.get("custom_id", number)), entry["body"]
+        else:
+            custom_id, body = str(number), entry
+        if not isinstance(body, dict) or not isinstance(body.get("messages"), list):
+            raise BatchError(f"Line {number}: request body needs a 'messages' list")
+        if custom_id in seen:
+            raise BatchError(f"Line {number}: duplicate custom_id '{custom_id}'")
+        seen.add(custom_id)
+        items.append({"custom_id": custom_id, "body": body})
+    return items
+
+
+def _result_line(custom_id: str, payload: Any, status: int) -> dict:
+    error = None
+    if status != 200:
+        message = payload.get("error") if isinstance(payload, dict) else None
+        error = {"code": status, "message": str(message or payload)}
+    return {"custom_id": custom_id, "response": {"status_code": status, "body": payload}, "error": error}
+
+
+class BatchJob:
+    """A persisted batch job and its results so far."""
+
+    def __init__(self, job_id: str, directory: str, items: list[dict]):
+        self.id = job_id
+        self.directory = directory
+        self.items = items
+        # Results in the order they were written (replayed ones first)
+        self.records: list[dict] = []
+        self.succeeded: set[str] = set()
+        self.failed = 0
+        self.running = False
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._cond = threading.Condition()
+        self._file = None
+
+    @property
+    def results_path(self) -> str:
+        return os.path.join(self.directory, "results.jsonl")
+
+    def load_results(self) -> None:
+        """Read earlier results; only successful ones count as done."""
+        latest: dict[str, dict] = {}
+        if os.path.exists(self.results_path):
+            with open(self.results_path, "rb+") as f:
+                data = f.read()
+                if data and not data.endswith(b"\n"):
+                    # Drop a line cut short by a crash so appends start clean
+                    f.truncate(data.rfind(b"\n") + 1)
+            for line in data.decode("utf-8", errors="replace").splitlines():
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                latest[record.get("custom_id")] = record
+        self.records = [r for r in latest.values() if r.get("error") is None]
+        self.succeeded = {r["custom_id"] for r in self.records}
+
+    def pending(self) -> list[dict]:
+        return [item for item in self.items if item["custom_id"] not in self.succeeded]
+
+    def record(self, custom_id: str, payload: Any, status: int) -> None:
+        """Persist one result, then wake the streams following the job."""
+        record = _result_line(custom_id, payload, status)
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._cond:
+            if self._file is None:
+                self._file = open(self.results_path, "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            # Durable before it is reported: a resumed job must not redo it
+            os.fsync(self._file.fileno())
+            self.records.append(record)
+            if status == 200:
+                self.succeeded.add(custom_id)
+            else:
+                self.failed += 1
+            self._cond.notify_all()
+
+    def finish(self) -> None:
+        with self._cond:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            self.running = False
+            self.finished_at = time.time()
+            self._cond.notify_all()
+
+    def follow(self) -> Iterator[str]:
+        """JSONL lines of all results, then new ones until the job finishes."""
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.records) and self.running:
+                    self._cond.wait()
+                lines = self.records[index:]
+                index = len(self.records)
+                done = not self.running
+            for record in lines:
+                yield json.dumps(record, ensure_ascii=False) + "\n"
+            if done and index >= len(self.records):
+                return
+
+    def status(self) -> dict:
+        with self._cond:
+            return {
+                "id": self.id,
+                "status": "running" if self.running else ("completed" if not self.pending() else "incomplete"),
+                "total": len(self.items),
+                "succeeded": len(self.succeeded),
+                "failed_attempts": self.failed,
+                "pending": len(self.pending()),
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+            }
+
+
+class BatchManager:
+    """Creates, resumes and runs batch jobs.
+
+    `run_item(body)` runs one chat request through the tool loop and returns
+    (payload, status_code). Exceptions with a `retry_after` attribute (the
+    bridge is saturated) are retried after that many seconds; other
+    exceptions become error results.
+    """
+
+    def __init__(self, run_item: Callable[[dict], tuple[Any, int]], workers: int,
+                 directory: Optional[str] = None, max_retries: int = DEFAULT_MAX_RETRIES):
+        self.run_item = run_item
+        self.workers = max(1, workers)
+        self.directory = directory or os.environ.get(BATCH_DIR_ENV) or DEFAULT_BATCH_DIR
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._running: dict[str, BatchJob] = {}
+        self.items_completed = 0
+        self.items_failed = 0
+
+    def _job_dir(self, job_id: str) -> str:
+        if not _JOB_ID_RE.match(job_id):
+            raise BatchError(f"Invalid batch id '{job_id}'")
+        return os.path.join(self.directory, job_id)
+
+    def get(self, job_id: str) -> BatchJob:
+        """The running job, or the persisted one."""
+        with self._lock:
+            job = self._running.get(job_id)
+        if job is not None:
+            return job
+        directory = self._job_dir(job_id)
+        path = os.path.join(directory, "requests.jsonl")
+        if not os.path.exists(path):
+            raise BatchNotFoundError(f"Unknown batch '{job_id}'")
+        with open(path, encoding="utf-8") as f:
+            job = BatchJob(job_id, directory, parse_batch(f.read()))
+        job.load_results()
+        return job
+
+    def submit(self, text: str, job_id: Optional[str] = None) -> BatchJob:
+        """Start a new job, or resume `job_id` (its requests are kept if `text` is empty)."""
+        job_id = job_id or secrets.token_hex(8)
+        directory = self._job_dir(job_id)
+        requests_path = os.path.join(directory, "requests.jsonl")
+        with self._lock:
+            if job_id in self._running:
+                raise BatchConflictError(f"Batch '{job_id}' is already running")
+            if text.strip():
+                items = parse_batch(text)
+                os.makedirs(directory, exist_ok=True)
+                if os.path.exists(requests_path):
+                    with open(requests_path, encoding="utf-8") as f:
+                        if parse_batch(f.read()) != items:
+                            raise BatchConflictError(f"Batch '{job_id}' exists with different requests")
+                else:
+                    temporary = requests_path + ".tmp"
+                    with open(temporary, "w", encoding="utf-8") as f:
+                        f.write(text if text.endswith("\n") else text + "\n")
+                        f.flush()
+                        os.fsync(f.fileno())
+                    os.replace(temporary, requests_path)
+            elif not os.path.exists(requests_path):
+                raise BatchError("Empty batch")
+            with open(requests_path, encoding="utf-8") as f:
+                job = BatchJob(job_id, directory, parse_batch(f.read()))
+            job.load_results()
+            job.running = True
+            job.started_at = time.time()
+            self._running[job_id] = job
+
+        pending = job.pending()
+        log.info("batch_started", extra={"fields": {"batch_id": job_id, "total": len(job.items),
+                                                    "pending": len(pending)}})
+        threading.Thread(target=self._run, args=(job, pending), name=f"batch-{job_id}", daemon=True).start()
+        return job
+
+    def _run_one(self, item: dict) -> tuple[Any, int]:
+        for attempt in range(self.max_retries):
+            try:
+                return self.run_item(item["body"])
+            except Exception as e:
+                retry_after = getattr(e, "retry_after", None)
+                if retry_after is None or attempt == self.max_retries - 1:
+                    return {"error": str(e)}, getattr(e, "status_code", 500)
+                time.sleep(retry_after)
+        return {"error": "Retries exhausted"}, 503
+
+    def _run(self, job: BatchJob, pending: list[dict]) -> None:
+        queue = list(reversed(pending))
+        queue_lock = threading.Lock()
+
+        def worker():
+            while True:
+                with queue_lock:
+                    if not queue:
+                        return
+                    item = queue.pop()
+                payload, status = self._run_one(item)
+                job.record(item["custom_id"], payload, status)
+                with self._lock:
+                    if status == 200:
+                        self.items_completed += 1
+                    else:
+                        self.items_failed += 1
+
+        threads = [threading.Thread(target=worker, name=f"batch-{job.id}-{i}", daemon=True)
+                   for i in range(min(self.workers, len(pending)))]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            with self._lock:
+                self._running.pop(job.id, None)
+            job.finish()
+            log.info("batch_finished", extra={"fields": job.status()})
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "running_jobs": len(self._running),
+                "workers": self.workers,
+                "items_completed": self.items_completed,
+                "items_failed": self.items_failed,
+            }
@@ -0,0 +1,318 @@
+"""Response cache for the Flask bridge.
+
+Fixed prompts (for example the cron-driven `llm_story*.py` scripts) cost a
+full llamafile generation every time they run. `ResponseCache` stores final
+bridge responses at two levels:
+
+- exact: keyed by the canonical request body plus the model;
+- semantic (optional): when no exact entry exists, returns the entry whose
+  prompt embedding is closest to the new prompt, provided the cosine
+  similarity is at least `semantic_threshold` and every other request
+  parameter (model, temperature, max_tokens, ...) is identical.
+
+Only deterministic requests (`temperature` 0 or a `seed`) are cached by
+default: a sampled request asks for a new completion each time, so it is
+neither served from nor stored in the cache unless `cache_sampled` is set.
+
+Entries expire after `ttl` seconds and the least recently used entries are
+evicted beyond `max_entries`; a semantic hit counts as a use. With `path`
+set the cache lives in a SQLite file and survives bridge restarts;
+otherwise it is kept in memory.
+
+Clients skip the lookup with `X-Cache-Bypass: 1` (or `Cache-Control:
+no-cache`); the fresh response still refreshes the entry. `Cache-Control:
+no-store` keeps a response out of the cache altogether.
+"""
+import array
+import hashlib
+import json
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from bridge_logging import get_logger
+from bridge_singleflight import canonical_body, is_deterministic
+
+log = get_logger(__name__)
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 24 * 3600.0
+DEFAULT_SEMANTIC_THRESHOLD = 0.95
+# Same embedding model llm_query uses for RAG
+DEFAULT_EMBEDDING_MODEL = "all-MiniLM-L6-v2"
+
+# Embeddings computed during lookup are kept briefly so store() can reuse them
+_RECENT_EMBEDDINGS = 64
+
+CACHE_BYPASS_HEADER = "X-Cache-Bypass"
+CACHE_STATUS_HEADER = "X-Cache"
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    scope: str
+    payload: dict
+    created: float
+    embedding: Optional[list[float]] = None
+
+
+def request_prompt(body: dict) -> str:
+    """Text used for semantic matching: the conversation's message contents."""
+    parts = []
+    for message in body.get("messages", []):
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(f"{message.get('role', '')}: {content}")
+    return "\n".join(parts)
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _normalize(vector) -> list[float]:
+    vector = [float(x) for x in vector]
+    norm = math.sqrt(sum(x * x for x in vector)) or 1.0
+    return [x / norm for x in vector]
+
+
+def _cosine(a: list[float], b: list[float]) -> float:
+    # Both vectors are stored normalized
+    return sum(x * y for x, y in zip(a, b))
+
+
+class MemoryStore:
+    """In-process LRU store."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, entry: CacheEntry) -> int:
+        self._entries[entry.key] = entry
+        self._entries.move_to_end(entry.key)
+        evicted = 0
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            evicted += 1
+        return evicted
+
+    def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    def embeddings(self, scope: str, min_created: float) -> list[tuple[str, list[float]]]:
+        return [(e.key, e.embedding) for e in self._entries.values()
+                if e.scope == scope and e.embedding is not None and e.created >= min_created]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteStore:
+    """SQLite-backed LRU store that survives restarts."""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, scope TEXT NOT NULL, payload TEXT NOT NULL,"
+            " created REAL NOT NULL, last_access REAL NOT NULL, embedding BLOB)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_lru ON responses(last_access)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_scope ON responses(scope)")
+        self._conn.commit()
+
+    @staticmethod
+    def _entry(key, scope, payload, created, embedding) -> CacheEntry:
+        vector = None
+        if embedding is not None:
+            vector = array.array("f", embedding).tolist()
+        return CacheEntry(key, scope, json.loads(payload), created, vector)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        row = self._conn.execute(
+            "SELECT key, scope, payload, created, embedding FROM responses WHERE key = ?",
+            (key,)).fetchone()
+        if row is None:
+            return None
+        self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return self._entry(*row)
+
+    def put(self, entry: CacheEntry) -> int:
+        embedding = None
+        if entry.embedding is not None:
+            embedding = array.array("f", entry.embedding).tobytes()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, scope, payload, created, last_access, embedding)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (entry.key, entry.scope, json.dumps(entry.payload), entry.created, time.time(), embedding))
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN"
+                " (SELECT key FROM responses ORDER BY last_access LIMIT ?)", (excess,))
+        self._conn.commit()
+        return max(excess, 0)
+
+    def delete(self, key: str) -> None:
+        self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def embeddings(self, scope: str, min_created: float) -> list[tuple[str, list[float]]]:
+        # Payloads stay on disk; get() loads the one that matches
+        rows = self._conn.execute(
+            "SELECT key, embedding FROM responses"
+            " WHERE scope = ? AND embedding IS NOT NULL AND created >= ?",
+            (scope, min_created)).fetchall()
+        return [(key, array.array("f", embedding).tolist()) for key, embedding in rows]
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+
+def _default_embedder(model_name: str) -> Callable[[str], list[float]]:
+    """Lazily load a sentence-transformers model as the embedding function."""
+    model = None
+
+    def embed(text: str) -> list[float]:
+        nonlocal model
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = SentenceTransformer(model_name)
+        return model.encode(text).tolist()
+
+    return embed
+
+
+class ResponseCache:
+    """Exact-match and (optionally) semantic cache of final bridge responses."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL,
+                 path: Optional[str] = None, semantic: bool = False,
+                 semantic_threshold: float = DEFAULT_SEMANTIC_THRESHOLD,
+                 embed: Optional[Callable[[str], list[float]]] = None, cache_sampled: bool = False):
+        self.ttl = ttl
+        self.cache_sampled = cache_sampled
+        self.semantic = semantic or embed is not None
+        self.semantic_threshold = semantic_threshold
+        self._embed = embed or _default_embedder(DEFAULT_EMBEDDING_MODEL)
+        self._store = SQLiteStore(path, max_entries) if path else MemoryStore(max_entries)
+        self._lock = threading.Lock()
+        self._recent_embeddings: "OrderedDict[str, list[float]]" = OrderedDict()
+        self.hits_exact = 0
+        self.hits_semantic = 0
+        self.misses = 0
+        self.evictions = 0
+        self.skipped_sampled = 0
+
+    def accepts(self, body: dict) -> bool:
+        """Whether `body` may be served from and stored in the cache."""
+        if self.cache_sampled or is_deterministic(body):
+            return True
+        with self._lock:
+            self.skipped_sampled += 1
+        return False
+
+    @staticmethod
+    def keys(body: dict) -> tuple[str, str]:
+        """Return (exact_key, scope) for a request body.
+
+        The scope covers every parameter except the messages, so semantic
+        matches never cross models or sampling settings.
+        """
+        model = body.get("model", "local-model")
+        exact = _digest(f"{model}\n{canonical_body(body)}")
+        params = {k: v for k, v in body.items() if k != "messages"}
+        scope = _digest(f"{model}\n{canonical_body(params)}")
+        return exact, scope
+
+    def _embedding(self, body: dict) -> Optional[list[float]]:
+        """Embed the request prompt, reusing the vector computed at lookup time."""
+        if not self.semantic:
+            return None
+        prompt = request_prompt(body)
+        prompt_key = _digest(prompt)
+        with self._lock:
+            vector = self._recent_embeddings.get(prompt_key)
+        if vector is not None:
+            return vector
+        try:
+            vector = _normalize(self._embed(prompt))
+        except Exception as e:
+            log.warning("cache_embedding_failed", extra={"fields": {"error": str(e)}})
+            return None
+        with self._lock:
+            self._recent_embeddings[prompt_key] = vector
+            if len(self._recent_embeddings) > _RECENT_EMBEDDINGS:
+                self._recent_embeddings.popitem(last=False)
+        return vector
+
+    def lookup(self, body: dict) -> tuple[Optional[dict], str]:
+        """Return (payload, level) where level is "exact", "semantic" or "miss"."""
+        exact_key, scope = self.keys(body)
+        now = time.time()
+        with self._lock:
+            entry = self._store.get(exact_key)
+            if entry is not None:
+                if entry.created + self.ttl >= now:
+                    self.hits_exact += 1
+                    return entry.payload, "exact"
+                self._store.delete(exact_key)
+
+        embedding = self._embedding(body)
+        if embedding is not None:
+            with self._lock:
+                candidates = self._store.embeddings(scope, now - self.ttl)
+            best, best_score = None, self.semantic_threshold
+            for key, vector in candidates:
+                score = _cosine(embedding, vector)
+                if score >= best_score:
+                    best, best_score = key, score
+            if best is not None:
+                with self._lock:
+                    # get() also marks the entry as recently used
+                    entry = self._store.get(best)
+                    if entry is not None:
+                        self.hits_semantic += 1
+                        return entry.payload, "semantic"
+
+        with self._lock:
+            self.misses += 1
+        return None, "miss"
+
+    def store(self, body: dict, payload: dict) -> None:
+        exact_key, scope = self.keys(body)
+        entry = CacheEntry(exact_key, scope, payload, time.time(), self._embedding(body))
+        with self._lock:
+            self.evictions += self._store.put(entry)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._store),
+                "hits_exact": self.hits_exact,
+                "hits_semantic": self.hits_semantic,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "skipped_sampled": self.skipped_sampled,
+            }
+
+
+def cache_directives(headers) -> tuple[bool, bool]:
+    """Return (bypass_lookup, no_store) from the request headers."""
+    cache_control = (headers.get("Cache-Control") or "").lower()
+    bypass = (headers.get(CACHE_BYPASS_HEADER) or "").strip().lower() in ("1", "true", "yes")
+    return bypass or "no-cache" in cache_control, "no-store" in cache_control
@@ -0,0 +1,176 @@
+"""Conversation compaction for the Flask bridge's tool loop.
+
+Every tool iteration appends an assistant `TOOL_CALL` message and a user
+`TOOL_RESULT` message to `enhanced_messages`, and the whole list is re-sent
+to llamafile. Long multi-turn sessions therefore creep towards the context
+limit and prefill time grows with every iteration.
+
+`compact_messages` returns a copy of the conversation that fits a token
+budget, applying the cheapest lossless step first:
+
+1. duplicate system prompts are dropped (clients often resend the same one);
+2. earlier TOOL_CALL / TOOL_RESULT (or TOOL_ERROR) pairs are collapsed into a
+   single message listing the calls already made and their results, keeping
+   the most recent pairs verbatim;
+3. as a last resort the oldest history messages are dropped, always keeping
+   system prompts, the latest user request and the final message.
+
+Token counts are estimated (about four characters per token) unless a
+`count_tokens` function is supplied.
+
+Compaction needs llamafile's real context size; the bridge only compacts
+when it is configured (`context_window` or `BRIDGE_CONTEXT_WINDOW`), since
+guessing it would drop client history that would have fit.
+"""
+import os
+import re
+from typing import Callable, Optional
+
+# llamafile's context size (its -c), enabling compaction when set
+CONTEXT_WINDOW_ENV = "BRIDGE_CONTEXT_WINDOW"
+# Per-message overhead of the chat template (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+_TOOL_CALL_LINE = re.compile(r"TOOL_CALL:\s*(.+)", re.IGNORECASE)
+_TOOL_REPLY = re.compile(r"^(TOOL_RESULT|TOOL_ERROR):\s*(.*?)(?:\n\n.*)?$", re.DOTALL)
+
+FACTS_HEADER = "TOOL_RESULTS from earlier calls (already done, do not call these again):"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate: about four characters per token."""
+    return (len(text) + 3) // 4
+
+
+def count_message_tokens(messages: list[dict],
+                         count_tokens: Callable[[str], int] = estimate_tokens) -> int:
+    total = 0
+    for message in messages:
+        content = message.get("content")
+        total += MESSAGE_OVERHEAD_TOKENS + (count_tokens(content) if isinstance(content, str) else 0)
+    return total
+
+
+def _dedupe_system(messages: list[dict]) -> list[dict]:
+    seen = set()
+    result = []
+    for message in messages:
+        if message.get("role") == "system":
+            content = message.get("content")
+            if content in seen:
+                continue
+            seen.add(content)
+        result.append(message)
+    return result
+
+
+def _tool_pairs(messages: list[dict]) -> list[int]:
+    """Indexes of assistant messages immediately followed by a tool reply."""
+    pairs = []
+    for i in range(len(messages) - 1):
+        first, second = messages[i], messages[i + 1]
+        if (first.get("role") == "assistant" and second.get("role") == "user"
+                and isinstance(first.get("content"), str)
+                and isinstance(second.get("content"), str)
+                and _TOOL_CALL_LINE.search(first["content"])
+                and _TOOL_REPLY.match(second["content"])):
+            pairs.append(i)
+    return pairs
+
+
+def _fact(assistant: str, reply: str) -> str:
+    call = _TOOL_CALL_LINE.search(assistant).group(1).strip()
+    kind, result = _TOOL_REPLY.match(reply).groups()
+    result = " ".join(result.split())
+    if kind.upper() == "TOOL_ERROR":
+        return f"- {call} -> failed: {result}"
+    return f"- {call} -> {result}"
+
+
+def _collapse_tool_pairs(messages: list[dict], keep_recent: int) -> list[dict]:
+    pairs = _tool_pairs(messages)
+    if keep_recent:
+        pairs = pairs[:-keep_recent]
+    if not pairs:
+        return messages
+
+    collapsed = set()
+    facts = []
+    for i, message in enumerate(messages):
+        # Merge facts from an earlier compaction pass into the new message
+        content = message.get("content")
+        if message.get("role") == "user" and isinstance(content, str) and content.startswith(FACTS_HEADER):
+            collapsed.add(i)
+            facts.extend(content.splitlines()[1:])
+    for i in pairs:
+        collapsed.update((i, i + 1))
+        facts.append(_fact(messages[i]["content"], messages[i + 1]["content"]))
+
+    result = []
+    inserted = False
+    for i, message in enumerate(messages):
+        if i in collapsed:
+            if not inserted:
+                result.append({"role": "user", "content": "\n".join([FACTS_HEADER] + facts)})
+                inserted = True
+            continue
+        result.append(message)
+    return result
+
+
+def _is_facts(message: dict) -> bool:
+    content = message.get("content")
+    return isinstance(content, str) and content.startswith(FACTS_HEADER)
+
+
+def _is_tool_reply_or_facts(message: dict) -> bool:
+    content = message.get("content")
+    return isinstance(content, str) and (bool(_TOOL_REPLY.match(content)) or content.startswith(FACTS_HEADER))
+
+
+def _drop_oldest(messages: list[dict], budget: int, count_tokens: Callable[[str], int]) -> list[dict]:
+    """Drop old history, keeping system prompts, the facts message, the
+    latest real user turn (the task) and the final message."""
+    result = list(messages)
+    while count_message_tokens(result, count_tokens) > budget:
+        last_task = max((i for i, m in enumerate(result)
+                         if m.get("role") == "user" and not _is_tool_reply_or_facts(m)), default=None)
+        index = next((i for i, m in enumerate(result[:-1])
+                      if m.get("role") != "system" and i != last_task
+                      and not _is_facts(m)), None)
+        if index is None:
+            break
+        del result[index]
+    return result
+
+
+def compact_messages(messages: list[dict], budget: int, keep_recent: int = 1,
+                     count_tokens: Callable[[str], int] = estimate_tokens) -> tuple[list[dict], int]:
+    """Return (compacted_messages, tokens_saved) for a prompt token budget.
+
+    The input list is not modified. `keep_recent` tool-call pairs are left
+    verbatim so the model still sees its latest call in full.
+    """
+    original = count_message_tokens(messages, count_tokens)
+    compacted = _dedupe_system(messages)
+    if count_message_tokens(compacted, count_tokens) > budget:
+        compacted = _collapse_tool_pairs(compacted, keep_recent)
+    if count_message_tokens(compacted, count_tokens) > budget:
+        compacted = _collapse_tool_pairs(compacted, 0)
+    if count_message_tokens(compacted, count_tokens) > budget:
+        compacted = _drop_oldest(compacted, budget, count_tokens)
+    return compacted, original - count_message_tokens(compacted, count_tokens)
+
+
+def context_window_from_env() -> Optional[int]:
+    """`BRIDGE_CONTEXT_WINDOW`, or None when unset or malformed (no compaction)."""
+    try:
+        value = int(os.environ.get(CONTEXT_WINDOW_ENV) or 0)
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+def prompt_budget(max_tokens: int, context_window: int) -> int:
+    """Prompt tokens available once `max_tokens` are reserved for the answer."""
+    return max(256, context_window - max_tokens)
@@ -0,0 +1,250 @@
+"""End-to-end deadlines for the tool loop.
+
+Without a deadline one request could hold a worker for the tool loop's
+5 iterations times the per-call timeout (15 minutes in the Flask bridge),
+long after the client gave up. A `Deadline` is created per request from
+the configured timeout (`BRIDGE_REQUEST_TIMEOUT`, default 300 s, the same
+`request_timeout` `llm_query` uses), which a client can shorten with an
+`X-Request-Timeout: <seconds>` header. The loop then spends it as follows:
+
+- queue wait is capped by the remaining time;
+- each llamafile call may use all the time that is left: the requested
+  `max_tokens` is only lowered when the backend could not decode that many
+  tokens before the deadline (`DecodeRate`), so the model finishes a
+  shorter answer instead of being cut off. A one-shot answer is never
+  shortened for iterations that may not happen;
+- each tool call gets its own sub-budget, a fraction of what is left capped
+  by the tool timeout. Synchronous tools run on a bounded thread pool
+  (`BRIDGE_TOOL_WORKERS`); a call that times out keeps its worker until it
+  returns, and such abandoned workers are counted in `tool_pool_stats()`;
+- between steps the loop stops when the deadline passed
+  (`DeadlineExceeded`, 504) or the client went away (`ClientDisconnected`).
+"""
+import concurrent.futures
+import contextvars
+import os
+import socket
+import threading
+import time
+from typing import Any, Callable, Optional
+
+DEADLINE_HEADER = "X-Request-Timeout"
+DEADLINE_ENV = "BRIDGE_REQUEST_TIMEOUT"
+TOOL_WORKERS_ENV = "BRIDGE_TOOL_WORKERS"
+
+DEFAULT_REQUEST_TIMEOUT = 300.0
+DEFAULT_TOOL_TIMEOUT = 30.0
+# Threads running synchronous tool calls (shared by all requests)
+DEFAULT_TOOL_WORKERS = 32
+# Share of the remaining time one tool call may use
+TOOL_BUDGET_FRACTION = 0.25
+# A llamafile call is not started with less time than this
+MIN_CALL_SECONDS = 1.0
+# Weight of the newest sample in the decode rate average
+DECODE_RATE_ALPHA = 0.3
+
+
+class DeadlineExceeded(Exception):
+    """The request's time budget ran out."""
+    status_code = 504
+
+
+class ClientDisconnected(Exception):
+    """The client closed the connection; nobody is waiting for the answer."""
+    # nginx's "client closed request"; never seen by the client
+    status_code = 499
+
+
+class ToolTimeout(TimeoutError):
+    """A tool call exceeded its sub-budget."""
+
+    def __init__(self, tool: str, timeout: float):
+        self.tool = tool
+        self.timeout = timeout
+        super().__init__(f"Tool '{tool}' timed out after {timeout:.1f}s")
+
+
+def default_request_timeout() -> float:
+    """Configured per-request budget in seconds (`BRIDGE_REQUEST_TIMEOUT`)."""
+    try:
+        return float(os.environ.get(DEADLINE_ENV) or DEFAULT_REQUEST_TIMEOUT)
+    except ValueError:
+        return DEFAULT_REQUEST_TIMEOUT
+
+
+def parse_deadline_header(headers, limit: float) -> float:
+    """Budget for a request: `X-Request-Timeout` when set, at most `limit`.
+
+    Clients can shorten the configured budget but not extend it; a malformed
+    value is ignored.
+    """
+    raw = headers.get(DEADLINE_HEADER)
+    if raw:
+        try:
+            return min(limit, max(0.0, float(raw)))
+        except ValueError:
+            pass
+    return limit
+
+
+class Deadline:
+    """Time budget of one request.
+
+    `is_cancelled` is polled at every checkpoint; the bridges pass a check
+    for a closed client connection.
+    """
+
+    def __init__(self, timeout: float, is_cancelled: Optional[Callable[[], bool]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.timeout = timeout
+        self.is_cancelled = is_cancelled
+        self._clock = clock
+        self.started = clock()
+        self.expires_at = self.started + timeout
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - self._clock())
+
+    def elapsed(self) -> float:
+        return self._clock() - self.started
+
+    def check(self, minimum: float = 0.0) -> float:
+        """Return the remaining time; raise if the request should stop."""
+        if self.is_cancelled is not None and self.is_cancelled():
+            raise ClientDisconnected("Client disconnected")
+        remaining = self.remaining()
+        if remaining <= minimum:
+            raise DeadlineExceeded(f"Request deadline of {self.timeout:.1f}s exceeded")
+        return remaining
+
+    def queue_timeout(self, requested: Optional[float]) -> float:
+        """Admission queue timeout: the requested one, capped by the remaining time."""
+        remaining = self.check()
+        return remaining if requested is None else min(requested, remaining)
+
+    def llm_budget(self) -> float:
+        """Time the next llamafile call may use: everything that is left."""
+        return self.check(MIN_CALL_SECONDS)
+
+    def tool_budget(self, tool_timeout: float = DEFAULT_TOOL_TIMEOUT) -> float:
+        """Timeout for the next tool call."""
+        remaining = self.check()
+        return min(tool_timeout, remaining * TOOL_BUDGET_FRACTION)
+
+
+class DecodeRate:
+    """Moving average of completion tokens per second, per backend.
+
+    Measured over the whole call, prefill included, so the estimate errs
+    on the short side.
+    """
+
+    def __init__(self, alpha: float = DECODE_RATE_ALPHA):
+        self.alpha = alpha
+        self._lock = threading.Lock()
+        self._rates: dict[str, float] = {}
+
+    def observe(self, backend: str, completion_tokens: Optional[int], seconds: float) -> None:
+        if not completion_tokens or seconds <= 0:
+            return
+        rate = completion_tokens / seconds
+        with self._lock:
+            previous = self._rates.get(backend)
+            self._rates[backend] = rate if previous is None else previous + self.alpha * (rate - previous)
+
+    def max_tokens(self, backend: str, seconds: float, requested: Optional[int]) -> Optional[int]:
+        """`requested`, lowered only if `backend` cannot decode it in `seconds`.
+
+        Unchanged until the backend's rate is known; None (no limit) becomes
+        the estimate.
+        """
+        with self._lock:
+            rate = self._rates.get(backend)
+        if rate is None:
+            return requested
+        limit = max(1, int(rate * seconds))
+        return limit if requested is None else min(requested, limit)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {backend: {"tokens_per_second": round(rate, 2)} for backend, rate in self._rates.items()}
+
+
+def tool_workers() -> int:
+    """Size of the tool thread pool (`BRIDGE_TOOL_WORKERS`)."""
+    try:
+        return max(1, int(os.environ.get(TOOL_WORKERS_ENV) or DEFAULT_TOOL_WORKERS))
+    except ValueError:
+        return DEFAULT_TOOL_WORKERS
+
+
+_tool_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_tool_pool_lock = threading.Lock()
+_tool_pool_workers = 0
+# Timed-out calls still holding a worker, and all calls ever abandoned
+_abandoned = 0
+_abandoned_total = 0
+
+
+def submit_tool(fn: Callable[..., Any], *args) -> concurrent.futures.Future:
+    """Start a synchronous tool call on the shared tool thread pool.
+
+    The call runs in a copy of the caller's context (so trace spans nest).
+    When every worker is busy the call waits for one, within its timeout.
+    """
+    global _tool_pool, _tool_pool_workers
+    with _tool_pool_lock:
+        if _tool_pool is None:
+            _tool_pool_workers = tool_workers()
+            _tool_pool = concurrent.futures.ThreadPoolExecutor(max_workers=_tool_pool_workers,
+                                                               thread_name_prefix="bridge-tool")
+    return _tool_pool.submit(contextvars.copy_context().run, fn, *args)
+
+
+def _release_abandoned(_future: concurrent.futures.Future) -> None:
+    global _abandoned
+    with _tool_pool_lock:
+        _abandoned -= 1
+
+
+def wait_tool(tool: str, future: concurrent.futures.Future, timeout: float) -> Any:
+    """Result of a call started with `submit_tool`; ToolTimeout after `timeout` seconds.
+
+    A call that had not started is cancelled. One that is running keeps its
+    worker until it returns (threads cannot be interrupted); it is counted
+    as abandoned until then and its result is discarded.
+    """
+    global _abandoned, _abandoned_total
+    try:
+        return future.result(timeout=timeout)
+    except concurrent.futures.TimeoutError:
+        if not future.cancel():
+            with _tool_pool_lock:
+                _abandoned += 1
+                _abandoned_total += 1
+            future.add_done_callback(_release_abandoned)
+        raise ToolTimeout(tool, timeout) from None
+
+
+def tool_pool_stats() -> dict:
+    """Size of the tool thread pool and the workers held by timed-out calls."""
+    with _tool_pool_lock:
+        return {"workers": _tool_pool_workers or tool_workers(), "abandoned": _abandoned,
+                "abandoned_total": _abandoned_total}
+
+
+def call_with_timeout(tool: str, timeout: float, fn: Callable[..., Any], *args) -> Any:
+    """Run a synchronous tool call, giving up after `timeout` seconds."""
+    return wait_tool(tool, submit_tool(fn, *args), timeout)
+
+
+def socket_disconnected(sock: Optional[socket.socket]) -> bool:
+    """True if the peer closed `sock` (non-blocking peek; unread data is kept)."""
+    if sock is None:
+        return False
+    try:
+        return sock.recv(1, socket.MSG_PEEK | socket.MSG_DONTWAIT) == b""
+    except (BlockingIOError, InterruptedError):
+        return False
+    except OSError:
+        return True
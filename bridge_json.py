@@ -0,0 +1,28 @@
+"""JSON on the bridges' hot path.
+
+Uses orjson when it is installed (`pip install orjson`), which parses
+llamafile responses several times faster than the standard library, and
+falls back to `json` otherwise. Both functions work on bytes, so upstream
+bodies are parsed without decoding them to `str` first.
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+CONTENT_TYPE = "application/json"
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
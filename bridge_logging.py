@@ -0,0 +1,228 @@
+"""Structured, low-overhead logging for the bridges and the MCP server.
+
+The bridges used to `print` banners, LLM response previews, parsed tool
+calls and tool results to stderr on every iteration. Under load that
+serializes worker threads on the stderr lock and floods the log pipeline.
+This module replaces those prints with:
+
+- leveled JSON events (one object per line, `LOG_FORMAT=text` for humans);
+- a queued handler: callers only enqueue the record, a background listener
+  thread formats and writes it;
+- sampling of verbose payload events (LLM text, tool results): a request is
+  picked for payload logging with probability `LOG_SAMPLE_RATE`;
+- a per-request ring buffer that keeps the last events of the request,
+  including unsampled payloads and debug events, and is written out only
+  when the request fails (`dump_request_log`).
+
+Usage::
+
+    log = get_logger(__name__)
+    with request_log_context() as request_id:
+        log_event(log, logging.DEBUG, "llm_response", payload=True, preview=text[:300])
+        ...
+        dump_request_log(log)  # on error
+
+Configuration comes from `LOG_LEVEL` (default INFO), `LOG_FORMAT` (json or
+text) and `LOG_SAMPLE_RATE` (default 0.01), or from `configure_logging`.
+"""
+import atexit
+import collections
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Optional
+
+DEFAULT_SAMPLE_RATE = 0.01
+DEFAULT_RING_SIZE = 64
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Loggers that share the queued handler
+_LOGGER_ROOT = "bridge"
+
+_configure_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+_sample_rate = DEFAULT_SAMPLE_RATE
+_ring_size = DEFAULT_RING_SIZE
+
+
+class _RequestLog:
+    __slots__ = ("request_id", "sampled", "events")
+
+    def __init__(self, request_id: str, sampled: bool, ring_size: int):
+        self.request_id = request_id
+        self.sampled = sampled
+        self.events: collections.deque = collections.deque(maxlen=ring_size)
+
+
+_current: contextvars.ContextVar[Optional[_RequestLog]] = contextvars.ContextVar("bridge_request_log", default=None)
+
+
+def _exception_text(formatter: logging.Formatter, record: logging.LogRecord) -> Optional[str]:
+    # Queued records carry the traceback pre-rendered in exc_text
+    if record.exc_info:
+        return formatter.formatException(record.exc_info)
+    return record.exc_text or None
+
+
+class JsonFormatter(logging.Formatter):
+    """Render a record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        event = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            event["request_id"] = request_id
+        fields = getattr(record, "fields", None)
+        if fields:
+            event.update(fields)
+        exception = _exception_text(self, record)
+        if exception:
+            event["exception"] = exception
+        return json.dumps(event, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable `event key=value ...` lines."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        parts = [time.strftime("%H:%M:%S", time.localtime(record.created)),
+                 record.levelname, record.getMessage()]
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            parts.append(f"request_id={request_id}")
+        for key, value in (getattr(record, "fields", None) or {}).items():
+            parts.append(f"{key}={value!r}")
+        line = " ".join(parts)
+        exception = _exception_text(self, record)
+        if exception:
+            line += "\n" + exception
+        return line
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that defers formatting to the listener thread."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if not hasattr(record, "request_id"):
+            current = _current.get()
+            record.request_id = current.request_id if current else None
+        if record.exc_info and not record.exc_text:
+            # Tracebacks must be rendered while the frames are still alive
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def configure_logging(level: Optional[str] = None, fmt: Optional[str] = None,
+                      sample_rate: Optional[float] = None, ring_size: Optional[int] = None,
+                      stream=None) -> None:
+    """Install the queued handler on the `bridge` logger tree (idempotent).
+
+    Arguments override the LOG_LEVEL / LOG_FORMAT / LOG_SAMPLE_RATE
+    environment variables. Calling it again reconfigures the output.
+    """
+    global _listener, _sample_rate, _ring_size
+    with _configure_lock:
+        level = (level or os.environ.get("LOG_LEVEL", "INFO")).upper()
+        fmt = (fmt or os.environ.get("LOG_FORMAT", "json")).lower()
+        if sample_rate is None:
+            sample_rate = float(os.environ.get("LOG_SAMPLE_RATE", DEFAULT_SAMPLE_RATE))
+        _sample_rate = sample_rate
+        if ring_size is not None:
+            _ring_size = ring_size
+
+        if _listener is not None:
+            _listener.stop()
+        output = logging.StreamHandler(stream or sys.stderr)
+        output.setFormatter(JsonFormatter() if fmt == "json" else TextFormatter())
+        records: queue.SimpleQueue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(records, output, respect_handler_level=False)
+        _listener.start()
+
+        root = logging.getLogger(_LOGGER_ROOT)
+        for handler in list(root.handlers):
+            if isinstance(handler, _EnqueueHandler):
+                root.removeHandler(handler)
+        root.addHandler(_EnqueueHandler(records))
+        root.setLevel(level)
+        root.propagate = False
+
+
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+atexit.register(_stop_listener)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Return a logger under the `bridge` tree, configuring output on first use."""
+    if _listener is None:
+        configure_logging()
+    short = name.rsplit(".", 1)[-1]
+    return logging.getLogger(f"{_LOGGER_ROOT}.{short}")
+
+
+def log_event(logger: logging.Logger, level: int, event: str, payload: bool = False, **fields) -> None:
+    """Log a structured event.
+
+    The event is always recorded in the current request's ring buffer (a
+    cheap append). It is emitted only if the logger is enabled for `level`
+    and, for `payload=True` events, only if the request was sampled.
+    """
+    current = _current.get()
+    if current is not None:
+        current.events.append((time.time(), level, event, fields))
+        if payload and not current.sampled:
+            return
+    elif payload and random.random() >= _sample_rate:
+        return
+    if logger.isEnabledFor(level):
+        logger.log(level, event, extra={"fields": fields,
+                                        "request_id": current.request_id if current else None})
+
+
+@contextmanager
+def request_log_context(request_id: Optional[str] = None, sampled: Optional[bool] = None):
+    """Scope log events to one request; yields the request ID."""
+    if sampled is None:
+        sampled = random.random() < _sample_rate
+    current = _RequestLog(request_id or uuid.uuid4().hex[:16], sampled, _ring_size)
+    token = _current.set(current)
+    try:
+        yield current.request_id
+    finally:
+        _current.reset(token)
+
+
+def current_request_id() -> Optional[str]:
+    current = _current.get()
+    return current.request_id if current else None
+
+
+def dump_request_log(logger: logging.Logger, reason: str = "request_failed") -> None:
+    """Emit the current request's buffered events (call on error)."""
+    current = _current.get()
+    if current is None or not current.events:
+        return
+    events = [
+        {"ts": round(ts, 6), "level": logging.getLevelName(level).lower(), "event": event, **fields}
+        for ts, level, event, fields in current.events
+    ]
+    logger.error(reason, extra={"fields": {"buffered_events": events}, "request_id": current.request_id})
+    current.events.clear()
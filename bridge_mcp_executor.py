@@ -0,0 +1,174 @@
+"""Synchronous MCP tool executor for the Flask bridge.
+
+Flask workers are threads, while the MCP client is asyncio. `MCPClientExecutor`
+runs an `MCPSessionPool` (long-lived, supervised server sessions; see
+`bridge_mcp_pool.py`) on its own event loop in a background thread and
+exposes it as the `(tool_name, arguments) -> str` callable the bridge
+expects::
+
+    from bridge_mcp_executor import MCPClientExecutor
+    from mcp_bridge_flask import run_bridge
+
+    run_bridge(mcp_executor=MCPClientExecutor.for_script("mcp_bridge_example.py", "--mcp-server"))
+
+Calls from any number of threads are multiplexed over the pooled sessions
+(MCP matches responses to requests by id); no process is spawned per call.
+A call that runs past `timeout` is cancelled on the loop and raises
+`ToolTimeout`. Tools the server advertises as cacheable (a TTL in their
+`_meta`, see `tool_cache.py`) are answered from a local LRU on repeat
+calls, without a round trip. `tool_definitions` is the server's
+`tools/list` result, so the bridge can build its tool registry from it.
+"""
+import asyncio
+import atexit
+import concurrent.futures
+import sys
+import threading
+from typing import Any, Optional
+
+from mcp import StdioServerParameters
+from mcp.types import CallToolResult, TextContent, Tool
+
+from bridge_deadline import DEFAULT_TOOL_TIMEOUT, ToolTimeout
+from bridge_logging import get_logger
+from bridge_mcp_pool import MCPSessionPool, MCPUnavailableError, ServerParams
+from bridge_tracing import TRACEPARENT_HEADER, current_traceparent
+from tool_cache import CachePolicy, ToolResultCache, tool_policy
+
+log = get_logger(__name__)
+
+
+class MCPToolError(Exception):
+    """The MCP server reported the tool call as failed (`isError`)."""
+
+
+def result_text(result: CallToolResult) -> str:
+    """Text of a tool result (text parts joined; other parts summarized)."""
+    parts = []
+    for item in result.content:
+        if isinstance(item, TextContent):
+            parts.append(item.text)
+        else:
+            parts.append(f"[{item.type} content]")
+    return "\n".join(parts)
+
+
+class MCPClientExecutor:
+    """Thread-safe synchronous front end of an `MCPSessionPool`."""
+
+    def __init__(self, server_params: Optional[ServerParams] = None,
+                 pool: Optional[MCPSessionPool] = None, timeout: float = DEFAULT_TOOL_TIMEOUT,
+                 cache: Optional[ToolResultCache] = None, **pool_kwargs):
+        if pool is None:
+            if server_params is None:
+                raise ValueError("MCPClientExecutor needs server_params or a pool")
+            pool = MCPSessionPool.from_env(server_params, **pool_kwargs)
+        self.pool = pool
+        self.timeout = timeout
+        self.cache = cache if cache is not None else ToolResultCache()
+        self._policies: dict[str, CachePolicy] = {}
+        pool.on_tools_changed(self._update_policies)
+        if pool.tools is not None:
+            self._update_policies(pool.tools)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._closed = False
+
+    @classmethod
+    def for_script(cls, path: str, *args: str, **kwargs) -> "MCPClientExecutor":
+        """Executor for a Python MCP stdio server script, run with this interpreter."""
+        return cls(StdioServerParameters(command=sys.executable, args=[path, *args]), **kwargs)
+
+    @classmethod
+    def for_url(cls, url: str, **kwargs) -> "MCPClientExecutor":
+        """Executor for a streamable HTTP MCP server, e.g. `http://127.0.0.1:8765/mcp`."""
+        return cls(url, **kwargs)
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        """The loop thread's event loop, started on first use; RuntimeError once closed."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("MCPClientExecutor is closed")
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=loop.run_forever, name="mcp-client", daemon=True)
+                self._thread.start()
+                self._loop = loop
+                atexit.register(self.close)
+            return self._loop
+
+    def start(self, wait: bool = True) -> "MCPClientExecutor":
+        """Start the loop thread and the pool (once); with `wait`, until a session is ready."""
+        future = asyncio.run_coroutine_threadsafe(self.pool.start(wait=wait), self._event_loop())
+        future.result(self.pool.init_timeout + 1.0 if wait else None)
+        return self
+
+    @property
+    def tool_definitions(self) -> list[Tool]:
+        """The server's tools (`tools/list`), waiting for the first session if needed.
+
+        Empty, with a warning, when no session becomes ready in time.
+        """
+        if self.pool.tools is None:
+            try:
+                self.start(wait=True)
+            except (MCPUnavailableError, concurrent.futures.TimeoutError) as e:
+                log.warning("mcp_tools_unavailable", extra={"fields": {"error": str(e)}})
+        return list(self.pool.tools or [])
+
+    def close(self) -> None:
+        """Stop the sessions and the loop thread; later calls raise RuntimeError."""
+        with self._lock:
+            self._closed = True
+            loop, self._loop = self._loop, None
+            thread, self._thread = self._thread, None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self.pool.close(), loop).result(10.0)
+        except Exception as e:
+            log.warning("mcp_executor_close_failed", extra={"fields": {"error": str(e)}})
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(5.0)
+
+    def _update_policies(self, tools) -> None:
+        self._policies = {tool.name: policy for tool in tools if (policy := tool_policy(tool)) is not None}
+        # A changed tool list may mean changed tools: drop what they returned before
+        self.cache.clear()
+
+    def call(self, tool_name: str, arguments: dict, timeout: Optional[float] = None) -> str:
+        """Run one tool call from any thread; ToolTimeout after `timeout` seconds."""
+        loop = self._event_loop()
+        if not self.pool.started:
+            self.start(wait=False)
+        policy = self._policies.get(tool_name)
+        if policy is not None:
+            key = policy.cache_key(arguments)
+            hit, text = self.cache.lookup(tool_name, key)
+            if hit:
+                return text
+        timeout = self.timeout if timeout is None else timeout
+        # The trace context crosses the stdio hop in the request's _meta
+        traceparent = current_traceparent()
+        meta = {TRACEPARENT_HEADER: traceparent} if traceparent else None
+        future = asyncio.run_coroutine_threadsafe(self.pool.call_tool(tool_name, arguments, meta=meta), loop)
+        try:
+            result = future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            # Cancels the call on the loop; the session stays usable
+            future.cancel()
+            raise ToolTimeout(tool_name, timeout) from None
+        text = result_text(result)
+        if result.isError:
+            raise MCPToolError(text or f"Tool '{tool_name}' failed")
+        if policy is not None:
+            self.cache.store(tool_name, key, text, policy.ttl)
+        return text
+
+    def __call__(self, tool_name: str, arguments: dict) -> str:
+        return self.call(tool_name, arguments)
+
+    def stats(self) -> dict[str, Any]:
+        return dict(self.pool.stats(), running=self._loop is not None)
@@ -0,0 +1,375 @@
+"""Pool of supervised MCP client sessions (stdio or streamable HTTP).
+
+With one `ClientSession` to one `mcp_server.py` subprocess, every tool call of
+every request shares a single stdio pipe, a crashed server stays dead, and
+concurrent first requests can each spawn their own server. `MCPSessionPool`
+runs `size` server subprocesses instead, each owned by a supervisor task:
+
+- the supervisor enters the transport client and `ClientSession` as context
+  managers (in the same task, as anyio requires), initializes the session
+  and then pings it every `ping_interval` seconds;
+- after `failure_threshold` failed pings, a broken pipe or a server exit,
+  the session is torn down and restarted with exponential backoff
+  (`min_backoff` doubling up to `max_backoff`; reset once a session stayed
+  up for `max_backoff` seconds);
+- `start()` is single-flight: concurrent callers share one start-up;
+- `call_tool()` goes to the ready session with the fewest calls in flight,
+  and each session runs at most `max_concurrency` calls at once (the rest
+  queue on its semaphore);
+- the server's tools are listed (`tools/list`) when a session starts,
+  before it counts as ready, and again when the server sends
+  `notifications/tools/list_changed`. `pool.tools` holds the latest list;
+  `on_tools_changed(tools)` callbacks run when it changes.
+
+`server_params` is either a `StdioServerParameters` (each session runs its
+own server subprocess) or the URL of a streamable HTTP server such as
+`mcp_server.start_mcp_http_server` (each session is a keep-alive connection
+to one shared, long-lived server); supervision works the same for both.
+
+Configured in code or with `BRIDGE_MCP_SESSIONS` (pool size, default 2) and
+`BRIDGE_MCP_SESSION_CONCURRENCY` (calls per session, default 4).
+"""
+import asyncio
+import contextlib
+import os
+import time
+from typing import Callable, Optional, Union
+
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED, CallToolResult, ServerNotification, Tool, ToolListChangedNotification
+
+from bridge_logging import get_logger
+
+log = get_logger(__name__)
+
+# A server command (stdio) or a streamable HTTP endpoint URL
+ServerParams = Union[StdioServerParameters, str]
+
+SESSIONS_ENV = "BRIDGE_MCP_SESSIONS"
+SESSION_CONCURRENCY_ENV = "BRIDGE_MCP_SESSION_CONCURRENCY"
+
+DEFAULT_POOL_SIZE = 2
+DEFAULT_SESSION_CONCURRENCY = 4
+DEFAULT_INIT_TIMEOUT = 30.0
+DEFAULT_PING_INTERVAL = 10.0
+DEFAULT_PING_TIMEOUT = 5.0
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_MIN_BACKOFF = 0.5
+DEFAULT_MAX_BACKOFF = 30.0
+
+# Raised on send when the session's streams are gone: the call never left
+_SEND_FAILED = (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)
+
+
+class MCPUnavailableError(Exception):
+    """No MCP session became ready in time."""
+    status_code = 503
+
+
+def _describe(error: BaseException) -> str:
+    # anyio task groups wrap the real failure in an exception group
+    while getattr(error, "exceptions", None):
+        error = error.exceptions[0]
+    return str(error) or type(error).__name__
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.environ.get(name) or default))
+    except ValueError:
+        return default
+
+
+class PooledSession:
+    """One supervised server subprocess and its client session."""
+
+    def __init__(self, index: int, max_concurrency: int):
+        self.index = index
+        self.session: Optional[ClientSession] = None
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.ready = asyncio.Event()
+        # Set by a caller that saw the pipe break; the supervisor restarts
+        self.broken = asyncio.Event()
+        self.state = "starting"
+        self.in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.restarts = 0
+        self.ping_failures = 0
+        self.last_error: Optional[str] = None
+        self.started_at: Optional[float] = None
+
+    def stats(self) -> dict:
+        return {
+            "session": str(self.index),
+            "state": self.state,
+            "ready": self.ready.is_set(),
+            "in_flight": self.in_flight,
+            "calls": self.calls,
+            "errors": self.errors,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+        }
+
+
+class MCPSessionPool:
+    """Least-busy dispatch over supervised MCP sessions.
+
+    Bound to the event loop that calls `start()`.
+    """
+
+    def __init__(self, server_params: ServerParams, size: int = DEFAULT_POOL_SIZE,
+                 max_concurrency: int = DEFAULT_SESSION_CONCURRENCY,
+                 init_timeout: float = DEFAULT_INIT_TIMEOUT,
+                 ping_interval: float = DEFAULT_PING_INTERVAL,
+                 ping_timeout: float = DEFAULT_PING_TIMEOUT,
+                 failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+                 min_backoff: float = DEFAULT_MIN_BACKOFF,
+                 max_backoff: float = DEFAULT_MAX_BACKOFF):
+        if size < 1:
+            raise ValueError("MCPSessionPool needs at least one session")
+        self.server_params = server_params
+        self.size = size
+        self.max_concurrency = max_concurrency
+        self.init_timeout = init_timeout
+        self.ping_interval = ping_interval
+        self.ping_timeout = ping_timeout
+        self.failure_threshold = failure_threshold
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.sessions = [PooledSession(i, max_concurrency) for i in range(size)]
+        self._supervisors: list[asyncio.Task] = []
+        self._closing = False
+        # Latest tools/list result, shared by all sessions (same server command)
+        self.tools: Optional[list[Tool]] = None
+        self.tools_refreshed = 0
+        self._tools_listeners: list[Callable[[list[Tool]], None]] = []
+        self._refreshes: set[asyncio.Task] = set()
+
+    @classmethod
+    def from_env(cls, server_params: ServerParams, **kwargs) -> "MCPSessionPool":
+        """Pool sized by `BRIDGE_MCP_SESSIONS` and `BRIDGE_MCP_SESSION_CONCURRENCY`."""
+        kwargs.setdefault("size", _env_int(SESSIONS_ENV, DEFAULT_POOL_SIZE))
+        kwargs.setdefault("max_concurrency", _env_int(SESSION_CONCURRENCY_ENV, DEFAULT_SESSION_CONCURRENCY))
+        return cls(server_params, **kwargs)
+
+    @property
+    def started(self) -> bool:
+        return bool(self._supervisors)
+
+    @property
+    def ready(self) -> bool:
+        return any(s.ready.is_set() for s in self.sessions)
+
+    async def start(self, wait: bool = True) -> None:
+        """Spawn the supervisors (once) and, with `wait`, wait for a ready session."""
+        if not self._supervisors:
+            # No await before this point, so concurrent callers cannot both get here
+            self._closing = False
+            self._supervisors = [asyncio.create_task(self._supervise(s), name=f"mcp-session-{s.index}")
+                                 for s in self.sessions]
+            log.info("mcp_pool_starting", extra={"fields": {"sessions": self.size,
+                                                             "max_concurrency": self.max_concurrency}})
+        if wait:
+            await self._wait_ready(self.init_timeout)
+
+    def on_tools_changed(self, listener: Callable[[list[Tool]], None]) -> None:
+        """Call `listener(tools)` whenever the server's tool list changes."""
+        self._tools_listeners.append(listener)
+
+    async def refresh_tools(self, session: ClientSession) -> list[Tool]:
+        """List the server's tools (all pages) and publish them if they changed."""
+        tools: list[Tool] = []
+        cursor = None
+        while True:
+            result = await (session.list_tools(cursor) if cursor else session.list_tools())
+            tools.extend(result.tools)
+            cursor = result.nextCursor
+            if not cursor:
+                break
+        self.tools_refreshed += 1
+        if self.tools is None or [t.model_dump() for t in tools] != [t.model_dump() for t in self.tools]:
+            self.tools = tools
+            log.info("mcp_tools_listed", extra={"fields": {"tools": [t.name for t in tools]}})
+            for listener in self._tools_listeners:
+                listener(tools)
+        return tools
+
+    def _message_handler(self, pooled: PooledSession):
+        async def handle(message) -> None:
+            if isinstance(message, ServerNotification) and isinstance(message.root, ToolListChangedNotification):
+                # Not awaited here: this runs on the session's receive loop,
+                # which has to read the tools/list response
+                session = pooled.session
+                if session is not None:
+                    task = asyncio.create_task(self._refresh_after_change(session))
+                    self._refreshes.add(task)
+                    task.add_done_callback(self._refreshes.discard)
+        return handle
+
+    async def _refresh_after_change(self, session: ClientSession) -> None:
+        try:
+            await asyncio.wait_for(self.refresh_tools(session), self.init_timeout)
+        except Exception as e:
+            log.warning("mcp_tools_refresh_failed", extra={"fields": {"error": _describe(e)}})
+
+    async def close(self) -> None:
+        """Stop the supervisors; each one closes its session and server."""
+        self._closing = True
+        supervisors, self._supervisors = self._supervisors, []
+        for task in supervisors:
+            task.cancel()
+        await asyncio.gather(*supervisors, return_exceptions=True)
+
+    @contextlib.asynccontextmanager
+    async def _transport(self):
+        """(read, write) streams to the server: a new subprocess or HTTP connection."""
+        if isinstance(self.server_params, str):
+            async with streamablehttp_client(self.server_params) as (read, write, _session_id):
+                yield read, write
+        else:
+            async with stdio_client(self.server_params) as (read, write):
+                yield read, write
+
+    async def _supervise(self, pooled: PooledSession) -> None:
+        backoff = self.min_backoff
+        while not self._closing:
+            pooled.state = "starting"
+            pooled.broken.clear()
+            started = time.monotonic()
+            try:
+                async with self._transport() as (read, write):
+                    async with ClientSession(read, write,
+                                             message_handler=self._message_handler(pooled)) as session:
+                        await asyncio.wait_for(session.initialize(), self.init_timeout)
+                        await asyncio.wait_for(self.refresh_tools(session), self.init_timeout)
+                        pooled.session = session
+                        pooled.started_at = time.time()
+                        pooled.ping_failures = 0
+                        pooled.state = "ready"
+                        pooled.ready.set()
+                        log.info("mcp_session_ready", extra={"fields": {"session": pooled.index,
+                                                                         "restarts": pooled.restarts}})
+                        await self._monitor(pooled, session)
+            except asyncio.CancelledError:
+                if self._closing:
+                    break
+                raise
+            except Exception as e:
+                pooled.last_error = _describe(e)
+                log.warning("mcp_session_failed", extra={"fields": {"session": pooled.index,
+                                                                     "error": pooled.last_error}})
+            finally:
+                pooled.ready.clear()
+                pooled.session = None
+                pooled.state = "closed" if self._closing else "restarting"
+            if self._closing:
+                break
+            if time.monotonic() - started >= self.max_backoff:
+                backoff = self.min_backoff
+            pooled.restarts += 1
+            log.info("mcp_session_restarting", extra={"fields": {"session": pooled.index,
+                                                                  "backoff": backoff}})
+            await asyncio.sleep(backoff)
+            backoff = min(self.max_backoff, backoff * 2)
+
+    async def _monitor(self, pooled: PooledSession, session: ClientSession) -> None:
+        """Ping until the session looks dead, then return so it is restarted."""
+        while True:
+            try:
+                await asyncio.wait_for(pooled.broken.wait(), self.ping_interval)
+                raise ConnectionError("MCP server connection closed")
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await asyncio.wait_for(session.send_ping(), self.ping_timeout)
+                pooled.ping_failures = 0
+            except asyncio.TimeoutError:
+                pooled.ping_failures += 1
+                pooled.last_error = "ping timed out"
+                if pooled.ping_failures >= self.failure_threshold:
+                    raise ConnectionError(f"{pooled.ping_failures} pings timed out") from None
+            # Any other ping error (closed pipe, server gone) ends the session right away
+
+    async def _wait_ready(self, timeout: float) -> None:
+        if self.ready:
+            return
+        waiters = [asyncio.ensure_future(s.ready.wait()) for s in self.sessions]
+        try:
+            done, _ = await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        if not done:
+            raise MCPUnavailableError(f"No MCP session ready after {timeout:.1f}s")
+
+    def _pick(self) -> Optional[PooledSession]:
+        ready = [s for s in self.sessions if s.ready.is_set()]
+        if not ready:
+            return None
+        return min(ready, key=lambda s: (s.in_flight, s.calls))
+
+    async def call_tool(self, name: str, arguments: dict, meta: Optional[dict] = None) -> CallToolResult:
+        """Run one tool call on the least busy session.
+
+        A call that could not be sent (the session broke first) is retried
+        once on another session; a call that may have reached the server is
+        not, since the tool might not be idempotent.
+        """
+        await self.start(wait=False)
+        for attempt in range(2):
+            pooled = self._pick()
+            if pooled is None:
+                await self._wait_ready(self.init_timeout)
+                pooled = self._pick()
+                if pooled is None:
+                    raise MCPUnavailableError("No MCP session ready")
+            pooled.in_flight += 1
+            try:
+                async with pooled.semaphore:
+                    session = pooled.session
+                    if session is None:
+                        continue
+                    pooled.calls += 1
+                    return await session.call_tool(name, arguments=arguments, meta=meta)
+            except _SEND_FAILED as e:
+                pooled.errors += 1
+                pooled.last_error = _describe(e)
+                pooled.ready.clear()
+                pooled.broken.set()
+                if attempt:
+                    raise
+            except McpError as e:
+                pooled.errors += 1
+                if e.error.code == CONNECTION_CLOSED:
+                    # The server went away with the call in flight
+                    pooled.last_error = str(e)
+                    pooled.ready.clear()
+                    pooled.broken.set()
+                raise
+            except Exception:
+                pooled.errors += 1
+                raise
+            finally:
+                pooled.in_flight -= 1
+        raise MCPUnavailableError("No MCP session ready")
+
+    def stats(self) -> dict:
+        return {
+            "sessions": self.size,
+            "ready": sum(s.ready.is_set() for s in self.sessions),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": sum(s.in_flight for s in self.sessions),
+            "calls": sum(s.calls for s in self.sessions),
+            "errors": sum(s.errors for s in self.sessions),
+            "restarts": sum(s.restarts for s in self.sessions),
+            "tools": len(self.tools or []),
+            "tools_refreshed": self.tools_refreshed,
+        }
+
+    def session_stats(self) -> list[dict]:
+        return [s.stats() for s in self.sessions]
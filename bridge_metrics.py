@@ -0,0 +1,257 @@
+"""Prometheus-style metrics for the bridges.
+
+A dependency-free subset of the Prometheus client: counters, gauges and
+histograms with labels, rendered in the text exposition format by
+`MetricsRegistry.render()` for a `/metrics` endpoint.
+
+Recording a sample costs one dict lookup, a `bisect` over the bucket bounds
+and a few additions under a per-metric lock, i.e. around a microsecond.
+State owned by other components (admission queue, backends, caches) is not
+mirrored on the hot path; it is read from their `stats()` by collectors at
+scrape time.
+"""
+import abc
+import bisect
+import math
+import threading
+from typing import Callable, Iterable, Optional
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; llamafile calls range from milliseconds (cached) to minutes
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+ITERATION_BUCKETS = (1, 2, 3, 4, 5, 6, 8, 10)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384)
+
+# A collector returns (name, type, help, [(labels, value), ...]) families
+Sample = tuple[dict, float]
+Family = tuple[str, str, str, list[Sample]]
+
+
+def _format_labels(names: tuple, values: tuple, extra: Optional[tuple] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric(abc.ABC):
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: dict[tuple, object] = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    @abc.abstractmethod
+    def render(self) -> list[str]:
+        """Sample lines in the text exposition format."""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels) if labels else ()
+        with self._lock:
+            self._children[key] = self._children.get(key, 0.0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._children.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels) if labels else ()
+        with self._lock:
+            self._children[key] = self._children.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        key = self._key(labels) if labels else ()
+        with self._lock:
+            self._children[key] = value
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = list(self._children.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                 buckets: Iterable[float] = LATENCY_BUCKETS):
+        super().__init__(name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels) if labels else ()
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                # Per-bucket counts (last slot is +Inf), then sum and count
+                child = self._children[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            child[index] += 1
+            child[-2] += value
+            child[-1] += 1
+
+    def render(self) -> list[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._children.items()]
+        lines = []
+        bounds = self.buckets + (math.inf,)
+        for key, child in items:
+            cumulative = 0
+            for bound, count in zip(bounds, child):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(float(bound))))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(child[-2])}")
+            lines.append(f"{self.name}_count{labels} {child[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds metrics and scrape-time collectors; renders the exposition text."""
+
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name: str, help_text: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self.register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help_text, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            for name, kind, help_text, samples in collector():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    names = tuple(labels)
+                    values = tuple(labels[n] for n in names)
+                    lines.append(f"{name}{_format_labels(names, values)} {_format_value(float(value))}")
+        return "\n".join(lines) + "\n"
+
+
+class BridgeMetrics:
+    """The standard set of bridge metrics, shared by the Flask and FastAPI bridges."""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.request_duration = r.histogram(
+            "bridge_request_duration_seconds", "Total /v1/chat/completions latency", ("status",))
+        self.llamafile_duration = r.histogram(
+            "bridge_llamafile_request_duration_seconds", "Latency of one llamafile call (one loop iteration)",
+            ("backend",))
+        self.queue_wait = r.histogram(
+            "bridge_queue_wait_seconds", "Time an admitted request waited in the admission queue", ("backend",))
+        self.tool_duration = r.histogram(
+            "bridge_tool_duration_seconds", "Tool executor latency", ("tool",))
+        self.iterations = r.histogram(
+            "bridge_iterations_per_request", "Tool-loop iterations per request", ("grammar",),
+            buckets=ITERATION_BUCKETS)
+        self.prompt_tokens = r.histogram(
+            "bridge_prompt_tokens", "Prompt tokens per llamafile call (from usage)", buckets=TOKEN_BUCKETS)
+        self.completion_tokens = r.histogram(
+            "bridge_completion_tokens", "Completion tokens per llamafile call (from usage)", buckets=TOKEN_BUCKETS)
+        self.errors = r.counter(
+            "bridge_errors_total", "Errors by type", ("type",))
+        self.in_flight = r.gauge(
+            "bridge_requests_in_flight", "Requests currently being handled")
+
+    def observe_usage(self, result: dict) -> None:
+        """Record llamafile's token usage from a completion response."""
+        usage = result.get("usage") or {}
+        if "prompt_tokens" in usage:
+            self.prompt_tokens.observe(usage["prompt_tokens"])
+        if "completion_tokens" in usage:
+            self.completion_tokens.observe(usage["completion_tokens"])
+
+    def add_stats(self, prefix: str, stats: Callable[[], Optional[dict]],
+                  label: Optional[str] = None, description: str = "",
+                  counters: Iterable[str] = ()) -> None:
+        """Expose a component's `stats()` dict at scrape time.
+
+        Numeric values become `<prefix>_<key>` gauges, except the monotonic
+        totals named in `counters`, which become `<prefix>_<key>_total`
+        counters so that `rate()` and `increase()` work on them. If `label`
+        is given, `stats()` returns {label_value: {key: value}} (one sample
+        per entry) or a list of dicts that each hold `label`.
+        """
+        counters = frozenset(counters)
+
+        def family(key: str) -> tuple[str, str]:
+            if key not in counters:
+                return f"{prefix}_{key}", "gauge"
+            return f"{prefix}_{key}" if key.endswith("_total") else f"{prefix}_{key}_total", "counter"
+
+        def collect() -> list[Family]:
+            data = stats()
+            if not data:
+                return []
+            if label is None:
+                rows = [({}, data)]
+            elif isinstance(data, dict):
+                rows = [({label: name}, values) for name, values in data.items()]
+            else:
+                rows = [({label: row[label]}, row) for row in data]
+            families: dict[tuple[str, str], list[Sample]] = {}
+            for labels, values in rows:
+                for key, value in values.items():
+                    if isinstance(value, bool):
+                        value = int(value)
+                    if isinstance(value, (int, float)):
+                        families.setdefault(family(key), []).append((labels, value))
+            return [(name, kind, f"{description or prefix}: {name[len(prefix) + 1:]}", samples)
+                    for (name, kind), samples in families.items()]
+
+        self.registry.add_collector(collect)
+
+    def render(self) -> str:
+        return self.registry.render()
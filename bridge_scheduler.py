@@ -0,0 +1,324 @@
+"""Admission control for the MCP bridges.
+
+A llamafile server only has a fixed number of decode slots (its `--parallel`
+setting). Forwarding every bridge request straight away just moves the queue
+into llamafile, where it is invisible and ends in timeouts. The
+`AdmissionController` keeps a bounded, prioritised queue per backend in front
+of llamafile instead:
+
+- at most `max_concurrency` requests per backend run the tool loop at once
+  (override per backend with `backend_limits`);
+- waiting requests are ordered by priority class (interactive before batch)
+  and then by arrival;
+- a request that waits longer than its queue deadline is rejected with 503;
+- a request that arrives while the queue is full is rejected immediately with
+  429. Batch requests are shed once the queue is half full so interactive
+  traffic keeps some headroom.
+
+The controller works from both the threaded Flask bridge (`slot`) and the
+asyncio FastAPI bridge (`async_slot`). Queue depth and wait times are exposed
+through `stats()`; `on_wait(backend, seconds)`, if set, is called with each
+admitted request's queue wait (the bridges feed a histogram with it).
+
+Clients may ask for a shorter or longer queue wait with `X-Queue-Timeout`,
+up to `BRIDGE_MAX_QUEUE_TIMEOUT` seconds (default 120); a value that is not
+a number is rejected with 400.
+"""
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Optional
+
+# Default limits. One llamafile usually runs with a handful of slots.
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_QUEUE_TIMEOUT = 30.0
+# Longest queue wait a client can ask for with X-Queue-Timeout
+MAX_QUEUE_TIMEOUT_ENV = "BRIDGE_MAX_QUEUE_TIMEOUT"
+DEFAULT_MAX_QUEUE_TIMEOUT = 120.0
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+PRIORITIES = {PRIORITY_INTERACTIVE: 0, PRIORITY_BATCH: 1}
+
+# Request headers understood by the bridges
+PRIORITY_HEADER = "X-Priority"
+QUEUE_TIMEOUT_HEADER = "X-Queue-Timeout"
+
+
+class AdmissionError(Exception):
+    """Base class for requests rejected by the admission controller."""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(AdmissionError):
+    """The backend queue is saturated; the request was not queued at all."""
+    status_code = 429
+
+
+class QueueTimeoutError(AdmissionError):
+    """The request waited in the queue past its deadline."""
+    status_code = 503
+
+
+class AdmissionHeaderError(ValueError):
+    """An admission header has a value that cannot be used."""
+    status_code = 400
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "enqueued_at", "granted", "cancelled", "event", "future", "loop")
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.cancelled = False
+        self.event: Optional[threading.Event] = None
+        self.future: Optional[asyncio.Future] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+    def wake(self) -> None:
+        if self.event is not None:
+            self.event.set()
+        elif self.future is not None and self.loop is not None:
+            self.loop.call_soon_threadsafe(_resolve_future, self.future)
+
+
+def _resolve_future(future: asyncio.Future) -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _BackendQueue:
+    """Slots, waiters and counters for one backend."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self.waiters: list[_Waiter] = []
+        self.queued = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_wait(self, waited: float) -> None:
+        self.admitted += 1
+        self.wait_time_total += waited
+        if waited > self.wait_time_max:
+            self.wait_time_max = waited
+
+
+class AdmissionController:
+    """Bounded priority queue with a concurrency limit per backend.
+
+    Thread-safe: a single controller can be shared between Flask worker
+    threads and between event loops.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+                 max_queue: int = DEFAULT_MAX_QUEUE,
+                 queue_timeout: float = DEFAULT_QUEUE_TIMEOUT,
+                 backend_limits: Optional[dict[str, int]] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.backend_limits = dict(backend_limits or {})
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._backends: dict[str, _BackendQueue] = {}
+        self.on_wait: Optional[Callable[[str, float], None]] = None
+
+    def _observe_wait(self, backend: str, waited: float) -> None:
+        if self.on_wait is not None:
+            self.on_wait(backend, waited)
+
+    def _backend(self, backend: str) -> _BackendQueue:
+        state = self._backends.get(backend)
+        if state is None:
+            state = _BackendQueue(self.backend_limits.get(backend, self.max_concurrency))
+            self._backends[backend] = state
+        return state
+
+    def _try_admit(self, backend: str, priority: str) -> tuple[_BackendQueue, Optional[_Waiter]]:
+        """Admit immediately, enqueue a waiter, or raise QueueFullError.
+
+        Must be called with the lock held. Returns (state, None) when the
+        request got a slot straight away.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority class: {priority}")
+        state = self._backend(backend)
+        if state.active < state.limit and state.queued == 0:
+            state.active += 1
+            state.record_wait(0.0)
+            return state, None
+
+        limit = self.max_queue if priority == PRIORITY_INTERACTIVE else self.max_queue // 2
+        if state.queued >= limit:
+            state.rejected_full += 1
+            raise QueueFullError(f"Backend {backend} is saturated ({state.active} running, "
+                                 f"{state.queued} queued)")
+
+        waiter = _Waiter(PRIORITIES[priority], next(self._seq))
+        heapq.heappush(state.waiters, waiter)
+        state.queued += 1
+        return state, waiter
+
+    def _abandon(self, backend: str, state: _BackendQueue, waiter: _Waiter) -> bool:
+        """Give up on a waiter after a timeout or cancellation.
+
+        Returns True if the slot was granted in the meantime, in which case
+        the caller owns it and must release it.
+        """
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            state.queued -= 1
+            state.rejected_timeout += 1
+            return False
+
+    def release(self, backend: str) -> None:
+        """Release a slot and hand it to the next waiter, if any."""
+        with self._lock:
+            state = self._backend(backend)
+            while state.waiters:
+                waiter = heapq.heappop(state.waiters)
+                if waiter.cancelled:
+                    continue
+                # Hand the slot over directly: `active` stays the same.
+                waiter.granted = True
+                state.queued -= 1
+                state.record_wait(time.monotonic() - waiter.enqueued_at)
+                waiter.wake()
+                return
+            state.active -= 1
+
+    def acquire(self, backend: str = "default", priority: str = PRIORITY_INTERACTIVE,
+                timeout: Optional[float] = None) -> None:
+        """Block until a slot for `backend` is available (threaded callers)."""
+        with self._lock:
+            state, waiter = self._try_admit(backend, priority)
+            if waiter is not None:
+                waiter.event = threading.Event()
+        if waiter is None:
+            self._observe_wait(backend, 0.0)
+            return
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        if waiter.event.wait(timeout) or self._abandon(backend, state, waiter):
+            self._observe_wait(backend, time.monotonic() - waiter.enqueued_at)
+            return
+        raise QueueTimeoutError(f"Timed out after {timeout:.1f}s waiting for backend {backend}")
+
+    async def acquire_async(self, backend: str = "default", priority: str = PRIORITY_INTERACTIVE,
+                            timeout: Optional[float] = None) -> None:
+        """Wait until a slot for `backend` is available (asyncio callers)."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            state, waiter = self._try_admit(backend, priority)
+            if waiter is not None:
+                waiter.loop = loop
+                waiter.future = loop.create_future()
+        if waiter is None:
+            self._observe_wait(backend, 0.0)
+            return
+
+        timeout = self.queue_timeout if timeout is None else timeout
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            self._observe_wait(backend, time.monotonic() - waiter.enqueued_at)
+            return
+        except asyncio.TimeoutError:
+            if self._abandon(backend, state, waiter):
+                self._observe_wait(backend, time.monotonic() - waiter.enqueued_at)
+                return
+            raise QueueTimeoutError(f"Timed out after {timeout:.1f}s waiting for backend {backend}")
+        except asyncio.CancelledError:
+            # Client went away while queued: pass the slot on if we got it.
+            if self._abandon(backend, state, waiter):
+                self.release(backend)
+            raise
+
+    @contextmanager
+    def slot(self, backend: str = "default", priority: str = PRIORITY_INTERACTIVE,
+             timeout: Optional[float] = None):
+        self.acquire(backend, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(backend)
+
+    @asynccontextmanager
+    async def async_slot(self, backend: str = "default", priority: str = PRIORITY_INTERACTIVE,
+                         timeout: Optional[float] = None):
+        await self.acquire_async(backend, priority, timeout)
+        try:
+            yield
+        finally:
+            self.release(backend)
+
+    def stats(self) -> dict:
+        """Return queue depth, in-flight count and wait-time counters per backend."""
+        with self._lock:
+            return {
+                backend: {
+                    "limit": state.limit,
+                    "active": state.active,
+                    "queued": state.queued,
+                    "admitted": state.admitted,
+                    "rejected_full": state.rejected_full,
+                    "rejected_timeout": state.rejected_timeout,
+                    "wait_seconds_total": round(state.wait_time_total, 6),
+                    "wait_seconds_max": round(state.wait_time_max, 6),
+                }
+                for backend, state in self._backends.items()
+            }
+
+
+def max_queue_timeout() -> float:
+    """Longest queue wait clients may request (`BRIDGE_MAX_QUEUE_TIMEOUT`)."""
+    try:
+        return float(os.environ.get(MAX_QUEUE_TIMEOUT_ENV) or DEFAULT_MAX_QUEUE_TIMEOUT)
+    except ValueError:
+        return DEFAULT_MAX_QUEUE_TIMEOUT
+
+
+def parse_admission_headers(headers, max_timeout: Optional[float] = None) -> tuple[str, Optional[float]]:
+    """Read the priority class and queue timeout from request headers.
+
+    Unknown priority values fall back to interactive. The timeout is clamped
+    to [0, `max_timeout`] (default `max_queue_timeout()`); a value that is
+    not a finite number raises AdmissionHeaderError.
+    """
+    priority = (headers.get(PRIORITY_HEADER) or PRIORITY_INTERACTIVE).strip().lower()
+    if priority not in PRIORITIES:
+        priority = PRIORITY_INTERACTIVE
+    timeout = None
+    raw_timeout = headers.get(QUEUE_TIMEOUT_HEADER)
+    if raw_timeout:
+        try:
+            timeout = float(raw_timeout)
+        except ValueError:
+            timeout = math.nan
+        if not math.isfinite(timeout):
+            raise AdmissionHeaderError(f"{QUEUE_TIMEOUT_HEADER} must be a number of seconds, got {raw_timeout!r}")
+        limit = max_queue_timeout() if max_timeout is None else max_timeout
+        timeout = min(limit, max(0.0, timeout))
+    return priority, timeout
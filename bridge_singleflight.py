@@ -0,0 +1,196 @@
+"""Single-flight de-duplication of identical in-flight completions.
+
+Batch jobs and retrying clients often send byte-identical
+`/v1/chat/completions` bodies at the same moment. `SingleFlight` lets the
+first such request (the leader) run the tool loop while every identical
+request that arrives before it finishes (the followers) waits and receives
+the leader's result. Nothing is cached once the leader completes; see the
+response cache for that.
+
+Only requests whose answer does not depend on sampling are coalesced by
+default (temperature 0 or a fixed seed). Clients can opt in or out per
+request with the `X-Coalesce` header.
+"""
+import asyncio
+import json
+import threading
+from typing import Any, Awaitable, Callable, Optional
+
+COALESCE_HEADER = "X-Coalesce"
+COALESCED_RESPONSE_HEADER = "X-Coalesced"
+
+
+def canonical_body(body: dict) -> str:
+    """Serialize a request body so that equivalent bodies compare equal."""
+    return json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+def is_deterministic(body: dict) -> bool:
+    """True if the request asks for a reproducible completion."""
+    if body.get("seed") is not None:
+        return True
+    temperature = body.get("temperature")
+    return temperature is not None and float(temperature) == 0.0
+
+
+def should_coalesce(body: dict, headers) -> bool:
+    """Decide whether a request may share an upstream execution.
+
+    `X-Coalesce: 1` opts in, `X-Coalesce: 0` opts out; otherwise only
+    deterministic requests are coalesced.
+    """
+    flag = (headers.get(COALESCE_HEADER) or "").strip().lower()
+    if flag in ("1", "true", "yes"):
+        return True
+    if flag in ("0", "false", "no"):
+        return False
+    return is_deterministic(body)
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "followers")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+
+
+class _AsyncCall:
+    __slots__ = ("task", "followers", "leader_waiting")
+
+    def __init__(self, task: asyncio.Future):
+        self.task = task
+        self.followers = 0
+        self.leader_waiting = True
+
+
+class SingleFlight:
+    """Collapse concurrent calls with the same key into one execution.
+
+    `cost` maps a result to the number of upstream (llamafile) calls it took,
+    so `stats()` can report how many upstream calls coalescing saved.
+    """
+
+    def __init__(self, cost: Optional[Callable[[Any], int]] = None):
+        self._cost = cost or (lambda result: 1)
+        self._lock = threading.Lock()
+        self._calls: dict[str, _Call] = {}
+        self._async_calls: dict[str, _AsyncCall] = {}
+        self.executions = 0
+        self.coalesced = 0
+        self.upstream_calls_saved = 0
+
+    def _record_followers(self, followers: int, result: Any) -> None:
+        if followers:
+            cost = self._cost(result)
+            with self._lock:
+                self.upstream_calls_saved += followers * cost
+
+    def do(self, key: str, fn: Callable[[], Any], deadline=None) -> tuple[Any, bool]:
+        """Run `fn` once per key among concurrent threaded callers.
+
+        Returns (result, shared) where `shared` is True for followers.
+        Exceptions raised by the leader are re-raised in every follower.
+        A follower waits no longer than its own `deadline` (a
+        `bridge_deadline.Deadline`) allows; `deadline.check()` then raises
+        DeadlineExceeded in that follower while the leader keeps running.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                call.followers += 1
+                self.coalesced += 1
+                leader = False
+            else:
+                call = _Call()
+                self._calls[key] = call
+                self.executions += 1
+                leader = True
+
+        if not leader:
+            try:
+                while not call.event.wait(deadline.check() if deadline is not None else None):
+                    pass
+            except BaseException:
+                with self._lock:
+                    call.followers -= 1
+                raise
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+        self._record_followers(call.followers, call.result)
+        return call.result, False
+
+    async def do_async(self, key: str, fn: Callable[[], Awaitable[Any]], deadline=None) -> tuple[Any, bool]:
+        """Asyncio variant of `do` for callers on a single event loop.
+
+        The shared work runs in its own task, so cancelling one caller
+        (its client went away) aborts only that caller; the work is
+        cancelled once no caller is left waiting for it.
+        """
+        call = self._async_calls.get(key)
+        leader = call is None
+        if leader:
+            call = _AsyncCall(asyncio.ensure_future(fn()))
+            self._async_calls[key] = call
+            self.executions += 1
+            call.task.add_done_callback(lambda task: self._async_done(key, call, task))
+        else:
+            call.followers += 1
+            self.coalesced += 1
+        try:
+            while True:
+                timeout = deadline.check() if deadline is not None else None
+                try:
+                    # shield: a caller going away must not cancel the shared task
+                    result = await asyncio.wait_for(asyncio.shield(call.task), timeout)
+                    break
+                except asyncio.TimeoutError:
+                    if call.task.done():
+                        # The work itself timed out (or finished as the wait did)
+                        result = call.task.result()
+                        break
+        except BaseException:
+            if not call.task.done():
+                if leader:
+                    call.leader_waiting = False
+                else:
+                    call.followers -= 1
+                if not call.leader_waiting and not call.followers:
+                    call.task.cancel()
+            raise
+        return result, not leader
+
+    def _async_done(self, key: str, call: _AsyncCall, task: asyncio.Future) -> None:
+        if self._async_calls.get(key) is call:
+            del self._async_calls[key]
+        if task.cancelled():
+            return
+        if task.exception() is None:
+            self._record_followers(call.followers, task.result())
+
+    def followers(self, key: str) -> int:
+        """Number of callers waiting on the in-flight execution for `key`."""
+        with self._lock:
+            call = self._calls.get(key) or self._async_calls.get(key)
+            return call.followers if call is not None else 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "executions": self.executions,
+                "coalesced": self.coalesced,
+                "upstream_calls_saved": self.upstream_calls_saved,
+            }
@@ -0,0 +1,195 @@
+"""Request tracing for the bridges and the MCP server.
+
+A slow story request can spend its time in prefill, decode, a slow tool or
+simply in too many loop iterations. Spans make that visible:
+
+- `chat.completions`: one per `/v1/chat/completions` request;
+- `tool_loop.iteration`: one per loop iteration;
+- `llamafile.chat_completion`: one per upstream llamafile call;
+- `tool.call`: one per tool execution, and `mcp_server.call_tool` on the
+  server side of the stdio hop when the tool runs in `mcp_server.py`.
+
+Context is propagated with W3C `traceparent` values: taken from the incoming
+HTTP request, sent to llamafile as a header and to the MCP server in the
+`_meta` of `tools/call`.
+
+Spans are written to `BRIDGE_TRACE_FILE` (or the path given to
+`configure_tracing`) in the Chrome trace event format, which chrome://tracing,
+Perfetto (ui.perfetto.dev) and speedscope open as a flame graph. Every process
+appends complete events to the same file; the trailing `]` is optional in
+that format, so the file stays valid while the bridge is running. When no
+trace file is configured `span()` does nothing.
+
+Usage::
+
+    with span("llamafile.chat_completion", backend=url) as s:
+        response = requests.post(url, json=body, headers=inject_traceparent({}))
+        set_attributes(s, prompt_tokens=...)
+"""
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import NamedTuple, Optional
+
+TRACE_FILE_ENV = "BRIDGE_TRACE_FILE"
+TRACEPARENT_HEADER = "traceparent"
+
+
+class SpanContext(NamedTuple):
+    """Identity of a span, local or received from another process."""
+    trace_id: str
+    span_id: str
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_us", "start_ns", "attributes")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: dict):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        # Wall clock for alignment across processes, monotonic for the duration
+        self.start_us = time.time_ns() // 1000
+        self.start_ns = time.perf_counter_ns()
+        self.attributes = attributes
+
+    @property
+    def traceparent(self) -> str:
+        return format_traceparent(self)
+
+
+class ChromeTraceExporter:
+    """Append spans as Chrome trace "complete" events to a JSON file."""
+
+    def __init__(self, path: str, service: Optional[str] = None):
+        self.path = path
+        self.service = service or os.path.basename(sys.argv[0]) or "python"
+        self._lock = threading.Lock()
+        self._fd: Optional[int] = None
+
+    def _open(self) -> int:
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if os.fstat(fd).st_size == 0:
+            os.write(fd, b"[\n")
+        metadata = {"name": "process_name", "ph": "M", "pid": os.getpid(), "args": {"name": self.service}}
+        os.write(fd, (json.dumps(metadata) + ",\n").encode("utf-8"))
+        return fd
+
+    def export(self, span: Span, duration_ns: int) -> None:
+        event = {
+            "name": span.name,
+            "cat": span.name.split(".", 1)[0],
+            "ph": "X",
+            "ts": span.start_us,
+            "dur": duration_ns / 1000,
+            "pid": os.getpid(),
+            # One track per trace, so concurrent requests do not interleave
+            "tid": int(span.trace_id[:8], 16),
+            "args": {"trace_id": span.trace_id, "span_id": span.span_id,
+                     "parent_id": span.parent_id, **span.attributes},
+        }
+        line = (json.dumps(event, ensure_ascii=False, default=str) + ",\n").encode("utf-8")
+        with self._lock:
+            if self._fd is None:
+                self._fd = self._open()
+            # A single O_APPEND write keeps lines from several processes intact
+            os.write(self._fd, line)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+_current: contextvars.ContextVar[Optional[SpanContext]] = contextvars.ContextVar("bridge_span", default=None)
+_exporter: Optional[ChromeTraceExporter] = None
+_configured = False
+
+
+def configure_tracing(path: Optional[str] = None, service: Optional[str] = None) -> None:
+    """Write spans to `path` (default: `BRIDGE_TRACE_FILE`); no path disables tracing."""
+    global _exporter, _configured
+    path = path or os.environ.get(TRACE_FILE_ENV)
+    if _exporter is not None:
+        _exporter.close()
+    _exporter = ChromeTraceExporter(path, service) if path else None
+    _configured = True
+
+
+def tracing_enabled() -> bool:
+    if not _configured:
+        configure_tracing()
+    return _exporter is not None
+
+
+def format_traceparent(context) -> str:
+    return f"00-{context.trace_id.rjust(32, '0')}-{context.span_id}-01"
+
+
+def parse_traceparent(value: Optional[str]) -> Optional[SpanContext]:
+    """Parse a W3C `traceparent` value; invalid values yield None."""
+    if not value:
+        return None
+    parts = value.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return SpanContext(parts[1], parts[2])
+
+
+def current_traceparent() -> Optional[str]:
+    context = _current.get()
+    return format_traceparent(context) if context else None
+
+
+def inject_traceparent(headers: dict) -> dict:
+    """Add the current `traceparent` to outgoing headers (returns `headers`)."""
+    context = _current.get()
+    if context is not None:
+        headers[TRACEPARENT_HEADER] = format_traceparent(context)
+    return headers
+
+
+def set_attributes(span: Optional[Span], **attributes) -> None:
+    """Attach attributes to a span; a no-op when tracing is disabled."""
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+@contextmanager
+def span(name: str, parent: Optional[SpanContext] = None, **attributes):
+    """Record a span around the block; yields the `Span` (or None when disabled).
+
+    The parent is `parent` if given (e.g. from `parse_traceparent`), else
+    the enclosing span of the current context; without either a new trace
+    is started.
+    """
+    if not tracing_enabled():
+        yield None
+        return
+    parent = parent or _current.get()
+    current = Span(name, parent.trace_id if parent else secrets.token_hex(16),
+                   parent.span_id if parent else None, attributes)
+    token = _current.set(SpanContext(current.trace_id, current.span_id))
+    try:
+        yield current
+    except BaseException as e:
+        current.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        exporter = _exporter
+        if exporter is not None:
+            exporter.export(current, time.perf_counter_ns() - current.start_ns)
@@ -116,7 +116,9 @@ async def main(prompt, query, llm_ip, port, timeout, file, show_welcome: bool =
             temperature=0.7,
             max_tokens=600,  # Limit response length for faster generation
             max_retries=2,
-            request_timeout=300.0  # type: ignore
+            request_timeout=300.0,  # type: ignore
+            # Tell the bridge the same budget so it stops when this client gives up
+            default_headers={"X-Request-Timeout": "300"}
         )
 
         print("Requesting answer from llamafile via MCP bridge...\n")
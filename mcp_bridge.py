@@ -1,84 +1,214 @@
 import asyncio
+import importlib
 import json
+import logging
+import os
+import shlex
+import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, List, Optional
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from mcp import StdioServerParameters
+from mcp.client.stdio import get_default_environment
 from fastapi import FastAPI, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 import uvicorn
 import httpx
 
+from bridge_backends import Backend, BackendPool, NoHealthyBackendError
+from bridge_batch import (BATCH_ID_HEADER, CONTENT_TYPE as BATCH_CONTENT_TYPE, DEFAULT_BATCH_CONCURRENCY, BatchError,
+                          BatchManager)
+from bridge_deadline import (DEFAULT_TOOL_TIMEOUT, MIN_CALL_SECONDS, ClientDisconnected, Deadline, DeadlineExceeded,
+                             DecodeRate, default_request_timeout, parse_deadline_header)
+from bridge_json import CONTENT_TYPE as JSON_CONTENT_TYPE, dumps as json_dumps, loads as json_loads
+from bridge_mcp_pool import MCPSessionPool, MCPUnavailableError, ServerParams
+from bridge_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, BridgeMetrics
+from bridge_logging import REQUEST_ID_HEADER, dump_request_log, get_logger, log_event, request_log_context
+from bridge_scheduler import (PRIORITY_BATCH, AdmissionController, AdmissionError, AdmissionHeaderError,
+                              parse_admission_headers)
+from bridge_tracing import (TRACE_FILE_ENV, TRACEPARENT_HEADER, current_traceparent, inject_traceparent,
+                            parse_traceparent, set_attributes, span)
+from bridge_singleflight import COALESCED_RESPONSE_HEADER, SingleFlight, canonical_body, should_coalesce
+from mcp_server import InProcessExecutor
+from tool_prefetch import PREFETCH_HEADER, Prefetch, ToolPrefetcher
+from tool_registry import ToolCatalog
+from tool_validation import ToolArgumentError
+
+log = get_logger(__name__)
+
 app = FastAPI()
 
-# Global MCP session
-mcp_session: Optional[ClientSession] = None
-mcp_streams = None
-mcp_init_task = None
 
-# Llamafile backend
+class ToolLoopResult(NamedTuple):
+    """Outcome of one run of the tool loop."""
+    payload: Dict[str, Any]
+    status: int
+    llm_calls: int
+    # Upstream body of `payload`, forwarded as is when set
+    raw: Optional[bytes] = None
+
+
+# The server's event loop, for batch workers running on threads
+event_loop: Optional[asyncio.AbstractEventLoop] = None
+
+# Llamafile backend (default when LLAMAFILE_BACKENDS is not set)
 LLAMAFILE_URL = "http://localhost:8080"
 
-async def initialize_mcp():
-    """Initialize MCP client connection"""
-    global mcp_session, mcp_streams
-    
-    print("Initializing MCP server...")
-    server_path = Path(__file__).parent / "mcp_server.py"
-    server_params = StdioServerParameters(
-        command="python",
-        args=[str(server_path)],
-        env=None
+# Llamafile backends, balanced by outstanding requests and health-probed
+backend_pool = BackendPool.from_env(default_url=LLAMAFILE_URL)
+
+# Admission control in front of llamafile (bounded queue + concurrency limit)
+scheduler = AdmissionController(backend_limits=backend_pool.slot_limits())
+
+# Identical concurrent requests share one tool loop; cost = llamafile calls
+coalescer = SingleFlight(cost=lambda result: result.llm_calls)
+
+# End-to-end budget per request (shortened per request with X-Request-Timeout)
+REQUEST_TIMEOUT = default_request_timeout()
+TOOL_TIMEOUT = DEFAULT_TOOL_TIMEOUT
+# How often a running request checks whether its client went away
+DISCONNECT_POLL_INTERVAL = 0.5
+
+# Completion tokens per second per backend, for capping max_tokens
+decode_rate = DecodeRate()
+
+# Tools that are safe to run speculatively (comma-separated); empty = no prefetch
+PREFETCH_TOOLS = [name.strip() for name in os.environ.get("BRIDGE_PREFETCH_TOOLS", "").split(",") if name.strip()]
+
+# One llamafile HTTP client for the whole app (keep-alive pool), created at startup
+http_client: Optional[httpx.AsyncClient] = None
+# HTTP/2 to the backends ("1" to enable; needs `pip install httpx[http2]`)
+HTTP2_ENV = "BRIDGE_HTTP2"
+HTTP_MAX_CONNECTIONS = 64
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 32
+HTTP_KEEPALIVE_EXPIRY = 30.0
+
+# MCP server the session pool runs (command line); defaults to the example tools
+MCP_SERVER_ENV = "BRIDGE_MCP_SERVER"
+# In-process tools instead: "module:attribute" naming a `create_mcp_server` mapping
+MCP_TOOLS_ENV = "BRIDGE_MCP_TOOLS"
+
+# Prometheus metrics, served at /metrics
+metrics = BridgeMetrics()
+scheduler.on_wait = lambda backend, waited: metrics.queue_wait.observe(waited, backend=backend)
+metrics.add_stats("bridge_queue", scheduler.stats, label="backend", description="Admission queue",
+                  counters=("admitted", "rejected_full", "rejected_timeout", "wait_seconds_total"))
+metrics.add_stats("bridge_backend", backend_pool.stats, label="url", description="Llamafile backend")
+metrics.add_stats("bridge_coalescing", coalescer.stats, description="Request coalescing",
+                  counters=("executions", "coalesced", "upstream_calls_saved"))
+metrics.add_stats("bridge_decode", decode_rate.stats, label="backend", description="Llamafile decode rate")
+
+def create_http_client() -> httpx.AsyncClient:
+    """Pooled client for llamafile calls, shared by all requests"""
+    http2 = os.environ.get(HTTP2_ENV, "").strip().lower() in ("1", "true", "yes", "on")
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            log.warning("http2_unavailable", extra={"fields": {"hint": "pip install httpx[http2]"}})
+            http2 = False
+    return httpx.AsyncClient(
+        http2=http2,
+        timeout=httpx.Timeout(30.0, connect=5.0),
+        limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS,
+                            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY)
     )
-    
-    try:
-        mcp_streams = stdio_client(server_params)
-        read, write = await mcp_streams.__aenter__()
-        
-        session = ClientSession(read, write)
-        await session.initialize()
-        mcp_session = session
-        
-        print("✓ MCP server initialized successfully")
-        return session
-    except Exception as e:
-        print(f"✗ Error initializing MCP: {e}")
-        import traceback
-        traceback.print_exc()
-        raise
+
+def get_http_client() -> httpx.AsyncClient:
+    """The shared client (created on first use when the app runs without startup events)"""
+    global http_client
+    if http_client is None:
+        http_client = create_http_client()
+    return http_client
+
+def mcp_server_params() -> ServerParams:
+    """MCP server to use: `BRIDGE_MCP_SERVER`, a command or an http(s):// URL, or `mcp_server.py`"""
+    value = os.environ.get(MCP_SERVER_ENV, "").strip()
+    if value.startswith(("http://", "https://")):
+        # A shared streamable HTTP server (mcp_server.start_mcp_http_server)
+        return value
+    command = shlex.split(value)
+    if not command:
+        command = [sys.executable, str(Path(__file__).parent / "mcp_server.py")]
+    # The server inherits only a minimal environment; pass the trace file on
+    env = None
+    if os.environ.get(TRACE_FILE_ENV):
+        env = {**get_default_environment(), TRACE_FILE_ENV: os.environ[TRACE_FILE_ENV]}
+    return StdioServerParameters(command=command[0], args=command[1:], env=env)
+
+def load_in_process_tools() -> Optional[InProcessExecutor]:
+    """Executor for the mapping named by `BRIDGE_MCP_TOOLS`, or None to use the pool"""
+    spec = os.environ.get(MCP_TOOLS_ENV, "").strip()
+    if not spec:
+        return None
+    module_name, _, attribute = spec.partition(":")
+    return InProcessExecutor(getattr(importlib.import_module(module_name), attribute or "tools"))
+
+# Tools of our own codebase run in-process, without stdio or JSON-RPC
+local_tools = load_in_process_tools()
+if local_tools is not None:
+    metrics.add_stats("bridge_tool_cache", local_tools.cache.stats, description="Tool result cache",
+                      counters=("hits", "misses", "evictions"))
+    metrics.add_stats("bridge_tool_cache_tool", local_tools.cache.tool_stats, label="tool",
+                      description="Tool result cache", counters=("hits", "misses", "expired"))
+
+# Supervised MCP server sessions (BRIDGE_MCP_SESSIONS, BRIDGE_MCP_SESSION_CONCURRENCY)
+mcp_pool = MCPSessionPool.from_env(mcp_server_params())
+metrics.add_stats("bridge_mcp", mcp_pool.stats, description="MCP session pool",
+                  counters=("calls", "errors", "restarts", "tools_refreshed"))
+metrics.add_stats("bridge_mcp_session", mcp_pool.session_stats, label="session", description="MCP session",
+                  counters=("calls", "errors", "restarts"))
 
 async def call_mcp_tool(tool_name: str, arguments: dict) -> str:
-    """Call an MCP tool and return the result"""
-    if mcp_session is None:
-        await initialize_mcp()
-    
-    result = await mcp_session.call_tool(tool_name, arguments=arguments) # type: ignore
+    """Call an MCP tool (in-process, or on the least busy pooled session) and return the result"""
+    if local_tools is not None:
+        return await local_tools.call_async(tool_name, arguments)
+    # The trace context crosses the stdio hop in the request's _meta
+    traceparent = current_traceparent()
+    meta = {TRACEPARENT_HEADER: traceparent} if traceparent else None
+    result = await mcp_pool.call_tool(tool_name, arguments, meta=meta)
     return result.content[0].text # type: ignore
 
-def format_tools_for_openai() -> List[Dict[str, Any]]:
-    """Format MCP tools as OpenAI function definitions"""
-    return [
-        {
-            "type": "function",
-            "function": {
-                "name": "get_elf_name",
-                "description": "Returns a randomly generated typical elf name from Tolkien's legendarium",
-                "parameters": {
-                    "type": "object",
-                    "properties": {
-                        "count": {
-                            "type": "integer",
-                            "description": "Number of elf names to generate",
-                            "default": 1
-                        }
-                    },
-                    "required": []
-                }
-            }
-        }
-    ]
-
-async def process_tool_calls(messages: List[Dict], response_message: Dict) -> List[Dict]:
+# The MCP tools as OpenAI functions (and their JSON), converted once per tools/list
+tool_catalog = ToolCatalog(local_tools.tool_definitions if local_tools is not None else ())
+
+async def current_tools() -> List[Dict[str, Any]]:
+    """Tools to offer the model, discovered when the first MCP session starts"""
+    if local_tools is None and mcp_pool.tools is None:
+        # A session is ready only once its tools are listed
+        await mcp_pool.start()
+    return tool_catalog.functions
+
+def encode_llm_body(body: Dict[str, Any]) -> bytes:
+    """Llamafile request body; injected tool definitions are spliced in pre-serialized"""
+    functions, functions_json = tool_catalog.snapshot()
+    if not functions or body.get("tools") is not functions:
+        return json_dumps(body)
+    rest = json_dumps({key: value for key, value in body.items() if key != "tools"})
+    return rest[:-1] + (b',"tools":' if len(rest) > 2 else b'"tools":') + functions_json + b"}"
+
+# Calls spelled out in the prompt start in parallel with the first llamafile call
+prefetcher = ToolPrefetcher(tool_catalog.tools, allow=PREFETCH_TOOLS)
+metrics.add_stats("bridge_prefetch", prefetcher.stats, description="Speculative tool prefetch",
+                  counters=("started", "hits", "wasted"))
+
+def update_tools(tools: list) -> None:
+    """New tools/list result (session start or notifications/tools/list_changed)"""
+    tool_catalog.update(tools)
+    prefetcher.set_tools(tools)
+
+mcp_pool.on_tools_changed(update_tools)
+metrics.add_stats("bridge_tools", tool_catalog.stats, description="Discovered MCP tools")
+
+def run_prefetch(name: str, arguments: dict) -> asyncio.Task:
+    async def call():
+        with span("tool.prefetch", tool=name):
+            return await call_mcp_tool(name, arguments)
+    return asyncio.ensure_future(call())
+
+async def process_tool_calls(messages: List[Dict], response_message: Dict, deadline: Deadline,
+                             speculation: Optional[Prefetch] = None) -> List[Dict]:
     """Process tool calls from LLM response and add results to messages"""
     if "tool_calls" not in response_message:
         return messages
@@ -89,12 +219,53 @@ async def process_tool_calls(messages: List[Dict], response_message: Dict) -> Li
     # Execute each tool call
     for tool_call in response_message["tool_calls"]:
         function_name = tool_call["function"]["name"]
-        function_args = json.loads(tool_call["function"]["arguments"])
-        
-        print(f"Executing MCP tool: {function_name} with args: {function_args}")
+        try:
+            function_args = json.loads(tool_call["function"]["arguments"] or "{}")
+        except ValueError:
+            # Not JSON: validation reports it to the model below
+            function_args = tool_call["function"]["arguments"]
         
+        log_event(log, logging.DEBUG, "tool_call", payload=True, tool=function_name, arguments=function_args)
+
+        # Arguments are checked and coerced before dispatch; the model gets
+        # what to fix as the tool result instead of a failed call
+        try:
+            function_args = tool_catalog.validate(function_name, function_args)
+        except ToolArgumentError as e:
+            metrics.errors.inc(type="tool_arguments")
+            log_event(log, logging.WARNING, "tool_arguments_invalid", tool=function_name, problems=e.problems)
+            messages.append({
+                "role": "tool",
+                "tool_call_id": tool_call["id"],
+                "name": function_name,
+                "content": f"TOOL_ERROR: {e} Call {function_name} again with corrected arguments."
+            })
+            continue
+
         # Call the MCP tool
-        result = await call_mcp_tool(function_name, function_args)
+        with span("tool.call", tool=function_name) as tool_span:
+            timeout = deadline.tool_budget(TOOL_TIMEOUT)
+            started = time.perf_counter()
+            try:
+                prefetched = speculation.pop(function_name, function_args) if speculation else None
+                if prefetched is not None:
+                    set_attributes(tool_span, prefetched=True)
+                    log_event(log, logging.DEBUG, "tool_prefetch_hit", tool=function_name)
+                    result = await asyncio.wait_for(prefetched, timeout)
+                else:
+                    result = await asyncio.wait_for(call_mcp_tool(function_name, function_args), timeout)
+            except asyncio.TimeoutError:
+                # The model answers without this tool instead of failing the request
+                metrics.errors.inc(type="tool_timeout")
+                set_attributes(tool_span, error="timeout")
+                log_event(log, logging.WARNING, "tool_call_timed_out", tool=function_name, timeout=round(timeout, 3))
+                result = f"TOOL_ERROR: Tool '{function_name}' timed out after {timeout:.1f}s"
+            except Exception:
+                metrics.errors.inc(type="tool")
+                raise
+            finally:
+                metrics.tool_duration.observe(time.perf_counter() - started, tool=function_name)
+        log_event(log, logging.DEBUG, "tool_result", payload=True, tool=function_name, result=result[:300])
         
         # Add tool response to messages
         messages.append({
@@ -106,111 +277,317 @@ async def process_tool_calls(messages: List[Dict], response_message: Dict) -> Li
     
     return messages
 
-@app.post("/v1/chat/completions")
-async def chat_completions(request: Request):
-    """Proxy chat completions with MCP tool support"""
-    try:
-        body = await request.json()
-        
-        # Add tools to the request if not present
-        if "tools" not in body:
-            body["tools"] = format_tools_for_openai()
-        
-        # Enable tool calling - "auto" lets the model decide when to use tools
-        if "tool_choice" not in body:
-            body["tool_choice"] = "auto"
-        
-        messages = body.get("messages", [])
-        max_iterations = 5
+async def run_tool_loop(body: Dict[str, Any], backend: Backend, deadline: Deadline,
+                        speculation: Optional[Prefetch] = None) -> ToolLoopResult:
+    """Run the tool-calling loop against one pinned llamafile backend.
+
+    Raises DeadlineExceeded
+    or ClientDisconnected when it has to stop early.
+    """
+    messages = body.get("messages", [])
+    max_iterations = 5
+    
+    # Backend health comes from the pool's background probes, not a per-request round trip
+    client = get_http_client()
+    for iteration in range(max_iterations):
+        with span("tool_loop.iteration", iteration=iteration + 1):
+            log_event(log, logging.DEBUG, "llm_request", iteration=iteration + 1, backend=backend.url,
+                      messages=len(messages), tools=len(body.get("tools", [])),
+                      tool_choice=body.get("tool_choice"))
         
-        # Test llamafile connection first
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                test_response = await client.get(f"{LLAMAFILE_URL}/v1/models")
-                print(f"Llamafile connection OK: {test_response.status_code}")
-            except Exception as e:
-                return JSONResponse(
-                    content={"error": f"Cannot connect to llamafile at {LLAMAFILE_URL}: {str(e)}"},
-                    status_code=503
-                )
-            
-            for iteration in range(max_iterations):
-                print(f"\n=== Iteration {iteration + 1} ===")
-                print(f"Sending {len(messages)} messages to llamafile")
-                print(f"Tools available: {len(body.get('tools', []))}")
-                print(f"Tool choice: {body.get('tool_choice', 'not set')}")
-                
-                # Call llamafile
+            # Lowered only if the backend can't decode that much before the deadline
+            max_tokens = decode_rate.max_tokens(backend.url, deadline.llm_budget(), body.get("max_tokens"))
+            llm_body = body if max_tokens is None else {**body, "max_tokens": max_tokens}
+
+            # Call llamafile
+            with span("llamafile.chat_completion", backend=backend.url, messages=len(messages)) as llm_span:
+                started = time.perf_counter()
                 try:
                     response = await client.post(
-                        f"{LLAMAFILE_URL}/v1/chat/completions",
-                        json=body,
-                        timeout=300.0
+                        f"{backend.url}/v1/chat/completions",
+                        content=encode_llm_body(llm_body),
+                        headers=inject_traceparent({"Content-Type": JSON_CONTENT_TYPE}),
+                        timeout=deadline.check(MIN_CALL_SECONDS)
                     )
                     response.raise_for_status()
+                except httpx.ReadTimeout:
+                    # The backend is alive, the request ran out of time
+                    set_attributes(llm_span, error="deadline")
+                    raise DeadlineExceeded(f"Request deadline of {deadline.timeout:.1f}s exceeded "
+                                           f"waiting for llamafile") from None
+                except httpx.ConnectError as e:
+                    # Down since the last probe; counts towards ejecting it
+                    backend_pool.mark_failure(backend, str(e))
+                    metrics.errors.inc(type="llamafile")
+                    set_attributes(llm_span, error=str(e))
+                    log_event(log, logging.ERROR, "llamafile_unreachable", backend=backend.url, error=str(e))
+                    return ToolLoopResult({"error": f"Cannot connect to llamafile at {backend.url}: {str(e)}"},
+                                          503, iteration + 1)
                 except httpx.HTTPError as e:
-                    return JSONResponse(
-                        content={"error": f"Llamafile request failed: {str(e)}"},
-                        status_code=502
-                    )
-                
-                result = response.json()
-                response_message = result["choices"][0]["message"]
-                
-                print(f"Response message keys: {response_message.keys()}")
-                print(f"Response message content preview: {response_message.get('content', '')[:200]}")
-                print(f"Has tool_calls: {'tool_calls' in response_message}")
-                if 'tool_calls' in response_message:
-                    print(f"Tool calls: {response_message['tool_calls']}")
-                
-                # Check if there are tool calls
-                if "tool_calls" in response_message and response_message["tool_calls"]:
-                    print(f"Tool calls detected: {len(response_message['tool_calls'])}")
-                    
-                    # Process tool calls and update messages
-                    messages = await process_tool_calls(messages, response_message)
-                    body["messages"] = messages
-                    
-                    # Continue to next iteration to get final response
-                    continue
-                else:
-                    # No more tool calls, return the response
-                    print("No tool calls, returning final response")
-                    return JSONResponse(content=result)
+                    if not isinstance(e, httpx.HTTPStatusError) or e.response.status_code >= 500:
+                        backend_pool.mark_failure(backend, str(e))
+                    metrics.errors.inc(type="llamafile")
+                    set_attributes(llm_span, error=str(e))
+                    log_event(log, logging.ERROR, "llamafile_request_failed", backend=backend.url, error=str(e))
+                    dump_request_log(log)
+                    return ToolLoopResult({"error": f"Llamafile request failed: {str(e)}"}, 502, iteration + 1)
+                backend_pool.mark_success(backend)
+                duration = time.perf_counter() - started
+                metrics.llamafile_duration.observe(duration, backend=backend.url)
+        
+                # Parsed once from bytes; the final answer is forwarded without re-encoding
+                result = json_loads(response.content)
+                metrics.observe_usage(result)
+                decode_rate.observe(backend.url, (result.get("usage") or {}).get("completion_tokens"), duration)
+                set_attributes(llm_span, **(result.get("usage") or {}))
+
+            response_message = result["choices"][0]["message"]
+        
+            log_event(log, logging.DEBUG, "llm_response", payload=True, iteration=iteration + 1,
+                      preview=(response_message.get("content") or "")[:200],
+                      tool_calls=response_message.get("tool_calls"))
+        
+            # Check if there are tool calls
+            if "tool_calls" in response_message and response_message["tool_calls"]:
+                # Process tool calls and update messages
+                messages = await process_tool_calls(messages, response_message, deadline, speculation)
+                body["messages"] = messages
             
-            # Max iterations reached
+                # Continue to next iteration to get final response
+                continue
+            else:
+                # No more tool calls, return the response
+                log_event(log, logging.INFO, "request_complete", iterations=iteration + 1)
+                return ToolLoopResult(result, 200, iteration + 1, response.content)
+    
+    # Max iterations reached
+    metrics.errors.inc(type="max_iterations")
+    log_event(log, logging.WARNING, "max_iterations_reached", iterations=max_iterations)
+    dump_request_log(log)
+    return ToolLoopResult({"error": "Maximum tool call iterations reached"}, 500, max_iterations)
+
+async def run_until_disconnected(request: Request, work, disconnected: asyncio.Event,
+                                 can_stop) -> Any:
+    """Await `work`, cancelling it when the client disconnects and `can_stop()`.
+
+    Cancelling closes the connection to llamafile, which stops generating.
+    """
+    task = asyncio.ensure_future(work)
+
+    async def watch():
+        while not await request.is_disconnected():
+            await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+        disconnected.set()
+        if can_stop():
+            task.cancel()
+
+    watcher = asyncio.create_task(watch())
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if task.cancelled() and disconnected.is_set():
+            raise ClientDisconnected("Client disconnected") from None
+        raise
+    finally:
+        watcher.cancel()
+
+async def complete(body: Dict[str, Any], priority: str, queue_timeout: Optional[float],
+                   deadline: Deadline, use_prefetch: bool = False) -> ToolLoopResult:
+    """Lease a backend and an admission slot, then run the tool loop"""
+    # Queue wait counts against the deadline
+    queue_timeout = deadline.queue_timeout(scheduler.queue_timeout if queue_timeout is None else queue_timeout)
+    # Pin one backend for the whole tool loop (prefix-cache locality)
+    with backend_pool.lease(body.get("model")) as backend:
+        async with scheduler.async_slot(backend.url, priority=priority, timeout=queue_timeout):
+            # Predicted calls run while llamafile works on the first turn
+            speculation = prefetcher.start(body.get("messages", []), run_prefetch) if use_prefetch else None
+            try:
+                result = await run_tool_loop(body, backend, deadline, speculation)
+            finally:
+                if speculation is not None:
+                    speculation.close()
+    metrics.iterations.observe(result.llm_calls, grammar="off")
+    return result
+
+def run_batch_item(body: Dict[str, Any]) -> Tuple[Dict[str, Any], int]:
+    """One batch item (on a worker thread): batch priority and its own deadline"""
+    future = asyncio.run_coroutine_threadsafe(
+        complete(body, PRIORITY_BATCH, None, Deadline(REQUEST_TIMEOUT), prefetcher.enabled), event_loop)
+    outcome = future.result()
+    return outcome.payload, outcome.status
+
+# /v1/batch jobs: BRIDGE_BATCH_CONCURRENCY items per backend
+batches = BatchManager(
+    run_batch_item,
+    workers=int(os.environ.get("BRIDGE_BATCH_CONCURRENCY", DEFAULT_BATCH_CONCURRENCY)) * len(backend_pool.backends)
+)
+metrics.add_stats("bridge_batch", batches.stats, description="Batch jobs",
+                  counters=("items_completed", "items_failed"))
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    """Proxy chat completions with MCP tool support"""
+    started = time.perf_counter()
+    status = 500
+    metrics.in_flight.inc()
+    try:
+        with request_log_context(request.headers.get(REQUEST_ID_HEADER)) as request_id, \
+                span("chat.completions", parent=parse_traceparent(request.headers.get(TRACEPARENT_HEADER)),
+                     request_id=request_id) as request_span:
+            response = await handle_chat_completion(request)
+            response.headers[REQUEST_ID_HEADER] = request_id
+            status = response.status_code
+            set_attributes(request_span, status=status)
+            return response
+    finally:
+        metrics.in_flight.dec()
+        metrics.request_duration.observe(time.perf_counter() - started, status=status)
+
+async def handle_chat_completion(request: Request) -> JSONResponse:
+    try:
+        try:
+            body = await request.json()
+        except ValueError as e:
+            metrics.errors.inc(type="bad_request")
+            return JSONResponse(content={"error": f"Request body is not valid JSON: {e}"}, status_code=400)
+        if not isinstance(body, dict):
+            metrics.errors.inc(type="bad_request")
+            return JSONResponse(content={"error": "Request body must be a JSON object"}, status_code=400)
+
+        try:
+            # Add tools to the request if not present; discovering them may
+            # wait for the first MCP session (503 when none comes up)
+            if "tools" not in body:
+                body["tools"] = await current_tools()
+
+            # Enable tool calling - "auto" lets the model decide when to use tools
+            if "tool_choice" not in body:
+                body["tool_choice"] = "auto"
+
+            try:
+                priority, queue_timeout = parse_admission_headers(request.headers)
+            except AdmissionHeaderError as e:
+                return JSONResponse(content={"error": str(e)}, status_code=e.status_code)
+            use_prefetch = prefetcher.enabled
+            if prefetcher.enabled and request.headers.get(PREFETCH_HEADER):
+                use_prefetch = request.headers[PREFETCH_HEADER].strip().lower() in ("1", "true", "yes", "on")
+            key = canonical_body(body) if should_coalesce(body, request.headers) else None
+            disconnected = asyncio.Event()
+
+            def client_gone() -> bool:
+                # A shared loop keeps running while followers still wait for it
+                return disconnected.is_set() and not (key and coalescer.followers(key))
+
+            deadline = Deadline(parse_deadline_header(request.headers, REQUEST_TIMEOUT), is_cancelled=client_gone)
+
+            async def run():
+                if key is not None:
+                    return await coalescer.do_async(
+                        key, lambda: complete(body, priority, queue_timeout, deadline, use_prefetch), deadline)
+                return await complete(body, priority, queue_timeout, deadline, use_prefetch), False
+
+            outcome, shared = await run_until_disconnected(request, run(), disconnected, client_gone)
+        except DeadlineExceeded as e:
+            metrics.errors.inc(type="deadline")
+            log_event(log, logging.WARNING, "deadline_exceeded", timeout=deadline.timeout,
+                      elapsed=round(deadline.elapsed(), 3), error=str(e))
+            return JSONResponse(content={"error": str(e)}, status_code=e.status_code)
+        except ClientDisconnected as e:
+            metrics.errors.inc(type="client_disconnected")
+            log_event(log, logging.INFO, "client_disconnected", elapsed=round(deadline.elapsed(), 3))
+            return JSONResponse(content={"error": str(e)}, status_code=e.status_code)
+        except MCPUnavailableError as e:
+            metrics.errors.inc(type="mcp_unavailable")
+            log_event(log, logging.WARNING, "mcp_unavailable", error=str(e))
+            return JSONResponse(content={"error": str(e)}, status_code=e.status_code)
+        except NoHealthyBackendError as e:
+            metrics.errors.inc(type="no_backend")
+            log_event(log, logging.WARNING, "no_healthy_backend", error=str(e))
+            return JSONResponse(content={"error": str(e)}, status_code=e.status_code)
+        except AdmissionError as e:
+            metrics.errors.inc(type=type(e).__name__)
+            log_event(log, logging.WARNING, "admission_rejected", status=e.status_code, error=str(e))
             return JSONResponse(
-                content={"error": "Maximum tool call iterations reached"},
-                status_code=500
+                content={"error": str(e)},
+                status_code=e.status_code,
+                headers={"Retry-After": str(int(e.retry_after))}
             )
-    
+
+        headers = {COALESCED_RESPONSE_HEADER: "1"} if shared else None
+        if outcome.raw is not None:
+            return Response(content=outcome.raw, status_code=outcome.status, media_type=JSON_CONTENT_TYPE,
+                            headers=headers)
+        return JSONResponse(content=outcome.payload, status_code=outcome.status, headers=headers)
+
     except Exception as e:
-        print(f"Error in chat_completions: {e}")
-        import traceback
-        traceback.print_exc()
+        metrics.errors.inc(type="internal")
+        log.exception("chat_completions_failed")
+        dump_request_log(log)
         return JSONResponse(
             content={"error": f"Internal error: {str(e)}"},
             status_code=500
         )
 
+@app.post("/v1/batch")
+async def create_batch(request: Request):
+    """Run (or resume) a JSONL batch; results stream back as JSONL"""
+    text = (await request.body()).decode("utf-8")
+    try:
+        job = batches.submit(text, request.headers.get(BATCH_ID_HEADER))
+    except BatchError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=e.status_code)
+    # The job keeps running if the client goes away; the stream only follows it
+    return StreamingResponse(job.follow(), media_type=BATCH_CONTENT_TYPE, headers={BATCH_ID_HEADER: job.id})
+
+@app.get("/v1/batch/{job_id}")
+async def batch_status(job_id: str):
+    """Progress of a batch job"""
+    try:
+        return batches.get(job_id).status()
+    except BatchError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=e.status_code)
+
+@app.get("/v1/batch/{job_id}/results")
+async def batch_results(job_id: str):
+    """Results of a batch job so far, following it while it runs"""
+    try:
+        job = batches.get(job_id)
+    except BatchError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=e.status_code)
+    return StreamingResponse(job.follow(), media_type=BATCH_CONTENT_TYPE, headers={BATCH_ID_HEADER: job.id})
+
 @app.get("/health")
 async def health():
     """Health check"""
     return {
         "status": "ok",
-        "mcp_initialized": mcp_session is not None
+        "mcp_initialized": local_tools is not None or mcp_pool.ready,
+        "mcp": {"in_process": True} if local_tools is not None else mcp_pool.stats(),
+        "scheduler": scheduler.stats(),
+        "backends": backend_pool.stats(),
+        "coalescing": coalescer.stats(),
+        "deadline": {
+            "request_timeout": REQUEST_TIMEOUT,
+            "tool_timeout": TOOL_TIMEOUT,
+            "decode_rate": decode_rate.stats()
+        },
+        "prefetch": dict(prefetcher.stats(), enabled=prefetcher.enabled),
+        "batch": batches.stats()
     }
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics"""
+    return Response(content=metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/v1/models")
 async def list_models():
     """Proxy models endpoint"""
-    print("Received /v1/models request")
     try:
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            response = await client.get(f"{LLAMAFILE_URL}/v1/models")
-            return JSONResponse(content=response.json())
+        response = await get_http_client().get(f"{backend_pool.pick().url}/v1/models", timeout=10.0)
+        return Response(content=response.content, media_type=JSON_CONTENT_TYPE)
     except Exception as e:
-        print(f"Error proxying models: {e}")
+        log.warning("models_proxy_failed", extra={"fields": {"error": str(e)}})
         return JSONResponse(
             content={"error": f"Cannot reach llamafile: {str(e)}"},
             status_code=503
@@ -218,29 +595,32 @@ async def list_models():
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize MCP on startup - but don't block"""
-    global mcp_init_task
-    print("FastAPI startup - scheduling MCP initialization...")
-    # Initialize MCP in background
-    mcp_init_task = asyncio.create_task(initialize_mcp())
+    """Start the MCP session pool on startup - but don't block"""
+    global event_loop, http_client
+    log.info("startup")
+    event_loop = asyncio.get_running_loop()
+    http_client = create_http_client()
+    backend_pool.start()
+    # Sessions start in the background; early tool calls wait for the first one
+    if local_tools is None:
+        await mcp_pool.start(wait=False)
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup MCP on shutdown"""
-    global mcp_streams
-    print("Shutting down...")
-    if mcp_streams:
-        try:
-            await mcp_streams.__aexit__(None, None, None)
-        except Exception as e:
-            print(f"Error closing MCP: {e}")
+    log.info("shutdown")
+    backend_pool.stop()
+    if http_client is not None:
+        await http_client.aclose()
+    await mcp_pool.close()
 
 if __name__ == "__main__":
     print("=" * 60)
     print("MCP Bridge Server")
     print("=" * 60)
     print(f"Bridge:    http://127.0.0.1:8081")
-    print(f"Llamafile: {LLAMAFILE_URL}")
+    for backend in backend_pool.backends:
+        print(f"Llamafile: {backend.url} (model={backend.model or '*'}, weight={backend.weight})")
     print("=" * 60)
     print("\nStarting server...\n")
     
@@ -4,9 +4,22 @@ Example runner for the generic MCP bridge.
 This script contains the story-generation example that used to live in
 `mcp_bridge_simple.py`'s `__main__` block. It defines the local example tools
 and starts the Flask bridge using the library's factory.
+
+`python mcp_bridge_example.py --mcp-server` serves the same tools as an MCP
+stdio server instead (the server `mcp_bridge.py` spawns by default), and
+`python mcp_bridge_example.py --mcp-http [PORT]` as a streamable HTTP server
+at `http://127.0.0.1:PORT/mcp` (default port 8765).
 """
+import asyncio
 import random
+import sys
+from functools import partial
+
+from mcp.types import Tool, ToolAnnotations
+
 from mcp_bridge_flask import run_bridge, LLAMAFILE_URL
+from mcp_server import DEFAULT_HTTP_PORT, InProcessExecutor, start_mcp_http_server, start_mcp_server
+from tool_registry import ToolRegistry
 
 first_names = ["Luis"]
 last_names = ["Agulló"]
@@ -44,6 +57,39 @@ events = [
     "faces a challenge that tests their deepest beliefs"
 ]
 
+# Tool schemas (the same `Tool` objects `mcp_server.create_mcp_server` takes):
+# listed in the system prompt and used to build the grammar that constrains
+# the model's TOOL_CALL lines. They have no side effects, so calls written
+# out in a prompt may be prefetched.
+READ_ONLY = ToolAnnotations(readOnlyHint=True)
+
+example_tools = [
+    Tool(
+        name="get_elf_name",
+        description="Generate random elf names",
+        inputSchema={
+            "type": "object",
+            "properties": {"count": {"type": "integer", "description": "Number of names", "default": 1}},
+        },
+        annotations=READ_ONLY,
+    ),
+    Tool(
+        name="get_location_description",
+        description="Describe a location in Middle-earth",
+        inputSchema={
+            "type": "object",
+            "properties": {"style": {"type": "string", "enum": ["brief", "detailed"], "default": "brief"}},
+        },
+        annotations=READ_ONLY,
+    ),
+    Tool(
+        name="get_random_event",
+        description="Pick a random story event",
+        inputSchema={"type": "object", "properties": {}},
+        annotations=READ_ONLY,
+    ),
+]
+
 
 def local_executor(tool_name: str, arguments: dict) -> str:
     if tool_name == "get_elf_name":
@@ -60,9 +106,25 @@ def local_executor(tool_name: str, arguments: dict) -> str:
     if tool_name == "get_random_event":
         return random.choice(events)
 
-    return f"UNKNOWN_TOOL: {tool_name}"
+    # The registry rejects unknown names before dispatch
+    raise ValueError(f"Unknown tool: {tool_name}")
+
+
+# The same tools as an `mcp_server` mapping: name -> {'tool': Tool, 'handler': callable}
+example_mapping = {tool.name: {"tool": tool, "handler": partial(local_executor, tool.name)} for tool in example_tools}
 
 
 if __name__ == "__main__":
+    if "--mcp-server" in sys.argv[1:]:
+        asyncio.run(start_mcp_server(example_mapping, server_name="elf-name-server"))
+        sys.exit(0)
+    if "--mcp-http" in sys.argv[1:]:
+        rest = sys.argv[sys.argv.index("--mcp-http") + 1:]
+        port = int(rest[0]) if rest else DEFAULT_HTTP_PORT
+        asyncio.run(start_mcp_http_server(example_mapping, server_name="elf-name-server", port=port))
+        sys.exit(0)
     print("Starting example bridge on http://127.0.0.1:8081 using local example tools")
-    run_bridge(host="127.0.0.1", port=8081, llamafile_url=LLAMAFILE_URL, mcp_executor=local_executor)
+    # Same tools and handlers as the MCP server mode, called in-process
+    executor = InProcessExecutor(example_mapping)
+    registry = ToolRegistry(executor.tool_definitions, executor=executor)
+    run_bridge(host="127.0.0.1", port=8081, llamafile_url=LLAMAFILE_URL, tools=registry, prefetch=True)
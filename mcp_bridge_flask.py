@@ -7,11 +7,11 @@ the library can be imported without Flask/requests installed. Use
 to run it as a standalone service.
 """
 import json
-import re
-import subprocess
-import sys
+import logging
+import threading
+import time
 from pathlib import Path
-from typing import Optional
+from typing import NamedTuple, Optional
 # Flask is imported lazily inside create_bridge_app so the module can be imported
 # even when Flask is not installed. This makes the library usable without the
 # web framework for programmatic use.
@@ -20,39 +20,76 @@ try:
 except Exception:  # pragma: no cover - optional dependency
     requests = None
 
-
-# Llamafile backend
+from bridge_backends import BackendPool, NoHealthyBackendError
+from bridge_batch import (BATCH_ID_HEADER, CONTENT_TYPE as BATCH_CONTENT_TYPE, DEFAULT_BATCH_CONCURRENCY, BatchError,
+                          BatchManager)
+from bridge_cache import CACHE_STATUS_HEADER, cache_directives
+from bridge_compaction import compact_messages, context_window_from_env, prompt_budget
+from bridge_json import CONTENT_TYPE as JSON_CONTENT_TYPE, loads as json_loads
+from bridge_deadline import (DEFAULT_TOOL_TIMEOUT, MIN_CALL_SECONDS, ClientDisconnected, Deadline, DeadlineExceeded,
+                             DecodeRate, ToolTimeout, call_with_timeout, default_request_timeout,
+                             parse_deadline_header, socket_disconnected, submit_tool, tool_pool_stats, wait_tool)
+from bridge_mcp_executor import MCPClientExecutor
+from bridge_metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, BridgeMetrics
+from bridge_logging import REQUEST_ID_HEADER, dump_request_log, get_logger, log_event, request_log_context
+from bridge_scheduler import (PRIORITY_BATCH, AdmissionController, AdmissionError, AdmissionHeaderError,
+                              parse_admission_headers)
+from bridge_tracing import TRACEPARENT_HEADER, inject_traceparent, parse_traceparent, set_attributes, span
+from bridge_singleflight import COALESCED_RESPONSE_HEADER, SingleFlight, canonical_body, should_coalesce
+from tool_cache import ToolResultCache
+from tool_call_parser import parse_tool_call
+from tool_prefetch import PREFETCH_HEADER, Prefetch, ToolPrefetcher
+from tool_registry import ToolRegistry, UnknownToolError
+from tool_validation import ToolArgumentError
+
+log = get_logger(__name__)
+
+# Llamafile backend (default when LLAMAFILE_BACKENDS is not set)
 LLAMAFILE_URL = "http://localhost:8080"
 
-# MCP server process (optional subprocess starter kept for compatibility)
-mcp_process = None
+# Response header reporting prompt tokens removed by history compaction
+TOKENS_SAVED_HEADER = "X-Prompt-Tokens-Saved"
+ITERATIONS_HEADER = "X-Tool-Iterations"
+# Per-request override of grammar-constrained tool selection ("1" / "0")
+GRAMMAR_HEADER = "X-Tool-Grammar"
+
+
+class ToolLoopResult(NamedTuple):
+    """Outcome of one run of the tool loop."""
+    payload: dict
+    status: int
+    llm_calls: int
+    tokens_saved: int = 0
+    # Upstream body of `payload`, forwarded as is when set
+    raw: Optional[bytes] = None
 
-def start_mcp_server_subprocess():
-    """Start the MCP server as a subprocess using the local mcp_server.py
-    (kept for backward compatibility with older workflows).
+# Persistent MCP client started by `start_mcp_server_subprocess`
+mcp_client: Optional[MCPClientExecutor] = None
+
+def start_mcp_server_subprocess(script: Optional[str] = None, *args: str) -> MCPClientExecutor:
+    """Run an MCP stdio server behind a persistent client and make it the default executor.
+
+    `script` defaults to the local mcp_server.py (kept for backward
+    compatibility with older workflows; it exposes no tools, so pass e.g.
+    `"mcp_bridge_example.py", "--mcp-server"`). Call it before
+    `create_bridge_app`.
     """
-    global mcp_process
-    if mcp_process is None:
-        server_path = Path(__file__).parent / "mcp_server.py"
-        print(f"Starting MCP server: {server_path}", file=sys.stderr)
-        mcp_process = subprocess.Popen(
-            ["python", str(server_path)],
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1
-        )
-        print("✓ MCP server started", file=sys.stderr)
+    global mcp_client, mcp_tool_executor
+    if mcp_client is None:
+        server_path = script or str(Path(__file__).parent / "mcp_server.py")
+        log.info("mcp_server_starting", extra={"fields": {"path": server_path}})
+        mcp_client = MCPClientExecutor.for_script(server_path, *args).start(wait=False)
+        mcp_tool_executor = mcp_client
+    return mcp_client
 
 def call_mcp_tool_stub(tool_name: str, arguments: dict) -> str:
     """Stub function for MCP tool calls used when no tool executor is provided.
 
     This function simply returns a diagnostic string and should be replaced
-    by an actual MCP tool executor (for example, calling `start_mcp_server` /
-    talking to stdio, or sending requests to a running MCP process).
+    by an actual MCP tool executor (for example a `MCPClientExecutor`, or
+    `start_mcp_server_subprocess()`).
     """
-    print(f"[MCP-STUB] No tool executor configured. Called: {tool_name} with {arguments}", file=sys.stderr)
+    log_event(log, logging.WARNING, "mcp_stub_called", tool=tool_name, arguments=arguments)
     return f"MCP_STUB_RESULT: {tool_name}({arguments})"
 
 
@@ -93,119 +130,336 @@ Assistant: Here's your character: [use the provided name] in [use the provided l
 """
 
 def extract_tool_call(text: str) -> Optional[tuple[str, dict]]:
-    """Extract tool call from LLM response"""
+    """Extract the first tool call from an LLM response"""
     # Look for: TOOL_CALL: function_name(arg1=value1, arg2=value2)
-    pattern = r'TOOL_CALL:\s*(\w+)\((.*?)\)'
-    match = re.search(pattern, text, re.IGNORECASE | re.MULTILINE)
-    
-    if not match:
+    call = parse_tool_call(text)
+    if call is None:
         return None
-    
-    function_name = match.group(1)
-    args_str = match.group(2).strip()
-    
-    arguments = {}
-    if args_str:
-        # Parse: arg=value, arg=value
-        for arg_pair in args_str.split(','):
-            if '=' in arg_pair:
-                key, value = arg_pair.split('=', 1)
-                key = key.strip()
-                value = value.strip()
-                # Try to convert to int
-                try:
-                    value = int(value)
-                except ValueError:
-                    value = value.strip('"\'')
-                arguments[key] = value
-    
-    print(f"[PARSE] Extracted: {function_name}({arguments})", file=sys.stderr)
-    return function_name, arguments
-
-def create_bridge_app(llamafile_url: str = LLAMAFILE_URL, mcp_executor=None):
+
+    log_event(log, logging.DEBUG, "tool_call_parsed", payload=True, tool=call.name, arguments=call.arguments)
+    return call.name, call.arguments
+
+def create_bridge_app(llamafile_url: str = LLAMAFILE_URL, mcp_executor=None, scheduler=None,
+                      backends=None, cache=None, context_window: Optional[int] = None,
+                      tools=None, tool_grammar: bool = False, request_timeout: Optional[float] = None,
+                      tool_timeout: float = DEFAULT_TOOL_TIMEOUT, prefetch: bool = False,
+                      batch_concurrency: int = DEFAULT_BATCH_CONCURRENCY, batch_dir: Optional[str] = None):
     """Factory that creates and returns a Flask app wired to the bridge handlers.
 
     This avoids importing Flask at module import time; callers who want to run
     the HTTP bridge can call this function.
+
+    `scheduler` is an `AdmissionController` that bounds how many requests run
+    against llamafile at once. A default controller is created when omitted.
+
+    `backends` is a `BackendPool` to balance over several llamafile servers.
+    When omitted the pool is read from `LLAMAFILE_BACKENDS`, falling back to
+    the single `llamafile_url`.
+
+    `cache` is an optional `ResponseCache`; when given, final responses are
+    served from it for repeated (or, with the semantic level, similar)
+    deterministic requests.
+
+    `context_window` is llamafile's context size in tokens (default:
+    `BRIDGE_CONTEXT_WINDOW`). When it is known, prompts are compacted to fit
+    it minus the requested `max_tokens`; otherwise they are sent as they are.
+
+    `tools` is a `ToolRegistry`, or the executor's tool definitions (MCP
+    `Tool` objects or OpenAI function dicts) to build one from. Their
+    signatures are listed in the system prompt, which is rendered and
+    token-counted once here. Calls naming an unknown tool are answered with
+    a TOOL_ERROR listing the valid tools (and the closest one) instead of
+    reaching the executor; only case and separators may differ. Without
+    tools, every call gets that TOOL_ERROR. Arguments are coerced to the
+    tool's schema ("2" -> 2); ones that cannot be are answered with a
+    TOOL_ERROR naming each problem and the expected arguments. With
+    `tool_grammar`, the registry's GBNF grammar is sent to llamafile so
+    every TOOL_CALL it emits names a known tool with well-typed arguments.
+    It is off by default until `benchmarks/bench_tool_grammar.py` shows it
+    pays for its sampling cost; clients can turn it on or off per request
+    with `X-Tool-Grammar: 1|0`. A registry's own `executor` is used when
+    `mcp_executor` is not given.
+
+    `request_timeout` is the end-to-end budget of a request in seconds
+    (default: `BRIDGE_REQUEST_TIMEOUT` or 300); clients can shorten it with
+    `X-Request-Timeout`. It caps queue wait, llamafile calls (timeout and
+    `max_tokens`) and tool calls, each of which also stops after
+    `tool_timeout`. The loop stops early when the client disconnects.
+
+    With `prefetch`, calls to read-only tools (`readOnlyHint`) written out in
+    the prompt, e.g. "Call get_elf_name(count=1)", start in parallel with the
+    first llamafile call; the model's matching call then uses that result.
+    Clients can switch it per request with `X-Tool-Prefetch: 0|1`.
+
+    `mcp_executor` may be an `mcp_server.InProcessExecutor`, which calls the
+    handlers of a `create_mcp_server` tools mapping directly; its `Tool`
+    schemas are used when `tools` is not given. It may also be a
+    `MCPClientExecutor`: a persistent MCP client on a background event loop
+    whose sessions start with the app and whose pool state is reported
+    under `mcp` in `/health`; the registry is rebuilt whenever the server's
+    tool list changes. With either, repeat calls of cacheable tools
+    (`cache_ttl`, see `tool_cache.py`) are served from the executor's LRU;
+    hit rates appear as `bridge_tool_cache_*` in `/metrics`.
+
+    `/v1/batch` runs a JSONL list of chat requests with `batch_concurrency`
+    workers per backend and streams the results back as JSONL. Jobs are
+    persisted under `batch_dir` (default: `BRIDGE_BATCH_DIR` or
+    `batch_jobs/`) and resumed by posting again with the same `X-Batch-Id`.
     """
-    from flask import Flask, request, jsonify
+    from flask import Flask, Response, request, jsonify
+    from werkzeug.exceptions import HTTPException
 
     app = Flask(__name__)
 
-    # Use provided executor or the module-level default
-    executor = mcp_executor or mcp_tool_executor
-
-    @app.route('/v1/chat/completions', methods=['POST'])
-    def chat_completions():
-        """Handle chat completions with simulated tool calling"""
-        try:
-            body = request.get_json()
-            messages = body.get("messages", [])
-
-            # Add system prompt (do not enumerate tools here to keep it generic)
-            enhanced_messages = [
-                {"role": "system", "content": create_system_prompt()}
-            ] + messages
-
-            max_iterations = 5
-
-            for iteration in range(max_iterations):
-                print(f"\n{'='*60}", file=sys.stderr)
-                print(f"Iteration {iteration + 1}/{max_iterations}", file=sys.stderr)
-                print(f"{'='*60}", file=sys.stderr)
+    if tools is None:
+        # An executor that knows its tools (InProcessExecutor, or the MCP
+        # server's tools/list via MCPClientExecutor) defines the registry
+        tools = getattr(mcp_executor, "tool_definitions", None)
+    registry = tools if isinstance(tools, ToolRegistry) else ToolRegistry(tools or [])
+
+    # Use provided executor, the registry's, or the module-level default
+    executor = mcp_executor or registry.executor or mcp_tool_executor
+    mcp_client = executor if isinstance(executor, MCPClientExecutor) else None
+    if mcp_client is not None:
+        mcp_client.start(wait=False)
+    pool = backends or BackendPool.from_env(default_url=llamafile_url)
+    pool.start()
+    admission = scheduler or AdmissionController(backend_limits=pool.slot_limits())
+    request_timeout = request_timeout or default_request_timeout()
+    decode_rate = DecodeRate()
+
+    # Identical concurrent requests share one tool loop; cost = llamafile calls
+    coalescer = SingleFlight(cost=lambda result: result.llm_calls)
+
+    # The prompt and grammars are built once per tool list: tool turns allow
+    # one valid call, the last turn only a final answer
+    registry.render_system_prompt(create_system_prompt)
+    log_event(log, logging.INFO, "tool_registry_ready", tools=len(registry),
+              system_prompt_tokens=registry.system_prompt_tokens)
+    prefetcher = ToolPrefetcher(registry.tools)
+
+    def install_tools(tools) -> None:
+        """Replace the registry (prompt, grammars, validators) for a new tool list."""
+        nonlocal registry
+        rebuilt = ToolRegistry(tools, executor=registry.executor, count_tokens=registry.count_tokens,
+                               suggestion_cutoff=registry.suggestion_cutoff)
+        rebuilt.render_system_prompt(create_system_prompt)
+        # One assignment: a request sees either the old registry or the new one
+        registry = rebuilt
+        prefetcher.set_tools(rebuilt.tools)
+        log_event(log, logging.INFO, "tool_registry_ready", tools=len(rebuilt),
+                  system_prompt_tokens=rebuilt.system_prompt_tokens)
+
+    if mcp_client is not None:
+        # The server's tools/list is the source of truth: follow its changes,
+        # including the first listing when no session was ready at startup
+        mcp_client.pool.on_tools_changed(install_tools)
+        if mcp_client.pool.tools is not None and mcp_client.pool.tools != registry.tools:
+            install_tools(mcp_client.pool.tools)
+
+    if context_window is None:
+        context_window = context_window_from_env()
+    compaction_lock = threading.Lock()
+    compaction_stats = {"requests_compacted": 0, "tokens_saved": 0}
+
+    metrics = BridgeMetrics()
+    admission.on_wait = lambda backend, waited: metrics.queue_wait.observe(waited, backend=backend)
+    metrics.add_stats("bridge_queue", admission.stats, label="backend", description="Admission queue",
+                      counters=("admitted", "rejected_full", "rejected_timeout", "wait_seconds_total"))
+    metrics.add_stats("bridge_backend", pool.stats, label="url", description="Llamafile backend")
+    metrics.add_stats("bridge_coalescing", coalescer.stats, description="Request coalescing",
+                      counters=("executions", "coalesced", "upstream_calls_saved"))
+    metrics.add_stats("bridge_compaction", lambda: dict(compaction_stats), description="History compaction",
+                      counters=("requests_compacted", "tokens_saved"))
+    metrics.add_stats("bridge_decode", decode_rate.stats, label="backend", description="Llamafile decode rate")
+    metrics.add_stats("bridge_tool_pool", tool_pool_stats, description="Tool thread pool",
+                      counters=("abandoned_total",))
+    metrics.add_stats("bridge_prefetch", prefetcher.stats, description="Speculative tool prefetch",
+                      counters=("started", "hits", "wasted"))
+    if mcp_client is not None:
+        metrics.add_stats("bridge_mcp", mcp_client.stats, description="MCP session pool",
+                          counters=("calls", "errors", "restarts", "tools_refreshed"))
+        metrics.add_stats("bridge_mcp_session", mcp_client.pool.session_stats, label="session",
+                          description="MCP session", counters=("calls", "errors", "restarts"))
+    if cache is not None:
+        metrics.add_stats("bridge_cache", cache.stats, description="Response cache",
+                          counters=("hits_exact", "hits_semantic", "misses", "evictions", "skipped_sampled"))
+    tool_cache = getattr(executor, "cache", None)
+    if isinstance(tool_cache, ToolResultCache):
+        # Results of cacheable tools (InProcessExecutor and MCPClientExecutor)
+        metrics.add_stats("bridge_tool_cache", tool_cache.stats, description="Tool result cache",
+                          counters=("hits", "misses", "evictions"))
+        metrics.add_stats("bridge_tool_cache_tool", tool_cache.tool_stats, label="tool",
+                          description="Tool result cache", counters=("hits", "misses", "expired"))
+
+    def run_tool_loop(body: dict, backend, use_grammar: bool = False, deadline: Optional[Deadline] = None,
+                      speculation: Optional[Prefetch] = None) -> ToolLoopResult:
+        """Run the simulated tool-calling loop on one pinned backend.
+
+        Raises DeadlineExceeded or ClientDisconnected when it has to stop early.
+        """
+        deadline = deadline or Deadline(request_timeout)
+        # This request keeps the tools it started with, even if they change meanwhile
+        tool_registry = registry
+        count_tokens = tool_registry.prompt_token_counter()
+        messages = body.get("messages", [])
+        max_tokens = body.get("max_tokens") or 600  # Reasonable limit; also for an explicit null
+        budget = prompt_budget(max_tokens, context_window) if context_window else None
+        tokens_saved = 0
+
+        def finish(payload: dict, status: int, llm_calls: int, raw: Optional[bytes] = None) -> ToolLoopResult:
+            metrics.iterations.observe(llm_calls, grammar="on" if use_grammar else "off")
+            if tokens_saved:
+                with compaction_lock:
+                    compaction_stats["requests_compacted"] += 1
+                    compaction_stats["tokens_saved"] += tokens_saved
+            return ToolLoopResult(payload, status, llm_calls, tokens_saved, raw)
+
+        # Add system prompt (lists the tools when they were registered)
+        enhanced_messages = [
+            {"role": "system", "content": tool_registry.system_prompt}
+        ] + messages
+
+        max_iterations = 5
+
+        for iteration in range(max_iterations):
+            with span("tool_loop.iteration", iteration=iteration + 1):
+                # Keep the prompt under budget; enhanced_messages keeps the full transcript
+                saved = 0
+                if budget is None:
+                    llm_messages = enhanced_messages
+                else:
+                    llm_messages, saved = compact_messages(enhanced_messages, budget, count_tokens=count_tokens)
+                    tokens_saved += saved
 
                 # Prepare request for llamafile
                 llm_request = {
                     "model": body.get("model", "local-model"),
-                    "messages": enhanced_messages,
+                    "messages": llm_messages,
                     "temperature": body.get("temperature", 0.7),
-                    "max_tokens": body.get("max_tokens", 600),  # Reasonable limit
+                    # Lowered only if the backend can't decode that much before the deadline
+                    "max_tokens": decode_rate.max_tokens(backend.url, deadline.llm_budget(), max_tokens),
                     "stream": False
                 }
+                if use_grammar and tool_registry.call_grammar is not None:
+                    # The last turn can't run a tool, so it must be the answer
+                    last_turn = iteration == max_iterations - 1
+                    llm_request["grammar"] = tool_registry.answer_grammar if last_turn else tool_registry.call_grammar
 
-                print(f"Sending to llamafile with {len(enhanced_messages)} messages", file=sys.stderr)
+                log_event(log, logging.DEBUG, "llm_request", iteration=iteration + 1, backend=backend.url,
+                          messages=len(llm_messages), tokens_compacted=saved)
 
                 # Call llamafile
-                try:
-                    response = requests.post(
-                        f"{llamafile_url}/v1/chat/completions",
-                        json=llm_request,
-                        timeout=180.0  # Increased timeout for complex requests
-                    )
-                    response.raise_for_status()
-                except requests.exceptions.RequestException as e:
-                    print(f"[ERROR] Llamafile request failed: {e}", file=sys.stderr)
-                    return jsonify({"error": f"Llamafile request failed: {str(e)}"}), 502
-
-                result = response.json()
+                with span("llamafile.chat_completion", backend=backend.url, messages=len(llm_messages)) as llm_span:
+                    started = time.perf_counter()
+                    try:
+                        response = requests.post(
+                            f"{backend.url}/v1/chat/completions",
+                            json=llm_request,
+                            headers=inject_traceparent({}),
+                            timeout=deadline.check(MIN_CALL_SECONDS)
+                        )
+                        response.raise_for_status()
+                    except requests.exceptions.ReadTimeout:
+                        # The backend is alive, the request ran out of time
+                        set_attributes(llm_span, error="deadline")
+                        raise DeadlineExceeded(f"Request deadline of {deadline.timeout:.1f}s exceeded "
+                                               f"waiting for llamafile") from None
+                    except requests.exceptions.RequestException as e:
+                        metrics.errors.inc(type="llamafile")
+                        set_attributes(llm_span, error=str(e))
+                        log_event(log, logging.ERROR, "llamafile_request_failed", backend=backend.url, error=str(e))
+                        dump_request_log(log)
+                        if e.response is None or e.response.status_code >= 500:
+                            pool.mark_failure(backend, str(e))
+                        return finish({"error": f"Llamafile request failed: {str(e)}"}, 502, iteration + 1)
+                    pool.mark_success(backend)
+                    duration = time.perf_counter() - started
+                    metrics.llamafile_duration.observe(duration, backend=backend.url)
+
+                    # Parsed once from bytes; the final answer is forwarded without re-encoding
+                    result = json_loads(response.content)
+                    metrics.observe_usage(result)
+                    decode_rate.observe(backend.url, (result.get("usage") or {}).get("completion_tokens"), duration)
+                    set_attributes(llm_span, **(result.get("usage") or {}))
+
                 assistant_message = result["choices"][0]["message"]["content"]
 
-                print(f"\n[LLM Response ({len(assistant_message)} chars)]:", file=sys.stderr)
-                print(assistant_message[:300], file=sys.stderr)
-                if len(assistant_message) > 300:
-                    print("...(truncated)", file=sys.stderr)
+                log_event(log, logging.DEBUG, "llm_response", payload=True, iteration=iteration + 1,
+                          chars=len(assistant_message), preview=assistant_message[:300])
 
                 # Check for tool call
                 tool_call = extract_tool_call(assistant_message)
 
                 if tool_call:
                     function_name, arguments = tool_call
-                    print(f"\n✓ Tool call detected!", file=sys.stderr)
 
-                    # Call the MCP tool (pluggable executor)
+                    # Reject unknown tools before dispatch; the model gets the
+                    # valid names in the same turn
                     try:
-                        tool_result = executor(function_name, arguments)
-                    except Exception as e:
-                        print(f"[ERROR] Tool call failed: {e}", file=sys.stderr)
+                        resolved = tool_registry.resolve(function_name)
+                    except UnknownToolError as e:
+                        metrics.errors.inc(type="unknown_tool")
+                        log_event(log, logging.WARNING, "unknown_tool", tool=function_name)
                         enhanced_messages.append({
                             "role": "assistant",
                             "content": assistant_message
                         })
                         enhanced_messages.append({
                             "role": "user",
-                            "content": f"TOOL_ERROR: {str(e)}\n\nPlease continue without the tool."
+                            "content": f"TOOL_ERROR: {str(e)}\n\nUse one of the valid tools or answer without one."
                         })
                         continue
+                    if resolved != function_name:
+                        log_event(log, logging.INFO, "tool_name_normalized", tool=function_name, resolved=resolved)
+                        function_name = resolved
+
+                    # Check and coerce the arguments the same way; what cannot
+                    # be fixed goes back to the model with what was expected
+                    try:
+                        arguments = tool_registry.validate(function_name, arguments)
+                    except ToolArgumentError as e:
+                        metrics.errors.inc(type="tool_arguments")
+                        log_event(log, logging.WARNING, "tool_arguments_invalid", tool=function_name,
+                                  problems=e.problems)
+                        enhanced_messages.append({
+                            "role": "assistant",
+                            "content": assistant_message
+                        })
+                        enhanced_messages.append({
+                            "role": "user",
+                            "content": f"TOOL_ERROR: {str(e)}\n\nCall {function_name} again with corrected arguments."
+                        })
+                        continue
+
+                    # Call the MCP tool (pluggable executor)
+                    with span("tool.call", tool=function_name) as tool_span:
+                        tool_budget = deadline.tool_budget(tool_timeout)
+                        started = time.perf_counter()
+                        try:
+                            prefetched = speculation.pop(function_name, arguments) if speculation else None
+                            if prefetched is not None:
+                                set_attributes(tool_span, prefetched=True)
+                                log_event(log, logging.DEBUG, "tool_prefetch_hit", tool=function_name)
+                                tool_result = wait_tool(function_name, prefetched, tool_budget)
+                            else:
+                                tool_result = call_with_timeout(function_name, tool_budget, executor,
+                                                                function_name, arguments)
+                        except Exception as e:
+                            metrics.errors.inc(type="tool_timeout" if isinstance(e, ToolTimeout) else "tool")
+                            set_attributes(tool_span, error=str(e))
+                            log_event(log, logging.WARNING, "tool_call_failed", tool=function_name, error=str(e))
+                            enhanced_messages.append({
+                                "role": "assistant",
+                                "content": assistant_message
+                            })
+                            enhanced_messages.append({
+                                "role": "user",
+                                "content": f"TOOL_ERROR: {str(e)}\n\nPlease continue without the tool."
+                            })
+                            continue
+                        finally:
+                            metrics.tool_duration.observe(time.perf_counter() - started, tool=function_name)
 
                     # Add messages to conversation with the tool result
                     enhanced_messages.append({
@@ -217,37 +471,231 @@ def create_bridge_app(llamafile_url: str = LLAMAFILE_URL, mcp_executor=None):
                         "content": f"TOOL_RESULT: {tool_result}\n\nNow continue with your response using this information. Do not call the tool again."
                     })
 
-                    print(f"[TOOL RESULT] {tool_result}", file=sys.stderr)
-                    print("Continuing to next iteration...", file=sys.stderr)
+                    log_event(log, logging.DEBUG, "tool_result", payload=True, tool=function_name,
+                              result=str(tool_result)[:300])
                     continue
                 else:
                     # No tool call, return final response
-                    print("\n[DONE] No tool call detected, returning response", file=sys.stderr)
-                    return jsonify(result)
+                    log_event(log, logging.INFO, "request_complete", iterations=iteration + 1,
+                              tokens_saved=tokens_saved)
+                    return finish(result, 200, iteration + 1, response.content)
+
+        # Max iterations reached
+        metrics.errors.inc(type="max_iterations")
+        log_event(log, logging.WARNING, "max_iterations_reached", iterations=max_iterations)
+        dump_request_log(log)
+        return finish({"error": "Maximum tool call iterations reached"}, 500, max_iterations)
+
+    def run_prefetch(name: str, arguments: dict):
+        def call():
+            with span("tool.prefetch", tool=name):
+                return executor(name, arguments)
+        return submit_tool(call)
+
+    def complete(body: dict, priority: str, queue_timeout: Optional[float], use_grammar: bool = False,
+                 deadline: Optional[Deadline] = None, use_prefetch: bool = False) -> ToolLoopResult:
+        """Pin one backend for the whole tool loop, then wait for one of its
+        slots; raises AdmissionError when saturated."""
+        deadline = deadline or Deadline(request_timeout)
+        # Queue wait counts against the deadline
+        queue_timeout = deadline.queue_timeout(admission.queue_timeout if queue_timeout is None else queue_timeout)
+        with pool.lease(body.get("model")) as backend:
+            with admission.slot(backend.url, priority=priority, timeout=queue_timeout):
+                # Predicted calls run while llamafile works on the first turn
+                speculation = prefetcher.start(body.get("messages", []), run_prefetch) if use_prefetch else None
+                try:
+                    return run_tool_loop(body, backend, use_grammar, deadline, speculation)
+                finally:
+                    if speculation is not None:
+                        speculation.close()
+
+    def run_batch_item(body: dict) -> tuple[dict, int]:
+        """One batch item: batch priority, the server's defaults, its own deadline."""
+        outcome = complete(body, PRIORITY_BATCH, None, registry.call_grammar is not None and tool_grammar,
+                           Deadline(request_timeout), prefetcher.enabled and prefetch)
+        return outcome.payload, outcome.status
+
+    # About `batch_concurrency` items per backend; the pool spreads the workers
+    batches = BatchManager(run_batch_item, workers=batch_concurrency * len(pool.backends), directory=batch_dir)
+    metrics.add_stats("bridge_batch", batches.stats, description="Batch jobs",
+                      counters=("items_completed", "items_failed"))
 
-            # Max iterations reached
-            print(f"\n[WARNING] Max iterations ({max_iterations}) reached", file=sys.stderr)
-            return jsonify({"error": "Maximum tool call iterations reached"}), 500
+    @app.route('/v1/chat/completions', methods=['POST'])
+    def chat_completions():
+        """Handle chat completions with simulated tool calling"""
+        started = time.perf_counter()
+        status = 500
+        metrics.in_flight.inc()
+        try:
+            with request_log_context(request.headers.get(REQUEST_ID_HEADER)) as request_id, \
+                    span("chat.completions", parent=parse_traceparent(request.headers.get(TRACEPARENT_HEADER)),
+                         request_id=request_id) as request_span:
+                response = app.make_response(handle_chat_completion())
+                response.headers[REQUEST_ID_HEADER] = request_id
+                status = response.status_code
+                set_attributes(request_span, status=status)
+                return response
+        finally:
+            metrics.in_flight.dec()
+            metrics.request_duration.observe(time.perf_counter() - started, status=status)
+
+    def handle_chat_completion():
+        try:
+            try:
+                body = request.get_json()
+            except HTTPException as e:
+                # Wrong Content-Type (415) or malformed JSON (400)
+                metrics.errors.inc(type="bad_request")
+                return jsonify({"error": e.description}), e.code
+            if not isinstance(body, dict):
+                metrics.errors.inc(type="bad_request")
+                return jsonify({"error": "Request body must be a JSON object"}), 400
+            try:
+                priority, queue_timeout = parse_admission_headers(request.headers)
+            except AdmissionHeaderError as e:
+                return jsonify({"error": str(e)}), e.status_code
+            use_grammar = registry.call_grammar is not None and tool_grammar
+            grammar_override = request.headers.get(GRAMMAR_HEADER)
+            if registry.call_grammar is not None and grammar_override:
+                use_grammar = grammar_override.strip().lower() in ("1", "true", "yes", "on")
+            use_prefetch = prefetcher.enabled and prefetch
+            prefetch_override = request.headers.get(PREFETCH_HEADER)
+            if prefetcher.enabled and prefetch_override:
+                use_prefetch = prefetch_override.strip().lower() in ("1", "true", "yes", "on")
+
+            cache_status = None
+            if cache is not None and cache.accepts(body):
+                bypass, no_store = cache_directives(request.headers)
+                cache_status = "bypass" if bypass else "miss"
+                if not bypass:
+                    cached, level = cache.lookup(body)
+                    if cached is not None:
+                        response = jsonify(cached)
+                        response.headers[CACHE_STATUS_HEADER] = f"hit-{level}"
+                        return response
+
+            coalesce = should_coalesce(body, request.headers)
+            key = f"{use_grammar:d}{canonical_body(body)}" if coalesce else None
+            # The werkzeug server exposes the client socket; a shared loop
+            # keeps running while followers still wait for it
+            client_socket = request.environ.get("werkzeug.socket")
+
+            def client_gone() -> bool:
+                return socket_disconnected(client_socket) and not (key and coalescer.followers(key))
+
+            deadline = Deadline(parse_deadline_header(request.headers, request_timeout), is_cancelled=client_gone)
+
+            def run():
+                return complete(body, priority, queue_timeout, use_grammar, deadline, use_prefetch)
+
+            try:
+                if coalesce:
+                    outcome, shared = coalescer.do(key, run, deadline)
+                else:
+                    outcome, shared = run(), False
+            except DeadlineExceeded as e:
+                metrics.errors.inc(type="deadline")
+                log_event(log, logging.WARNING, "deadline_exceeded", timeout=deadline.timeout,
+                          elapsed=round(deadline.elapsed(), 3), error=str(e))
+                return jsonify({"error": str(e)}), e.status_code
+            except ClientDisconnected as e:
+                metrics.errors.inc(type="client_disconnected")
+                log_event(log, logging.INFO, "client_disconnected", elapsed=round(deadline.elapsed(), 3))
+                return jsonify({"error": str(e)}), e.status_code
+            except NoHealthyBackendError as e:
+                metrics.errors.inc(type="no_backend")
+                log_event(log, logging.WARNING, "no_healthy_backend", error=str(e))
+                return jsonify({"error": str(e)}), e.status_code
+            except AdmissionError as e:
+                metrics.errors.inc(type=type(e).__name__)
+                log_event(log, logging.WARNING, "admission_rejected", status=e.status_code, error=str(e))
+                response = jsonify({"error": str(e)})
+                response.headers["Retry-After"] = str(int(e.retry_after))
+                return response, e.status_code
+
+            # Only the executing request stores; followers got the same payload
+            if cache_status is not None and outcome.status == 200 and not shared and not no_store:
+                cache.store(body, outcome.payload)
+
+            if outcome.raw is not None:
+                response = app.response_class(outcome.raw, mimetype=JSON_CONTENT_TYPE)
+            else:
+                response = jsonify(outcome.payload)
+            response.headers[TOKENS_SAVED_HEADER] = str(outcome.tokens_saved)
+            response.headers[ITERATIONS_HEADER] = str(outcome.llm_calls)
+            if shared:
+                response.headers[COALESCED_RESPONSE_HEADER] = "1"
+            if cache_status:
+                response.headers[CACHE_STATUS_HEADER] = cache_status
+            return response, outcome.status
 
         except Exception as e:
-            print(f"\n[ERROR] Exception in chat_completions: {e}", file=sys.stderr)
-            import traceback
-            traceback.print_exc()
+            metrics.errors.inc(type="internal")
+            log.exception("chat_completions_failed")
+            dump_request_log(log)
             return jsonify({"error": f"Internal error: {str(e)}"}), 500
 
+    @app.route('/v1/batch', methods=['POST'])
+    def create_batch():
+        """Run (or resume) a JSONL batch; results stream back as JSONL"""
+        try:
+            job = batches.submit(request.get_data(as_text=True), request.headers.get(BATCH_ID_HEADER))
+        except BatchError as e:
+            return jsonify({"error": str(e)}), e.status_code
+        # The job keeps running if the client goes away; the stream only follows it
+        return Response(job.follow(), mimetype=BATCH_CONTENT_TYPE, headers={BATCH_ID_HEADER: job.id})
+
+    @app.route('/v1/batch/<job_id>', methods=['GET'])
+    def batch_status(job_id: str):
+        """Progress of a batch job"""
+        try:
+            return jsonify(batches.get(job_id).status())
+        except BatchError as e:
+            return jsonify({"error": str(e)}), e.status_code
+
+    @app.route('/v1/batch/<job_id>/results', methods=['GET'])
+    def batch_results(job_id: str):
+        """Results of a batch job so far, following it while it runs"""
+        try:
+            job = batches.get(job_id)
+        except BatchError as e:
+            return jsonify({"error": str(e)}), e.status_code
+        return Response(job.follow(), mimetype=BATCH_CONTENT_TYPE, headers={BATCH_ID_HEADER: job.id})
+
     @app.route('/health', methods=['GET'])
     def health():
         """Health check"""
         return jsonify({
             "status": "ok",
-            "mode": "simple_simulated_tool_calling"
+            "mode": "simple_simulated_tool_calling",
+            "scheduler": admission.stats(),
+            "backends": pool.stats(),
+            "coalescing": coalescer.stats(),
+            "cache": cache.stats() if cache is not None else None,
+            "compaction": dict(compaction_stats),
+            "tools": registry.stats(),
+            "tool_grammar": registry.call_grammar is not None and tool_grammar,
+            "deadline": {
+                "request_timeout": request_timeout,
+                "tool_timeout": tool_timeout,
+                "decode_rate": decode_rate.stats(),
+                "tool_pool": tool_pool_stats(),
+            },
+            "prefetch": dict(prefetcher.stats(), enabled=prefetcher.enabled and prefetch),
+            "batch": batches.stats(),
+            "mcp": mcp_client.stats() if mcp_client is not None else None
         })
 
+    @app.route('/metrics', methods=['GET'])
+    def metrics_endpoint():
+        """Prometheus metrics"""
+        return metrics.render(), 200, {"Content-Type": METRICS_CONTENT_TYPE}
+
     @app.route('/v1/models', methods=['GET'])
     def list_models():
         """Proxy models endpoint"""
         try:
-            response = requests.get(f"{llamafile_url}/v1/models", timeout=5.0)
+            response = requests.get(f"{pool.pick().url}/v1/models", timeout=5.0)
             return jsonify(response.json())
         except Exception as e:
             return jsonify({"error": f"Cannot reach llamafile: {str(e)}"}), 503
@@ -255,11 +703,19 @@ def create_bridge_app(llamafile_url: str = LLAMAFILE_URL, mcp_executor=None):
     return app
 
 
-def run_bridge(host: str = "127.0.0.1", port: int = 8081, llamafile_url: str = LLAMAFILE_URL, mcp_executor=None):
+def run_bridge(host: str = "127.0.0.1", port: int = 8081, llamafile_url: str = LLAMAFILE_URL, mcp_executor=None,
+               scheduler=None, backends=None, cache=None, context_window: Optional[int] = None,
+               tools=None, tool_grammar: bool = False, request_timeout: Optional[float] = None,
+               tool_timeout: float = DEFAULT_TOOL_TIMEOUT, prefetch: bool = False,
+               batch_concurrency: int = DEFAULT_BATCH_CONCURRENCY, batch_dir: Optional[str] = None):
     """Convenience helper to create and run the Flask bridge app.
 
     Keeps the module usable as a library: callers can import `create_bridge_app`
     or call `run_bridge` to run the HTTP bridge.
     """
-    app = create_bridge_app(llamafile_url=llamafile_url, mcp_executor=mcp_executor)
+    app = create_bridge_app(llamafile_url=llamafile_url, mcp_executor=mcp_executor, scheduler=scheduler,
+                            backends=backends, cache=cache, context_window=context_window,
+                            tools=tools, tool_grammar=tool_grammar, request_timeout=request_timeout,
+                            tool_timeout=tool_timeout, prefetch=prefetch,
+                            batch_concurrency=batch_concurrency, batch_dir=batch_dir)
     app.run(host=host, port=port, debug=False, threaded=True)
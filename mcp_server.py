@@ -1,12 +1,47 @@
 import asyncio
+import concurrent.futures
+import concurrent.futures.process
+import contextvars
+import functools
+import importlib
+import logging
+import multiprocessing
+import os
+import pickle
 import random
-import sys
 import inspect
-from typing import Callable, Dict, Any
+import sys
+import contextlib
+import threading
+from typing import Callable, Dict, Any, Iterable, Optional
 
+import uvicorn
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+from mcp.types import CallToolResult, Tool, TextContent
+from starlette.applications import Starlette
+from starlette.routing import Route
+
+from bridge_deadline import DEFAULT_TOOL_TIMEOUT, ToolTimeout
+from bridge_logging import get_logger, log_event
+from bridge_tracing import TRACEPARENT_HEADER, parse_traceparent, span
+from tool_cache import ToolResultCache, advertised, entry_policy
+from tool_validation import ToolArgumentError, compile_validator
+
+log = get_logger(__name__)
+
+# Threads shared by the sync handlers of one server (the stdlib default size)
+DEFAULT_MAX_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+# How a handler runs: on the worker threads, inline on the event loop, or
+# on the process pool (CPU-bound handlers)
+EXECUTOR_THREAD = "thread"
+EXECUTOR_INLINE = "inline"
+EXECUTOR_PROCESS = "process"
+# Streamable HTTP transport: default bind address and endpoint path
+DEFAULT_HTTP_HOST = "127.0.0.1"
+DEFAULT_HTTP_PORT = 8765
+DEFAULT_HTTP_PATH = "/mcp"
 
 # --- Data used by default tools ---
 ELF_FIRST_NAMES = [
@@ -100,46 +135,436 @@ def default_tools() -> Dict[str, Dict[str, Any]]:
     return {}
 
 
-def create_mcp_server(tools: Dict[str, Dict[str, Any]], server_name: str = "mcp-server") -> Server:
+def _worker_init(preload: tuple[str, ...]) -> None:
+    """Process-pool worker start-up: protect stdout, import the tool modules."""
+    # The server's stdout carries the MCP protocol; tool output goes to stderr
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    for module in preload:
+        importlib.import_module(module)
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def _call_in_worker(handler: Callable, arguments: dict) -> Any:
+    res = handler(arguments)
+    return asyncio.run(_awaited(res)) if inspect.isawaitable(res) else res
+
+
+def _handler_module(handler: Any) -> Optional[str]:
+    while isinstance(handler, functools.partial):
+        handler = handler.func
+    module = getattr(handler, "__module__", None)
+    return None if module in (None, "__main__") else module
+
+
+class ToolRunner:
+    """Runs the handlers of a tools mapping without blocking the event loop.
+
+    Sync handlers run on a bounded thread pool (`max_workers`), so a slow
+    one (a file lookup, a RAG search) no longer stalls every other request
+    on the server. Optional keys of a mapping entry:
+
+    - 'max_concurrency': calls of this tool running at once (the rest wait);
+    - 'timeout': seconds before the call fails with TimeoutError
+      (default `timeout`, None for no limit);
+    - 'executor': "thread" (default for sync handlers), "inline" for
+      trivial handlers that are cheaper to run on the loop, or "process"
+      for CPU-bound handlers, which the GIL keeps from scaling on threads;
+    - 'cache_ttl' / 'cache_key': serve repeat calls of an idempotent tool
+      from `cache` (see `tool_cache.py`).
+
+    "process" handlers run on a warm pool of `process_workers` processes
+    (`warm()` starts them and imports `preload` plus the handlers' own
+    modules). The handler and its arguments and result cross over with
+    pickle, so the handler must be a module-level function (or a
+    `functools.partial` of one). A worker that dies fails only the calls
+    it was running; the pool is replaced and later calls go to fresh
+    workers.
+
+    Arguments are checked and coerced against each tool's `inputSchema`
+    by a validator compiled here, once (`tool_validation.py`); bad ones
+    raise `ToolArgumentError` before the handler or the cache is reached.
+
+    A cancelled or timed-out call that has not started yet never runs. One
+    that is already running on a thread or process cannot be interrupted:
+    it keeps its concurrency slot until it returns, and its result is
+    discarded.
+    """
+
+    def __init__(self, tools: Dict[str, Dict[str, Any]], max_workers: int = DEFAULT_MAX_WORKERS,
+                 timeout: Optional[float] = None, process_workers: Optional[int] = None,
+                 preload: Iterable[str] = (), cache: Optional[ToolResultCache] = None):
+        self.tools = tools
+        self.cache = cache if cache is not None else ToolResultCache()
+        self.cache_policies = {name: entry_policy(entry) for name, entry in tools.items()}
+        self.validators = {name: compile_validator(entry["tool"]) for name, entry in tools.items()}
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.process_workers = process_workers or os.cpu_count() or 1
+        self._pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        self._processes: Optional[concurrent.futures.ProcessPoolExecutor] = None
+        self._process_lock = threading.Lock()
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self.process_restarts = 0
+        modules = list(preload)
+        for name, entry in tools.items():
+            if entry.get("executor") != EXECUTOR_PROCESS:
+                continue
+            try:
+                pickle.dumps(entry["handler"])
+            except Exception as e:
+                raise ValueError(f"Tool '{name}': a process handler must be picklable "
+                                 f"(a module-level function): {e}") from None
+            module = _handler_module(entry["handler"])
+            if module and module not in modules:
+                modules.append(module)
+        self.preload = tuple(modules)
+
+    @property
+    def uses_processes(self) -> bool:
+        return any(entry.get("executor") == EXECUTOR_PROCESS for entry in self.tools.values())
+
+    def _thread_pool(self) -> concurrent.futures.ThreadPoolExecutor:
+        if self._pool is None:
+            self._pool = concurrent.futures.ThreadPoolExecutor(self.max_workers, thread_name_prefix="mcp-tool")
+        return self._pool
+
+    def _process_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        with self._process_lock:
+            if self._processes is None:
+                # Not fork: the server has running threads and an event loop
+                method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._processes = concurrent.futures.ProcessPoolExecutor(
+                    self.process_workers, mp_context=multiprocessing.get_context(method),
+                    initializer=_worker_init, initargs=(self.preload,))
+            return self._processes
+
+    def _replace_process_pool(self, broken: concurrent.futures.ProcessPoolExecutor) -> None:
+        with self._process_lock:
+            if self._processes is not broken:
+                return  # another call already replaced it
+            self._processes = None
+            self.process_restarts += 1
+        log.warning("tool_process_pool_broken", extra={"fields": {"restarts": self.process_restarts}})
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def warm(self) -> None:
+        """Start every process worker now instead of on the first calls."""
+        if not self.uses_processes:
+            return
+        pool = self._process_pool()
+        try:
+            for future in [pool.submit(_worker_pid) for _ in range(self.process_workers)]:
+                future.result()
+        except concurrent.futures.process.BrokenProcessPool as e:
+            # e.g. a preload module failed to import; calls will fail the same way
+            log.warning("tool_processes_warm_failed", extra={"fields": {"error": str(e)}})
+            self._replace_process_pool(pool)
+            return
+        log.info("tool_processes_ready", extra={"fields": {"workers": self.process_workers, "preload": list(self.preload)}})
+
+    def _submit(self, entry: Dict[str, Any], arguments: dict) -> tuple[concurrent.futures.Future, Any]:
+        handler = entry["handler"]
+        if entry.get("executor") != EXECUTOR_PROCESS:
+            return self._thread_pool().submit(contextvars.copy_context().run, handler, arguments), None
+        pool = self._process_pool()
+        try:
+            return pool.submit(_call_in_worker, handler, arguments), pool
+        except concurrent.futures.process.BrokenProcessPool:
+            self._replace_process_pool(pool)
+            pool = self._process_pool()
+            return pool.submit(_call_in_worker, handler, arguments), pool
+
+    def _limit(self, name: str, entry: Dict[str, Any]) -> Optional[asyncio.Semaphore]:
+        limit = entry.get("max_concurrency")
+        if not limit:
+            return None
+        if name not in self._limits:
+            self._limits[name] = asyncio.Semaphore(limit)
+        return self._limits[name]
+
+    def validate(self, name: str, arguments: Optional[dict]) -> dict:
+        """Coerced arguments for tool `name`; raises ToolArgumentError."""
+        return self.validators[name](arguments)
+
+    def cached(self, name: str, arguments: dict) -> tuple[bool, Any, Any]:
+        """(hit, result, key) for a cacheable tool; key is None if the tool is not cached."""
+        policy = self.cache_policies.get(name)
+        if policy is None:
+            return False, None, None
+        key = policy.cache_key(arguments)
+        hit, value = self.cache.lookup(name, key)
+        return hit, value, key
+
+    def remember(self, name: str, key: Any, result: Any) -> None:
+        if key is not None:
+            self.cache.store(name, key, result, self.cache_policies[name].ttl)
+
+    async def run(self, name: str, arguments: dict) -> Any:
+        """The handler's raw result; raises ValueError for an unknown tool."""
+        entry = self.tools.get(name)
+        if entry is None:
+            raise ValueError(f"Unknown tool: {name}")
+        arguments = self.validate(name, arguments)
+        hit, res, key = self.cached(name, arguments)
+        if hit:
+            return res
+        res = await self._execute(name, entry, arguments)
+        self.remember(name, key, res)
+        return res
+
+    async def _execute(self, name: str, entry: Dict[str, Any], arguments: dict) -> Any:
+        handler = entry["handler"]
+        executor = entry.get("executor")
+        timeout = entry.get("timeout", self.timeout)
+        loop = asyncio.get_running_loop()
+        # The timeout covers the wait for a concurrency slot too
+        expires = None if timeout is None else loop.time() + timeout
+
+        def remaining() -> Optional[float]:
+            return None if expires is None else max(0.0, expires - loop.time())
+
+        limit = self._limit(name, entry)
+        held = False
+        try:
+            if limit is not None:
+                await asyncio.wait_for(limit.acquire(), remaining())
+                held = True
+            if executor == EXECUTOR_INLINE or (executor != EXECUTOR_PROCESS and inspect.iscoroutinefunction(handler)):
+                res = handler(arguments)
+                return await asyncio.wait_for(res, remaining()) if inspect.isawaitable(res) else res
+            future, processes = self._submit(entry, arguments)
+            if held:
+                # The slot is freed when the worker is, not when the caller gives up
+                future.add_done_callback(lambda _: loop.call_soon_threadsafe(limit.release))
+                held = False
+            try:
+                # Cancelling the wrapper cancels a call that has not started
+                res = await asyncio.wait_for(asyncio.wrap_future(future), remaining())
+            except concurrent.futures.process.BrokenProcessPool:
+                self._replace_process_pool(processes)
+                raise RuntimeError(f"Tool '{name}' worker process exited unexpectedly") from None
+            return await res if inspect.isawaitable(res) else res
+        except asyncio.TimeoutError:
+            raise TimeoutError(f"Tool '{name}' timed out after {timeout:.1f}s") from None
+        finally:
+            if held:
+                limit.release()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        with self._process_lock:
+            processes, self._processes = self._processes, None
+        if processes is not None:
+            processes.shutdown(wait=False, cancel_futures=True)
+
+
+def create_mcp_server(tools: Dict[str, Dict[str, Any]], server_name: str = "mcp-server",
+                      max_workers: int = DEFAULT_MAX_WORKERS, tool_timeout: Optional[float] = None,
+                      runner: Optional[ToolRunner] = None) -> Server:
     """Create and return an MCP Server instance that exposes the provided tools.
 
     tools: mapping tool_name -> { 'tool': Tool, 'handler': callable }
     Handlers may be sync or async callables that accept a single dict argument.
+    Sync handlers run on up to `max_workers` threads; entries may also set
+    'max_concurrency', 'timeout' (default `tool_timeout`) and 'executor'
+    (see `ToolRunner`). Pass `runner` to share or configure the pools
+    (e.g. process workers); it must have been built from `tools`.
     """
     app = Server(server_name)
+    if runner is None:
+        runner = ToolRunner(tools, max_workers=max_workers, timeout=tool_timeout)
+    # Cacheable tools advertise their TTL so clients can cache them too
+    listed = [advertised(entry["tool"], runner.cache_policies.get(name)) for name, entry in tools.items()]
 
     @app.list_tools()
     async def _list_tools() -> list[Tool]:
-        return [entry["tool"] for entry in tools.values()]
+        return listed
 
-    @app.call_tool()
-    async def _call_tool(name: str, arguments: dict) -> list[TextContent]:
+    # Arguments are validated by the runner's precompiled validators, which
+    # also coerce them, instead of the SDK's per-call jsonschema check
+    @app.call_tool(validate_input=False)
+    async def _call_tool(name: str, arguments: dict) -> list[TextContent] | CallToolResult:
         if name not in tools:
             raise ValueError(f"Unknown tool: {name}")
 
-        handler = tools[name]["handler"]
+        # Continue the caller's trace (traceparent sent in the request _meta)
+        meta = app.request_context.meta
+        parent = parse_traceparent(getattr(meta, TRACEPARENT_HEADER, None)) if meta else None
 
-        # Support both sync and async handlers
-        if inspect.iscoroutinefunction(handler):
-            res = await handler(arguments)
-        else:
-            res = handler(arguments)
+        # Sync handlers run on worker threads (or processes), async ones on the loop
+        with span("mcp_server.call_tool", parent=parent, tool=name):
+            try:
+                res = await runner.run(name, arguments)
+            except ToolArgumentError as e:
+                # The model gets what to fix, as text and as structured content
+                log_event(log, logging.INFO, "tool_arguments_invalid", tool=name, problems=e.problems)
+                return CallToolResult(content=[TextContent(type="text", text=str(e))],
+                                      structuredContent=e.to_dict(), isError=True)
+            except Exception:
+                log.exception("tool_handler_failed", extra={"fields": {"tool": name}})
+                raise
 
+        log_event(log, logging.DEBUG, "tool_called", payload=True, tool=name, arguments=arguments)
         return _normalize_handler_result(res)
 
     return app
 
 
-async def start_mcp_server(tools: Dict[str, Dict[str, Any]], server_name: str = "mcp-server") -> None:
-    """Start the MCP server over stdio using the provided tools mapping."""
-    app = create_mcp_server(tools, server_name=server_name)
-    # Log to stderr so it doesn't interfere with stdio communication
-    print(f"MCP Server '{server_name}' starting...", file=sys.stderr)
-    async with stdio_server() as (read_stream, write_stream):
-        print("MCP Server connected", file=sys.stderr)
+def _content_text(contents: list[TextContent]) -> str:
+    return "\n".join(item.text for item in contents)
+
+
+class InProcessExecutor:
+    """Runs the tools of a `create_mcp_server` mapping in-process.
+
+    For tools that live in this codebase: the handlers are called directly,
+    with no stdio pipe or JSON-RPC in between, and their results go through
+    `_normalize_handler_result` exactly as in the server, then come back as
+    text. The mapping's `Tool` schemas stay the single source of truth
+    (`tool_definitions`).
+
+    Call it synchronously, `executor(name, arguments)` (the Flask bridge's
+    executor interface), or `await executor.call_async(name, arguments)` (the
+    FastAPI bridge). Either way the call goes through a `ToolRunner`, as in
+    the server, so every tool keeps its validation, cache, 'timeout' and
+    'max_concurrency'; synchronous calls are handed to it on a private event
+    loop thread. `tool_timeout` (default `DEFAULT_TOOL_TIMEOUT`) applies to
+    tools without their own 'timeout'; a synchronous caller never waits
+    longer than the tool's timeout.
+    """
+
+    def __init__(self, tools: Dict[str, Dict[str, Any]], max_workers: int = DEFAULT_MAX_WORKERS,
+                 tool_timeout: Optional[float] = DEFAULT_TOOL_TIMEOUT):
+        self.tools = tools
+        self._runner = ToolRunner(tools, max_workers=max_workers, timeout=tool_timeout)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def tool_definitions(self) -> list[Tool]:
+        return [entry["tool"] for entry in self.tools.values()]
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="in-process-tools", daemon=True).start()
+            return self._loop
+
+    @property
+    def cache(self) -> ToolResultCache:
+        return self._runner.cache
+
+    def __call__(self, name: str, arguments: dict) -> str:
+        timeout = self.tools.get(name, {}).get("timeout", self._runner.timeout)
+        future = asyncio.run_coroutine_threadsafe(self._runner.run(name, arguments), self._event_loop())
+        try:
+            # The runner times the call out too; this bounds the wait even if
+            # the loop thread is stuck
+            result = future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise ToolTimeout(name, timeout) from None
+        return _content_text(_normalize_handler_result(result))
+
+    async def call_async(self, name: str, arguments: dict) -> str:
+        return _content_text(_normalize_handler_result(await self._runner.run(name, arguments)))
+
+
+async def _awaited(awaitable: Any) -> Any:
+    return await awaitable
+
+
+@contextlib.asynccontextmanager
+async def _warm_runner(runner: ToolRunner):
+    """Start the process workers in the background; shut the pools down on exit."""
+    warming = asyncio.get_running_loop().run_in_executor(None, runner.warm) if runner.uses_processes else None
+    try:
+        yield
+    finally:
+        if warming is not None and not warming.done():
+            warming.cancel()
+        runner.shutdown()
+        if any(runner.cache_policies.values()):
+            log.info("tool_cache_stats", extra={"fields": {**runner.cache.stats(), "tools": runner.cache.tool_stats()}})
+
+
+async def start_mcp_server(tools: Dict[str, Dict[str, Any]], server_name: str = "mcp-server",
+                           max_workers: int = DEFAULT_MAX_WORKERS, tool_timeout: Optional[float] = None,
+                           process_workers: Optional[int] = None, preload: Iterable[str] = ()) -> None:
+    """Start the MCP server over stdio using the provided tools mapping.
+
+    'process' tools get `process_workers` worker processes (default: one per
+    CPU), started alongside the server with `preload` modules imported.
+    """
+    runner = ToolRunner(tools, max_workers=max_workers, timeout=tool_timeout,
+                        process_workers=process_workers, preload=preload)
+    app = create_mcp_server(tools, server_name=server_name, runner=runner)
+    # Logs go to stderr so they don't interfere with stdio communication
+    log.info("mcp_server_starting", extra={"fields": {"server": server_name, "tools": sorted(tools)}})
+    async with _warm_runner(runner), stdio_server() as (read_stream, write_stream):
+        log.info("mcp_server_connected", extra={"fields": {"server": server_name}})
         await app.run(read_stream, write_stream, app.create_initialization_options())
 
 
+class _ASGIEndpoint:
+    """Lets a Starlette `Route` pass the raw ASGI call on (a Mount would redirect `/mcp` to `/mcp/`)."""
+
+    def __init__(self, handle: Callable):
+        self.handle = handle
+
+    async def __call__(self, scope, receive, send) -> None:
+        await self.handle(scope, receive, send)
+
+
+def create_http_app(tools: Dict[str, Dict[str, Any]], server_name: str = "mcp-server",
+                    max_workers: int = DEFAULT_MAX_WORKERS, tool_timeout: Optional[float] = None,
+                    runner: Optional[ToolRunner] = None, path: str = DEFAULT_HTTP_PATH,
+                    json_response: bool = True, stateless: bool = False) -> Starlette:
+    """ASGI app serving the tools over MCP streamable HTTP at `path`.
+
+    One long-lived server for many clients (every bridge worker), instead
+    of a stdio subprocess per bridge. Sessions are stateful by default, so
+    clients keep their session (and `tools/list_changed` notifications)
+    across requests; `json_response` answers each call with a plain JSON
+    body rather than an SSE stream. Serve it with any ASGI server, or use
+    `start_mcp_http_server`.
+    """
+    server = create_mcp_server(tools, server_name=server_name, max_workers=max_workers,
+                               tool_timeout=tool_timeout, runner=runner)
+    manager = StreamableHTTPSessionManager(server, json_response=json_response, stateless=stateless)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(_app: Starlette):
+        async with manager.run():
+            yield
+
+    return Starlette(routes=[Route(path, endpoint=_ASGIEndpoint(manager.handle_request))], lifespan=lifespan)
+
+
+async def start_mcp_http_server(tools: Dict[str, Dict[str, Any]], server_name: str = "mcp-server",
+                                host: str = DEFAULT_HTTP_HOST, port: int = DEFAULT_HTTP_PORT,
+                                max_workers: int = DEFAULT_MAX_WORKERS, tool_timeout: Optional[float] = None,
+                                process_workers: Optional[int] = None, preload: Iterable[str] = (),
+                                **app_options) -> None:
+    """Serve the tools mapping over streamable HTTP (`create_http_app`) with uvicorn."""
+    runner = ToolRunner(tools, max_workers=max_workers, timeout=tool_timeout,
+                        process_workers=process_workers, preload=preload)
+    app = create_http_app(tools, server_name=server_name, runner=runner, **app_options)
+    path = app_options.get("path", DEFAULT_HTTP_PATH)
+    log.info("mcp_server_starting", extra={"fields": {"server": server_name, "tools": sorted(tools),
+                                                      "url": f"http://{host}:{port}{path}"}})
+    config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on")
+    async with _warm_runner(runner):
+        await uvicorn.Server(config).serve()
+
+
 if __name__ == "__main__":
     # Backwards-compatible CLI: start the default tools
     asyncio.run(start_mcp_server(default_tools(), server_name="elf-name-server"))
@@ -0,0 +1,35 @@
+"""MCP stdio server for the pool and executor tests (run as a subprocess).
+
+`crash` exits the process in the middle of a call, as a crashed server
+would; `pid` tells the sessions apart.
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mcp.types import Tool  # noqa: E402
+
+from mcp_server import start_mcp_server  # noqa: E402
+
+
+def tool(name):
+    return Tool(name=name, description=name, inputSchema={"type": "object"})
+
+
+async def sleep(arguments):
+    await asyncio.sleep(float(arguments.get("seconds", 0)))
+    return "slept"
+
+
+TOOLS = {
+    "echo": {"tool": tool("echo"), "handler": lambda arguments: str(arguments.get("text", ""))},
+    "pid": {"tool": tool("pid"), "handler": lambda arguments: str(os.getpid())},
+    "sleep": {"tool": tool("sleep"), "handler": sleep},
+    "crash": {"tool": tool("crash"), "handler": lambda arguments: os._exit(1)},
+}
+
+
+if __name__ == "__main__":
+    asyncio.run(start_mcp_server(TOOLS, server_name="test-server"))
@@ -0,0 +1,98 @@
+import http.server
+import threading
+
+import pytest
+
+from bridge_backends import Backend, BackendPool, NoHealthyBackendError, parse_backends
+
+
+@pytest.mark.parametrize("spec", [
+    '[{"url": "http://a:8080/", "model": "gemma", "weight": 2, "slots": 4}, {"url": "http://b:8090"}]',
+    "http://a:8080/;model=gemma;weight=2;slots=4, http://b:8090",
+])
+def test_parse_backends(spec):
+    assert parse_backends(spec) == [Backend("http://a:8080", weight=2.0, model="gemma", slots=4),
+                                    Backend("http://b:8090")]
+
+
+def test_parse_backends_rejects_bad_entries():
+    assert parse_backends("  ") == []
+    with pytest.raises(ValueError, match="Unknown backend option: gpu"):
+        parse_backends("http://a:8080;gpu=1")
+    with pytest.raises(ValueError, match="weight must be positive"):
+        parse_backends("http://a:8080;weight=0")
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.delenv("LLAMAFILE_BACKENDS", raising=False)
+    assert [b.url for b in BackendPool.from_env("http://localhost:8080").backends] == ["http://localhost:8080"]
+    monkeypatch.setenv("LLAMAFILE_BACKENDS", "http://a:8080;slots=2,http://b:8090")
+    pool = BackendPool.from_env("http://localhost:8080")
+    assert [b.url for b in pool.backends] == ["http://a:8080", "http://b:8090"]
+    assert pool.slot_limits() == {"http://a:8080": 2}
+
+
+def test_leases_go_to_the_least_loaded_backend_per_weight():
+    pool = BackendPool([Backend("http://a", weight=2), Backend("http://b")])
+    with pool.lease() as first, pool.lease() as second, pool.lease() as third:
+        assert [first.url, second.url, third.url] == ["http://a", "http://b", "http://a"]
+        assert [s["outstanding"] for s in pool.stats()] == [2, 1]
+    assert [s["outstanding"] for s in pool.stats()] == [0, 0]
+
+
+def test_a_known_model_picks_its_backends():
+    pool = BackendPool([Backend("http://a", model="gemma"), Backend("http://b", model="deepseek")])
+    assert pool.pick("deepseek").url == "http://b"
+    assert pool.pick("local-model").url == "http://a"
+
+
+def test_a_backend_is_ejected_after_repeated_failures_and_readmitted():
+    a, b = Backend("http://a"), Backend("http://b")
+    pool = BackendPool([a, b], failure_threshold=2)
+    pool.mark_failure(a, "refused")
+    assert a.healthy
+    pool.mark_failure(a, "refused")
+    assert not a.healthy
+    assert pool.pick().url == "http://b"
+    pool.mark_failure(b, "refused")
+    pool.mark_failure(b, "refused")
+    with pytest.raises(NoHealthyBackendError, match="No healthy llamafile backend for model gemma"):
+        pool.pick("gemma")
+    pool.mark_success(a)
+    assert pool.pick().url == "http://a"
+    assert pool.stats()[0]["consecutive_failures"] == 0
+
+
+class HealthHandler(http.server.BaseHTTPRequestHandler):
+    status = 200
+
+    def do_GET(self):
+        self.send_response(self.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def health_server():
+    server = http.server.HTTPServer(("127.0.0.1", 0), HealthHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    HealthHandler.status = 200
+
+
+def test_probes_update_health(health_server):
+    backend = Backend(f"http://127.0.0.1:{health_server.server_port}")
+    pool = BackendPool([backend, Backend("http://127.0.0.1:9")], failure_threshold=1, probe_timeout=1.0)
+    pool.probe_all()
+    assert [s["healthy"] for s in pool.stats()] == [True, False]
+    HealthHandler.status = 503
+    assert not pool.probe(backend)
+    assert not backend.healthy
+    HealthHandler.status = 200
+    assert pool.probe(backend)
+    assert backend.healthy
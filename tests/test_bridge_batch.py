@@ -0,0 +1,136 @@
+import json
+
+import pytest
+import requests
+
+import mcp_bridge_flask
+from bridge_batch import BATCH_ID_HEADER, BatchError, BatchManager, parse_batch
+from mcp_bridge_flask import create_bridge_app
+
+BATCH = "\n".join(json.dumps({"custom_id": f"story-{i}", "body": {"messages": [
+    {"role": "user", "content": f"Tell story {i}"}]}}) for i in range(1, 4)) + "\n"
+
+
+def results(lines):
+    return {r["custom_id"]: r for r in map(json.loads, lines)}
+
+
+def test_parse_batch_accepts_both_formats():
+    items = parse_batch('{"custom_id": "a", "body": {"messages": []}}\n\n{"messages": []}\n')
+    assert items == [{"custom_id": "a", "body": {"messages": []}}, {"custom_id": "3", "body": {"messages": []}}]
+
+
+@pytest.mark.parametrize("text, error", [
+    ("{bad", "Line 1: invalid JSON"),
+    ("[1]", "Line 1: expected a JSON object"),
+    ('{"body": {}}', "Line 1: request body needs a 'messages' list"),
+    ('{"custom_id": "a", "body": {"messages": []}}\n{"custom_id": "a", "body": {"messages": []}}',
+     "Line 2: duplicate custom_id 'a'"),
+])
+def test_parse_batch_rejects_bad_lines(text, error):
+    with pytest.raises(BatchError, match=error):
+        parse_batch(text)
+
+
+def test_resume_runs_only_pending_and_failed_items(tmp_path):
+    calls = []
+
+    def flaky(body):
+        calls.append(body["messages"][0]["content"])
+        if body["messages"][0]["content"] == "Tell story 2":
+            return {"error": "backend down"}, 502
+        return {"story": body["messages"][0]["content"]}, 200
+
+    job = BatchManager(flaky, workers=2, directory=str(tmp_path)).submit(BATCH, "job-1")
+    first = results(job.follow())
+    assert first["story-2"]["error"] == {"code": 502, "message": "backend down"}
+    assert job.status()["status"] == "incomplete"
+
+    # A new manager on the same directory, as after a restart
+    calls.clear()
+    manager = BatchManager(lambda body: ({"story": "retold"}, 200), workers=2, directory=str(tmp_path))
+    assert manager.get("job-1").status()["pending"] == 1
+    resumed = manager.submit("", "job-1")
+    second = results(resumed.follow())
+    assert calls == []
+    assert second["story-1"]["response"]["body"] == {"story": "Tell story 1"}
+    assert second["story-2"]["response"] == {"status_code": 200, "body": {"story": "retold"}}
+    assert resumed.status()["status"] == "completed"
+    assert manager.stats()["items_completed"] == 1
+
+
+def test_a_truncated_result_line_is_dropped(tmp_path):
+    manager = BatchManager(lambda body: ({"ok": True}, 200), workers=1, directory=str(tmp_path))
+    list(manager.submit(BATCH, "job-1").follow())
+    path = tmp_path / "job-1" / "results.jsonl"
+    data = path.read_bytes()
+    path.write_bytes(data[:-10])
+
+    job = manager.get("job-1")
+    assert job.status()["succeeded"] == 2
+    assert path.read_bytes().endswith(b"\n")
+
+
+def test_resubmitting_different_requests_is_a_conflict(tmp_path):
+    manager = BatchManager(lambda body: ({}, 200), workers=1, directory=str(tmp_path))
+    list(manager.submit(BATCH, "job-1").follow())
+    with pytest.raises(BatchError) as excinfo:
+        manager.submit('{"messages": []}', "job-1")
+    assert excinfo.value.status_code == 409
+
+
+def test_unknown_and_invalid_ids(tmp_path):
+    manager = BatchManager(lambda body: ({}, 200), workers=1, directory=str(tmp_path))
+    with pytest.raises(BatchError) as excinfo:
+        manager.get("missing")
+    assert excinfo.value.status_code == 404
+    with pytest.raises(BatchError, match="Invalid batch id"):
+        manager.get("../etc")
+
+
+class FakeLlamafile:
+    """Stands in for `requests.post` to llamafile; fails prompts in `failing`."""
+
+    def __init__(self, failing=()):
+        self.failing = set(failing)
+        self.prompts = []
+
+    def __call__(self, url, **kwargs):
+        prompt = kwargs["json"]["messages"][-1]["content"]
+        self.prompts.append(prompt)
+        response = requests.Response()
+        response.url = url
+        if prompt in self.failing:
+            response.status_code = 400
+            response._content = b'{"error": "bad request"}'
+        else:
+            response.status_code = 200
+            response._content = json.dumps({
+                "choices": [{"message": {"role": "assistant", "content": f"Once upon a time: {prompt}"}}]}).encode()
+        return response
+
+
+def test_flask_batch_resumes_after_restart(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLAMAFILE_BACKENDS", "http://llamafile.invalid")
+    upstream = FakeLlamafile(failing={"Tell story 2"})
+    monkeypatch.setattr(mcp_bridge_flask.requests, "post", upstream)
+    client = create_bridge_app(mcp_executor=lambda name, args: "", batch_dir=str(tmp_path)).test_client()
+
+    response = client.post("/v1/batch", data=BATCH, headers={BATCH_ID_HEADER: "stories"})
+    assert response.status_code == 200
+    assert response.headers[BATCH_ID_HEADER] == "stories"
+    first = results(response.get_data(as_text=True).splitlines())
+    assert first["story-2"]["response"]["status_code"] == 502
+    assert client.get("/v1/batch/stories").get_json()["pending"] == 1
+
+    # A new app on the same directory, as after a restart
+    upstream = FakeLlamafile()
+    monkeypatch.setattr(mcp_bridge_flask.requests, "post", upstream)
+    client = create_bridge_app(mcp_executor=lambda name, args: "", batch_dir=str(tmp_path)).test_client()
+    response = client.post("/v1/batch", data="", headers={BATCH_ID_HEADER: "stories"})
+    second = results(response.get_data(as_text=True).splitlines())
+    assert upstream.prompts == ["Tell story 2"]
+    assert {r["response"]["status_code"] for r in second.values()} == {200}
+    status = client.get("/v1/batch/stories").get_json()
+    assert status["status"] == "completed"
+    assert status["succeeded"] == 3
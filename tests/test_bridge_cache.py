@@ -0,0 +1,118 @@
+import pytest
+
+import bridge_cache
+from bridge_cache import ResponseCache, cache_directives
+
+
+def body(content="Tell me a story", **params):
+    return {"model": "local-model", "messages": [{"role": "user", "content": content}], **params}
+
+
+PAYLOAD = {"choices": [{"message": {"role": "assistant", "content": "Once upon a time"}}]}
+
+
+def test_exact_hit_and_miss():
+    cache = ResponseCache()
+    assert cache.lookup(body()) == (None, "miss")
+    cache.store(body(), PAYLOAD)
+    assert cache.lookup(body()) == (PAYLOAD, "exact")
+    assert cache.lookup(body("Another story")) == (None, "miss")
+    assert cache.stats() == {"entries": 1, "hits_exact": 1, "hits_semantic": 0, "misses": 2, "evictions": 0,
+                             "skipped_sampled": 0}
+
+
+def test_key_ignores_key_order_but_not_parameters():
+    reordered = {"messages": body()["messages"], "model": "local-model"}
+    assert ResponseCache.keys(body()) == ResponseCache.keys(reordered)
+    exact, scope = ResponseCache.keys(body(temperature=0))
+    assert exact != ResponseCache.keys(body(temperature=0.7))[0]
+    assert scope != ResponseCache.keys(body(temperature=0.7))[1]
+    # The scope covers everything but the messages
+    assert scope == ResponseCache.keys(body("Something else", temperature=0))[1]
+
+
+def test_model_is_part_of_the_key():
+    cache = ResponseCache()
+    cache.store(body(), PAYLOAD)
+    assert cache.lookup({**body(), "model": "other"}) == (None, "miss")
+
+
+def test_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(bridge_cache.time, "time", lambda: now[0])
+    cache = ResponseCache(ttl=10)
+    cache.store(body(), PAYLOAD)
+    now[0] += 9
+    assert cache.lookup(body())[1] == "exact"
+    now[0] += 2
+    assert cache.lookup(body()) == (None, "miss")
+    assert cache.stats()["entries"] == 0
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ResponseCache(max_entries=2)
+    cache.store(body("one"), PAYLOAD)
+    cache.store(body("two"), PAYLOAD)
+    cache.lookup(body("one"))
+    cache.store(body("three"), PAYLOAD)
+    assert cache.lookup(body("two"))[1] == "miss"
+    assert cache.lookup(body("one"))[1] == "exact"
+    assert cache.stats()["evictions"] == 1
+
+
+def fake_embed(text):
+    # One dimension per word, so prompts that share most words are similar
+    words = ["tell", "me", "a", "story", "short", "poem"]
+    return [float(text.lower().split().count(w)) for w in words]
+
+
+def test_semantic_hit_needs_the_same_parameters():
+    cache = ResponseCache(embed=fake_embed, semantic_threshold=0.85)
+    cache.store(body("Tell me a story", temperature=0), PAYLOAD)
+    assert cache.lookup(body("tell me a short story", temperature=0)) == (PAYLOAD, "semantic")
+    assert cache.lookup(body("tell me a short story", temperature=0.5))[1] == "miss"
+    assert cache.lookup(body("a poem", temperature=0))[1] == "miss"
+
+
+def test_a_semantic_hit_counts_as_a_use():
+    cache = ResponseCache(max_entries=2, embed=fake_embed, semantic_threshold=0.85)
+    cache.store(body("Tell me a story", temperature=0), PAYLOAD)
+    cache.store(body("a poem", temperature=0), PAYLOAD)
+    assert cache.lookup(body("tell me a short story", temperature=0))[1] == "semantic"
+    cache.store(body("me me me", temperature=0), PAYLOAD)
+    assert cache.lookup(body("Tell me a story", temperature=0))[1] == "exact"
+    assert cache.lookup(body("a poem", temperature=0))[1] == "miss"
+
+
+def test_sqlite_semantic_lookup(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(path=path, embed=fake_embed).store(body("Tell me a story", temperature=0), PAYLOAD)
+    cache = ResponseCache(path=path, embed=fake_embed, semantic_threshold=0.85)
+    assert cache.lookup(body("tell me a short story", temperature=0)) == (PAYLOAD, "semantic")
+
+
+def test_only_deterministic_requests_are_accepted():
+    cache = ResponseCache()
+    assert cache.accepts(body(temperature=0))
+    assert cache.accepts(body(temperature=0.8, seed=7))
+    assert not cache.accepts(body(temperature=0.8))
+    assert not cache.accepts(body())
+    assert cache.stats()["skipped_sampled"] == 2
+    assert ResponseCache(cache_sampled=True).accepts(body(temperature=0.8))
+
+
+def test_sqlite_cache_survives_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    ResponseCache(path=path).store(body(), PAYLOAD)
+    assert ResponseCache(path=path).lookup(body()) == (PAYLOAD, "exact")
+
+
+@pytest.mark.parametrize("headers, expected", [
+    ({}, (False, False)),
+    ({"X-Cache-Bypass": "1"}, (True, False)),
+    ({"Cache-Control": "no-cache"}, (True, False)),
+    ({"Cache-Control": "no-store"}, (False, True)),
+    ({"Cache-Control": "No-Cache, No-Store"}, (True, True)),
+])
+def test_cache_directives(headers, expected):
+    assert cache_directives(headers) == expected
@@ -0,0 +1,121 @@
+import json
+
+import requests
+
+import mcp_bridge_flask
+from bridge_compaction import (FACTS_HEADER, compact_messages, context_window_from_env, count_message_tokens,
+                               prompt_budget)
+from mcp_bridge_flask import create_bridge_app
+
+
+def tool_pair(call, result):
+    return [{"role": "assistant", "content": f"TOOL_CALL: {call}"},
+            {"role": "user", "content": f"TOOL_RESULT: {result}\n\nContinue with the task."}]
+
+
+def conversation():
+    return ([{"role": "system", "content": "You are a storyteller."},
+             {"role": "user", "content": "Write a story about an elf."}]
+            + tool_pair("get_elf_name(count=1)", "Luthien")
+            + tool_pair("get_location_description()", "Rivendell " + "lore " * 50)
+            + tool_pair("get_random_event()", "A storm"))
+
+
+def test_under_budget_is_unchanged():
+    messages = conversation()
+    compacted, saved = compact_messages(messages, budget=10_000)
+    assert compacted == messages
+    assert saved == 0
+
+
+def test_duplicate_system_prompts_are_dropped():
+    messages = [{"role": "system", "content": "Be brief."}] * 2 + [{"role": "user", "content": "Hi"}]
+    compacted, saved = compact_messages(messages, budget=1)
+    assert compacted[0]["content"] == "Be brief." and compacted.count(compacted[0]) == 1
+    assert saved > 0
+
+
+def test_earlier_tool_pairs_are_collapsed_into_facts():
+    messages = conversation()
+    compacted, saved = compact_messages(messages, count_message_tokens(messages) - 10)
+    facts = [m for m in compacted if m["content"].startswith(FACTS_HEADER)]
+    assert len(facts) == 1
+    assert "- get_elf_name(count=1) -> Luthien" in facts[0]["content"]
+    # The latest pair stays verbatim
+    assert compacted[-2:] == messages[-2:]
+    assert saved > 0
+    assert messages == conversation()
+
+
+def test_latest_pair_is_collapsed_when_still_over_budget():
+    compacted, _ = compact_messages(conversation(), budget=140)
+    assert [m["role"] for m in compacted] == ["system", "user", "user"]
+    assert compacted[-1]["content"].endswith("- get_random_event() -> A storm")
+
+
+def test_oldest_history_is_dropped_last():
+    messages = ([{"role": "system", "content": "You are a storyteller."},
+                 {"role": "user", "content": "What is Gondolin? " * 20},
+                 {"role": "assistant", "content": "A hidden city. " * 20},
+                 {"role": "user", "content": "Write a story about an elf."}]
+                + tool_pair("get_elf_name(count=1)", "Luthien"))
+    compacted, _ = compact_messages(messages, budget=60)
+    assert [m["content"][:12] for m in compacted] == ["You are a st", "Write a stor", FACTS_HEADER[:12]]
+    assert count_message_tokens(compacted) <= 60
+
+
+def test_none_and_list_content_do_not_break_compaction():
+    multimodal = [{"type": "text", "text": "Describe this map."}, {"type": "image_url", "image_url": {"url": "x"}}]
+    messages = ([{"role": "system", "content": None},
+                 {"role": "user", "content": multimodal},
+                 {"role": "assistant", "content": None},
+                 {"role": "user", "content": "And now a story."}]
+                + tool_pair("get_elf_name()", "Arwen " * 40)
+                + tool_pair("get_random_event()", "A feast"))
+    compacted, saved = compact_messages(messages, budget=30)
+    assert saved > 0
+    assert {"role": "user", "content": "And now a story."} in compacted
+    assert compacted[-1]["content"].startswith(FACTS_HEADER)
+    assert compacted[-1]["content"].endswith("- get_random_event() -> A feast")
+
+
+def test_list_content_is_not_taken_for_a_tool_reply():
+    messages = [{"role": "assistant", "content": "TOOL_CALL: get_elf_name()"},
+                {"role": "user", "content": [{"type": "text", "text": "TOOL_RESULT: Luthien"}]},
+                {"role": "user", "content": "Go on."}]
+    compacted, _ = compact_messages(messages, budget=1)
+    assert not any(isinstance(m["content"], str) and m["content"].startswith(FACTS_HEADER) for m in compacted)
+
+
+def test_context_window_from_env(monkeypatch):
+    monkeypatch.delenv("BRIDGE_CONTEXT_WINDOW", raising=False)
+    assert context_window_from_env() is None
+    monkeypatch.setenv("BRIDGE_CONTEXT_WINDOW", "8192")
+    assert context_window_from_env() == 8192
+    monkeypatch.setenv("BRIDGE_CONTEXT_WINDOW", "lots")
+    assert context_window_from_env() is None
+    monkeypatch.setenv("BRIDGE_CONTEXT_WINDOW", "0")
+    assert context_window_from_env() is None
+
+
+def test_prompt_budget():
+    assert prompt_budget(1000, 8192) == 7192
+    assert prompt_budget(8000, 8192) == 256
+
+
+def test_the_bridge_compacts_with_a_null_max_tokens(monkeypatch):
+    sent = []
+
+    def llamafile(url, **kwargs):
+        sent.append(kwargs["json"])
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({"choices": [{"message": {"role": "assistant", "content": "Done."}}]}).encode()
+        return response
+
+    monkeypatch.setenv("LLAMAFILE_BACKENDS", "http://llamafile.invalid")
+    monkeypatch.setattr(mcp_bridge_flask.requests, "post", llamafile)
+    client = create_bridge_app(mcp_executor=lambda name, args: "", context_window=4096).test_client()
+    response = client.post("/v1/chat/completions", json={"messages": conversation()[1:], "max_tokens": None})
+    assert response.status_code == 200
+    assert sent[0]["max_tokens"] == 600
@@ -0,0 +1,148 @@
+import socket
+import threading
+import time
+
+import pytest
+
+import bridge_deadline
+from bridge_deadline import (ClientDisconnected, Deadline, DeadlineExceeded, DecodeRate, ToolTimeout,
+                             call_with_timeout, default_request_timeout, parse_deadline_header, socket_disconnected,
+                             tool_pool_stats)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+def test_remaining_and_check(clock):
+    deadline = Deadline(10, clock=clock)
+    clock.now += 4
+    assert deadline.remaining() == 6
+    assert deadline.check() == 6
+    clock.now += 6
+    assert deadline.remaining() == 0
+    with pytest.raises(DeadlineExceeded, match="deadline of 10.0s exceeded"):
+        deadline.check()
+
+
+def test_check_keeps_a_minimum_for_the_next_call(clock):
+    deadline = Deadline(10, clock=clock)
+    clock.now += 9.5
+    with pytest.raises(DeadlineExceeded):
+        deadline.llm_budget()
+
+
+def test_a_cancelled_request_stops_at_the_next_check(clock):
+    gone = []
+    deadline = Deadline(10, is_cancelled=lambda: bool(gone), clock=clock)
+    assert deadline.check() == 10
+    gone.append(True)
+    with pytest.raises(ClientDisconnected):
+        deadline.check()
+
+
+@pytest.mark.parametrize("elapsed, tool_timeout, budget", [
+    (0, 30, 30),      # plenty left: the tool timeout applies
+    (0, 100, 75),     # a quarter of the 300 s that are left
+    (280, 30, 5),     # a quarter of the last 20 s
+    (299, 30, 0.25),
+])
+def test_tool_budget_is_the_tool_timeout_capped_by_a_share_of_the_rest(clock, elapsed, tool_timeout, budget):
+    deadline = Deadline(300, clock=clock)
+    clock.now += elapsed
+    assert deadline.tool_budget(tool_timeout) == pytest.approx(budget)
+
+
+def test_no_tool_budget_after_the_deadline(clock):
+    deadline = Deadline(300, clock=clock)
+    clock.now += 300
+    with pytest.raises(DeadlineExceeded):
+        deadline.tool_budget()
+
+
+def test_queue_timeout_is_capped_by_the_remaining_time(clock):
+    deadline = Deadline(10, clock=clock)
+    assert deadline.queue_timeout(None) == 10
+    assert deadline.queue_timeout(3) == 3
+    clock.now += 8
+    assert deadline.queue_timeout(3) == 2
+
+
+@pytest.mark.parametrize("headers, budget", [
+    ({}, 300),
+    ({"X-Request-Timeout": "20"}, 20),
+    ({"X-Request-Timeout": "900"}, 300),
+    ({"X-Request-Timeout": "-5"}, 0),
+    ({"X-Request-Timeout": "soon"}, 300),
+])
+def test_parse_deadline_header(headers, budget):
+    assert parse_deadline_header(headers, 300) == budget
+
+
+def test_default_request_timeout(monkeypatch):
+    monkeypatch.delenv("BRIDGE_REQUEST_TIMEOUT", raising=False)
+    assert default_request_timeout() == 300
+    monkeypatch.setenv("BRIDGE_REQUEST_TIMEOUT", "60")
+    assert default_request_timeout() == 60
+    monkeypatch.setenv("BRIDGE_REQUEST_TIMEOUT", "later")
+    assert default_request_timeout() == 300
+
+
+def test_decode_rate_lowers_max_tokens_only_when_needed():
+    rate = DecodeRate(alpha=0.5)
+    assert rate.max_tokens("a", 1.0, 600) == 600
+    rate.observe("a", 100, 2.0)
+    assert rate.stats() == {"a": {"tokens_per_second": 50.0}}
+    rate.observe("a", 150, 1.0)
+    assert rate.stats()["a"]["tokens_per_second"] == 100.0
+    assert rate.max_tokens("a", 10.0, 600) == 600
+    assert rate.max_tokens("a", 2.0, 600) == 200
+    assert rate.max_tokens("a", 2.0, None) == 200
+    assert rate.max_tokens("b", 2.0, None) is None
+
+
+def test_a_timed_out_call_is_counted_until_its_worker_returns():
+    release = threading.Event()
+    before = tool_pool_stats()
+    with pytest.raises(ToolTimeout, match="Tool 'slow' timed out after 0.1s"):
+        call_with_timeout("slow", 0.1, release.wait, 5)
+    assert tool_pool_stats()["abandoned"] == before["abandoned"] + 1
+    release.set()
+    for _ in range(100):
+        if tool_pool_stats()["abandoned"] == before["abandoned"]:
+            break
+        time.sleep(0.01)
+    stats = tool_pool_stats()
+    assert stats["abandoned"] == before["abandoned"]
+    assert stats["abandoned_total"] == before["abandoned_total"] + 1
+    assert call_with_timeout("fast", 1.0, lambda x: x * 2, 21) == 42
+
+
+def test_tool_workers_from_env(monkeypatch):
+    monkeypatch.setenv("BRIDGE_TOOL_WORKERS", "4")
+    assert bridge_deadline.tool_workers() == 4
+    monkeypatch.setenv("BRIDGE_TOOL_WORKERS", "many")
+    assert bridge_deadline.tool_workers() == bridge_deadline.DEFAULT_TOOL_WORKERS
+
+
+def test_socket_disconnected():
+    assert not socket_disconnected(None)
+    left, right = socket.socketpair()
+    try:
+        assert not socket_disconnected(left)
+        right.sendall(b"x")
+        assert not socket_disconnected(left)
+        assert left.recv(1) == b"x"
+        right.close()
+        assert socket_disconnected(left)
+    finally:
+        left.close()
@@ -0,0 +1,32 @@
+import json
+
+import pytest
+
+import bridge_json
+
+
+@pytest.fixture(params=["orjson", "json"])
+def codec(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(bridge_json, "orjson", None)
+    elif bridge_json.orjson is None:
+        pytest.skip("orjson is not installed")
+    return bridge_json
+
+
+def test_round_trip_from_bytes_and_str(codec):
+    body = {"model": "gemma", "messages": [{"role": "user", "content": "Name an elf: Lúthien"}],
+            "max_tokens": None, "temperature": 0.5}
+    encoded = codec.dumps(body)
+    assert isinstance(encoded, bytes)
+    assert codec.loads(encoded) == body
+    assert codec.loads(encoded.decode("utf-8")) == body
+
+
+def test_dumps_is_compact_utf8(codec):
+    assert codec.dumps({"a": [1, 2], "b": "é"}) == '{"a":[1,2],"b":"é"}'.encode("utf-8")
+
+
+def test_loads_rejects_invalid_json(codec):
+    with pytest.raises(json.JSONDecodeError):
+        codec.loads(b'{"choices": [')
@@ -0,0 +1,91 @@
+import io
+import json
+import logging
+
+import pytest
+
+import bridge_logging
+from bridge_logging import (current_request_id, dump_request_log, get_logger, log_event, request_log_context)
+
+
+@pytest.fixture
+def output():
+    stream = io.StringIO()
+    bridge_logging.configure_logging(level="DEBUG", fmt="json", sample_rate=0.0, stream=stream)
+
+    def lines():
+        # Reconfiguring stops the listener, which writes out what is queued
+        bridge_logging.configure_logging(level="DEBUG", fmt="json", sample_rate=0.0, stream=io.StringIO())
+        return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    yield lines
+    bridge_logging.configure_logging()
+
+
+def test_events_are_json_lines_with_the_request_id(output):
+    log = get_logger("mcp_bridge_flask")
+    with request_log_context("req-1") as request_id:
+        assert current_request_id() == request_id == "req-1"
+        log_event(log, logging.INFO, "request_complete", iterations=2)
+    [event] = output()
+    assert event["logger"] == "bridge.mcp_bridge_flask"
+    assert {k: event[k] for k in ("level", "event", "request_id", "iterations")} == {
+        "level": "info", "event": "request_complete", "request_id": "req-1", "iterations": 2}
+    assert current_request_id() is None
+
+
+def test_payload_events_are_emitted_only_for_sampled_requests(output):
+    log = get_logger("bridge")
+    with request_log_context(sampled=False):
+        log_event(log, logging.DEBUG, "llm_response", payload=True, preview="unsampled")
+    with request_log_context(sampled=True):
+        log_event(log, logging.DEBUG, "llm_response", payload=True, preview="sampled")
+    log_event(log, logging.DEBUG, "llm_response", payload=True, preview="no request, rate 0")
+    assert [e["preview"] for e in output()] == ["sampled"]
+
+
+def test_a_failed_request_dumps_its_buffered_events(output):
+    log = get_logger("bridge")
+    with request_log_context("req-2", sampled=False):
+        log_event(log, logging.DEBUG, "llm_response", payload=True, preview="hidden until now")
+        log_event(log, logging.INFO, "tool_called", tool="get_elf_name")
+        dump_request_log(log)
+        dump_request_log(log)
+    events = output()
+    assert [e["event"] for e in events] == ["tool_called", "request_failed"]
+    buffered = events[-1]["buffered_events"]
+    assert [(e["event"], e["level"]) for e in buffered] == [("llm_response", "debug"), ("tool_called", "info")]
+    assert buffered[0]["preview"] == "hidden until now"
+
+
+def test_exceptions_keep_their_traceback(output):
+    log = get_logger("bridge")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        log.exception("tool_handler_failed", extra={"fields": {"tool": "get_elf_name"}})
+    [event] = output()
+    assert event["tool"] == "get_elf_name"
+    assert "ValueError: boom" in event["exception"]
+
+
+def test_the_level_filters_events(output):
+    bridge_logging.configure_logging(level="WARNING", fmt="json", stream=io.StringIO())
+    log = get_logger("bridge")
+    log_event(log, logging.INFO, "quiet")
+    assert output() == []
+
+
+def test_the_text_format(output):
+    stream = io.StringIO()
+    bridge_logging.configure_logging(level="INFO", fmt="text", stream=stream)
+    log = get_logger("bridge")
+    with request_log_context("req-3"):
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log.exception("tool_failed", extra={"fields": {"tool": "get_elf_name"}})
+    output()
+    first, *traceback = stream.getvalue().splitlines()
+    assert first.endswith(" ERROR tool_failed request_id=req-3 tool='get_elf_name'")
+    assert traceback[-1] == "ValueError: boom"
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import sys
+import threading
+from pathlib import Path
+
+import pytest
+import requests
+from mcp import StdioServerParameters
+from mcp.types import ListToolsResult, Tool
+
+import mcp_bridge_flask
+from bridge_deadline import ToolTimeout
+from bridge_mcp_executor import MCPClientExecutor, MCPToolError
+from bridge_mcp_pool import MCPSessionPool
+from mcp_bridge_flask import create_bridge_app
+
+SERVER = Path(__file__).with_name("mcp_stdio_server.py")
+
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = MCPClientExecutor.for_script(str(SERVER), size=1).start()
+    yield executor
+    executor.close()
+
+
+def test_tool_definitions_come_from_tools_list(executor):
+    assert [t.name for t in executor.tool_definitions] == ["echo", "pid", "sleep", "crash"]
+
+
+def test_calls_from_many_threads_share_one_session(executor):
+    results = []
+    threads = [threading.Thread(target=lambda i=i: results.append(executor("echo", {"text": f"hi {i}"})))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    assert sorted(results) == sorted(f"hi {i}" for i in range(8))
+    assert len({executor("pid", {}) for _ in range(3)}) == 1
+
+
+def test_a_slow_call_times_out_and_the_session_stays_usable(executor):
+    with pytest.raises(ToolTimeout):
+        executor.call("sleep", {"seconds": 5}, timeout=0.2)
+    assert executor("echo", {"text": "still here"}) == "still here"
+
+
+def test_unknown_tools_are_errors(executor):
+    with pytest.raises(MCPToolError, match="Unknown tool"):
+        executor("summon_dragon", {})
+
+
+class FakeSession:
+    """Answers `tools/list` with a fixed list, as a refreshed session would."""
+
+    def __init__(self, tools):
+        self.tools = tools
+
+    async def list_tools(self, cursor=None):
+        return ListToolsResult(tools=self.tools)
+
+
+def test_the_bridge_registry_follows_the_server_tools(monkeypatch):
+    prompts = []
+
+    def llamafile(url, **kwargs):
+        prompts.append(kwargs["json"]["messages"][0]["content"])
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps({"choices": [{"message": {"role": "assistant", "content": "Done."}}]}).encode()
+        return response
+
+    monkeypatch.setenv("LLAMAFILE_BACKENDS", "http://llamafile.invalid")
+    monkeypatch.setattr(mcp_bridge_flask.requests, "post", llamafile)
+    # No session comes up, so the bridge starts without tools
+    broken = StdioServerParameters(command=sys.executable, args=["-c", "pass"])
+    executor = MCPClientExecutor(pool=MCPSessionPool(broken, size=1, init_timeout=0.2, min_backoff=60))
+    try:
+        client = create_bridge_app(mcp_executor=executor, tool_grammar=True).test_client()
+        health = client.get("/health").get_json()
+        assert health["tools"]["tools"] == [] and health["tool_grammar"] is False
+
+        tools = [Tool(name="get_elf_name", description="Elf names", inputSchema={"type": "object"})]
+        refresh = executor.pool.refresh_tools(FakeSession(tools))
+        asyncio.run_coroutine_threadsafe(refresh, executor._event_loop()).result(5)
+
+        health = client.get("/health").get_json()
+        assert health["tools"]["tools"] == ["get_elf_name"] and health["tool_grammar"] is True
+        client.post("/v1/chat/completions", json={"messages": [{"role": "user", "content": "Hi"}]})
+        assert "get_elf_name() - Elf names" in prompts[-1]
+    finally:
+        executor.close()
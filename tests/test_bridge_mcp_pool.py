@@ -0,0 +1,82 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from mcp import StdioServerParameters
+from mcp.shared.exceptions import McpError
+
+from bridge_mcp_pool import MCPSessionPool, MCPUnavailableError
+
+SERVER = StdioServerParameters(command=sys.executable, args=[str(Path(__file__).with_name("mcp_stdio_server.py"))])
+
+
+def text(result):
+    return result.content[0].text
+
+
+def run(main, server=SERVER, **kwargs):
+    async def wrapper():
+        pool = MCPSessionPool(server, **kwargs)
+        try:
+            return await main(pool)
+        finally:
+            await pool.close()
+    return asyncio.run(wrapper())
+
+
+def test_calls_are_spread_over_the_sessions():
+    async def main(pool):
+        await pool.start()
+        await asyncio.wait_for(asyncio.gather(*(s.ready.wait() for s in pool.sessions)), 10)
+        pids = await asyncio.gather(*(pool.call_tool("pid", {}) for _ in range(4)))
+        return {text(r) for r in pids}, pool.stats()
+
+    pids, stats = run(main, size=2)
+    assert len(pids) == 2
+    assert stats["ready"] == 2 and stats["calls"] == 4 and stats["errors"] == 0
+
+
+def test_tools_are_listed_before_a_session_is_ready():
+    changes = []
+
+    async def main(pool):
+        pool.on_tools_changed(changes.append)
+        await pool.start()
+        return [t.name for t in pool.tools]
+
+    assert run(main, size=1) == ["echo", "pid", "sleep", "crash"]
+    assert [[t.name for t in tools] for tools in changes] == [["echo", "pid", "sleep", "crash"]]
+
+
+def test_a_dead_session_is_restarted():
+    async def main(pool):
+        await pool.start()
+        first = text(await pool.call_tool("pid", {}))
+        with pytest.raises(McpError):
+            await pool.call_tool("crash", {})
+        # The next call waits for the restarted server
+        second = text(await asyncio.wait_for(pool.call_tool("pid", {}), 10))
+        return first, second, pool.session_stats()[0]
+
+    first, second, session = run(main, size=1, min_backoff=0.05)
+    assert first != second
+    assert session["restarts"] == 1
+    assert session["state"] == "ready"
+
+
+def test_start_fails_when_no_session_comes_up():
+    async def main(pool):
+        with pytest.raises(MCPUnavailableError):
+            await pool.start()
+        return pool.stats()["ready"]
+
+    broken = StdioServerParameters(command=sys.executable, args=["-c", "pass"])
+    assert run(main, broken, size=1, init_timeout=0.5, min_backoff=5) == 0
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("BRIDGE_MCP_SESSIONS", "3")
+    monkeypatch.setenv("BRIDGE_MCP_SESSION_CONCURRENCY", "lots")
+    pool = MCPSessionPool.from_env(SERVER)
+    assert (pool.size, pool.max_concurrency) == (3, 4)
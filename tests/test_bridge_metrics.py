@@ -0,0 +1,73 @@
+import pytest
+
+from bridge_metrics import BridgeMetrics, MetricsRegistry, _Metric
+
+
+def lines(text):
+    return [line for line in text.splitlines() if not line.startswith("#")]
+
+
+def test_a_metric_must_render():
+    with pytest.raises(TypeError):
+        _Metric("bridge_x", "x")
+
+
+def test_counters_and_gauges():
+    registry = MetricsRegistry()
+    errors = registry.counter("bridge_errors_total", "Errors", ("type",))
+    in_flight = registry.gauge("bridge_in_flight", "In flight")
+    errors.inc(type="llamafile")
+    errors.inc(2, type="llamafile")
+    errors.inc(type='say "hi"\n')
+    in_flight.inc()
+    in_flight.inc()
+    in_flight.dec()
+    text = registry.render()
+    assert "# TYPE bridge_errors_total counter" in text
+    assert lines(text) == ['bridge_errors_total{type="llamafile"} 3',
+                           'bridge_errors_total{type="say \\"hi\\"\\n"} 1',
+                           "bridge_in_flight 1"]
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("bridge_latency_seconds", "Latency", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        latency.observe(value)
+    assert lines(registry.render()) == [
+        'bridge_latency_seconds_bucket{le="0.1"} 1',
+        'bridge_latency_seconds_bucket{le="1"} 3',
+        'bridge_latency_seconds_bucket{le="+Inf"} 4',
+        "bridge_latency_seconds_sum 4.25",
+        "bridge_latency_seconds_count 4",
+    ]
+
+
+def test_stats_become_gauges_and_counters():
+    metrics = BridgeMetrics(MetricsRegistry())
+    metrics.add_stats("bridge_cache", lambda: {"entries": 3, "hits": 7, "enabled": True, "path": "x"},
+                      description="Response cache", counters=("hits",))
+    text = metrics.render()
+    assert "# TYPE bridge_cache_hits_total counter" in text
+    assert "# HELP bridge_cache_entries Response cache: entries" in text
+    assert lines(text) == ["bridge_cache_entries 3", "bridge_cache_hits_total 7", "bridge_cache_enabled 1"]
+
+
+def test_labelled_stats_as_dict_or_rows():
+    metrics = BridgeMetrics(MetricsRegistry())
+    metrics.add_stats("bridge_backend", lambda: {"http://a": {"outstanding": 1}, "http://b": {"outstanding": 0}},
+                      label="url")
+    metrics.add_stats("bridge_session", lambda: [{"session": "0", "calls": 4}], label="session", counters=("calls",))
+    metrics.add_stats("bridge_empty", lambda: None)
+    assert lines(metrics.render()) == ['bridge_backend_outstanding{url="http://a"} 1',
+                                       'bridge_backend_outstanding{url="http://b"} 0',
+                                       'bridge_session_calls_total{session="0"} 4']
+
+
+def test_usage_is_recorded_when_present():
+    metrics = BridgeMetrics()
+    metrics.observe_usage({"usage": {"prompt_tokens": 100, "completion_tokens": 20}})
+    metrics.observe_usage({})
+    text = metrics.render()
+    assert "bridge_prompt_tokens_count 1" in text
+    assert "bridge_completion_tokens_sum 20" in text
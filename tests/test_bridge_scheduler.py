@@ -0,0 +1,139 @@
+import threading
+import time
+
+import pytest
+
+from bridge_scheduler import (PRIORITY_BATCH, PRIORITY_INTERACTIVE, AdmissionController, AdmissionHeaderError,
+                              QueueFullError, QueueTimeoutError, parse_admission_headers)
+
+
+def wait_for_queued(controller, backend, count, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while controller.stats()[backend]["queued"] < count:
+        assert time.monotonic() < deadline, "waiters never queued"
+        time.sleep(0.005)
+
+
+def test_admits_up_to_the_limit_without_waiting():
+    controller = AdmissionController(max_concurrency=2)
+    waits = []
+    controller.on_wait = lambda backend, waited: waits.append((backend, waited))
+    controller.acquire("a")
+    controller.acquire("a")
+    stats = controller.stats()["a"]
+    assert stats["active"] == 2
+    assert stats["queued"] == 0
+    assert waits == [("a", 0.0), ("a", 0.0)]
+
+
+def test_queue_timeout_rejects_and_is_counted():
+    controller = AdmissionController(max_concurrency=1)
+    controller.acquire("a")
+    started = time.monotonic()
+    with pytest.raises(QueueTimeoutError) as excinfo:
+        controller.acquire("a", timeout=0.05)
+    assert time.monotonic() - started >= 0.05
+    assert excinfo.value.status_code == 503
+    stats = controller.stats()["a"]
+    assert stats["rejected_timeout"] == 1
+    assert stats["queued"] == 0
+    # The abandoned waiter does not take the slot when it frees up
+    controller.release("a")
+    assert controller.stats()["a"]["active"] == 0
+
+
+def test_release_hands_the_slot_to_the_next_waiter():
+    controller = AdmissionController(max_concurrency=1)
+    waits = []
+    controller.on_wait = lambda backend, waited: waits.append(waited)
+    controller.acquire("a")
+    admitted = threading.Event()
+    thread = threading.Thread(target=lambda: (controller.acquire("a", timeout=2.0), admitted.set()))
+    thread.start()
+    wait_for_queued(controller, "a", 1)
+    controller.release("a")
+    thread.join(2.0)
+    assert admitted.is_set()
+    assert controller.stats()["a"]["active"] == 1
+    assert len(waits) == 2 and waits[1] > 0
+
+
+def test_full_queue_is_rejected_immediately():
+    controller = AdmissionController(max_concurrency=1, max_queue=2)
+    controller.acquire("a")
+    threads = [threading.Thread(target=controller.acquire, args=("a",), kwargs={"timeout": 1.0})
+               for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    wait_for_queued(controller, "a", 2)
+    with pytest.raises(QueueFullError) as excinfo:
+        controller.acquire("a", timeout=1.0)
+    assert excinfo.value.status_code == 429
+    assert controller.stats()["a"]["rejected_full"] == 1
+    for _ in threads:
+        controller.release("a")
+    for thread in threads:
+        thread.join(2.0)
+
+
+def test_batch_requests_are_shed_at_half_the_queue():
+    controller = AdmissionController(max_concurrency=1, max_queue=2)
+    controller.acquire("a")
+    thread = threading.Thread(target=controller.acquire, args=("a",), kwargs={"timeout": 1.0})
+    thread.start()
+    wait_for_queued(controller, "a", 1)
+    with pytest.raises(QueueFullError):
+        controller.acquire("a", priority=PRIORITY_BATCH, timeout=1.0)
+    controller.release("a")
+    thread.join(2.0)
+
+
+def test_interactive_waiters_go_before_batch():
+    controller = AdmissionController(max_concurrency=1)
+    controller.acquire("a")
+    order = []
+
+    def acquire(priority):
+        controller.acquire("a", priority=priority, timeout=2.0)
+        order.append(priority)
+        controller.release("a")
+
+    batch = threading.Thread(target=acquire, args=(PRIORITY_BATCH,))
+    batch.start()
+    wait_for_queued(controller, "a", 1)
+    interactive = threading.Thread(target=acquire, args=(PRIORITY_INTERACTIVE,))
+    interactive.start()
+    wait_for_queued(controller, "a", 2)
+    controller.release("a")
+    batch.join(2.0)
+    interactive.join(2.0)
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_BATCH]
+
+
+def test_backend_limits_override_the_default():
+    controller = AdmissionController(max_concurrency=1, backend_limits={"big": 3})
+    for _ in range(3):
+        controller.acquire("big")
+    assert controller.stats()["big"] == {**controller.stats()["big"], "active": 3, "limit": 3}
+    with pytest.raises(QueueTimeoutError):
+        controller.acquire("big", timeout=0.01)
+
+
+def test_admission_headers():
+    assert parse_admission_headers({}) == (PRIORITY_INTERACTIVE, None)
+    assert parse_admission_headers({"X-Priority": " Batch "}) == (PRIORITY_BATCH, None)
+    assert parse_admission_headers({"X-Priority": "urgent"}) == (PRIORITY_INTERACTIVE, None)
+    assert parse_admission_headers({"X-Queue-Timeout": "2.5"}) == (PRIORITY_INTERACTIVE, 2.5)
+    assert parse_admission_headers({"X-Queue-Timeout": "-1"})[1] == 0.0
+    assert parse_admission_headers({"X-Queue-Timeout": "9999"}, max_timeout=10.0)[1] == 10.0
+
+
+@pytest.mark.parametrize("value", ["abc", "nan", "inf", "-inf"])
+def test_admission_headers_reject_non_numeric_timeouts(value):
+    with pytest.raises(AdmissionHeaderError):
+        parse_admission_headers({"X-Queue-Timeout": value})
+
+
+def test_max_queue_timeout_from_env(monkeypatch):
+    monkeypatch.setenv("BRIDGE_MAX_QUEUE_TIMEOUT", "5")
+    assert parse_admission_headers({"X-Queue-Timeout": "60"})[1] == 5.0
@@ -0,0 +1,232 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from bridge_deadline import Deadline, DeadlineExceeded
+from bridge_singleflight import SingleFlight, canonical_body, should_coalesce
+
+
+def test_canonical_body_ignores_key_order():
+    assert canonical_body({"a": 1, "b": [1, 2]}) == canonical_body({"b": [1, 2], "a": 1})
+
+
+def test_should_coalesce():
+    assert should_coalesce({"temperature": 0}, {})
+    assert should_coalesce({"seed": 7, "temperature": 0.9}, {})
+    assert not should_coalesce({"temperature": 0.7}, {})
+    assert not should_coalesce({}, {})
+    assert should_coalesce({"temperature": 0.7}, {"X-Coalesce": "1"})
+    assert not should_coalesce({"temperature": 0}, {"X-Coalesce": "0"})
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight(cost=lambda result: 3)
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2.0)
+        return "answer"
+
+    results = []
+
+    def call():
+        results.append(flight.do("key", fn))
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    threads[0].start()
+    while not calls:
+        time.sleep(0.001)
+    for thread in threads[1:]:
+        thread.start()
+    while flight.followers("key") < 3:
+        time.sleep(0.001)
+    release.set()
+    for thread in threads:
+        thread.join(2.0)
+
+    assert len(calls) == 1
+    assert sorted(results) == [("answer", False)] + [("answer", True)] * 3
+    assert flight.stats() == {"executions": 1, "coalesced": 3, "upstream_calls_saved": 9}
+    assert flight.followers("key") == 0
+
+
+def test_leader_errors_reach_the_followers():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(2.0)
+        raise RuntimeError("boom")
+
+    errors = []
+
+    def call():
+        try:
+            flight.do("key", fn)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(2.0)
+    follower = threading.Thread(target=call)
+    follower.start()
+    while flight.followers("key") < 1:
+        time.sleep(0.001)
+    release.set()
+    leader.join(2.0)
+    follower.join(2.0)
+    assert errors == ["boom", "boom"]
+
+
+def test_sequential_calls_run_again():
+    flight = SingleFlight()
+    assert flight.do("key", lambda: 1) == (1, False)
+    assert flight.do("key", lambda: 2) == (2, False)
+    assert flight.stats()["executions"] == 2
+
+
+def test_async_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fn) for _ in range(3)))
+
+    results = asyncio.run(main())
+    assert len(calls) == 1
+    assert results == [("answer", False), ("answer", True), ("answer", True)]
+    assert flight.stats()["coalesced"] == 2
+
+
+def test_async_leader_error_reaches_the_followers():
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.01)
+        raise ValueError("bad")
+
+    async def main():
+        return await asyncio.gather(*(flight.do_async("key", fn) for _ in range(2)), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [type(r) for r in results] == [ValueError, ValueError]
+
+
+def test_a_cancelled_follower_does_not_cancel_the_leader():
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async("key", fn))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == ("answer", False)
+
+
+def test_a_cancelled_leader_does_not_cancel_the_followers():
+    flight = SingleFlight()
+    calls = []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", fn))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do_async("key", fn))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == ("answer", True)
+    assert calls == [1]
+
+
+def test_the_work_is_cancelled_when_every_caller_is_gone():
+    flight = SingleFlight()
+    cancelled = []
+
+    async def fn():
+        try:
+            await asyncio.sleep(1)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def main():
+        callers = [asyncio.ensure_future(flight.do_async("key", fn)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flight.followers("key")
+
+    assert asyncio.run(main()) == 0
+    assert cancelled == [1]
+
+
+def test_a_follower_stops_waiting_at_its_deadline():
+    flight = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fn():
+        started.set()
+        release.wait(2.0)
+        return "answer"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do("key", fn)))
+    leader.start()
+    started.wait(2.0)
+    waited = time.monotonic()
+    with pytest.raises(DeadlineExceeded):
+        flight.do("key", fn, Deadline(0.05))
+    assert time.monotonic() - waited < 1.0
+    assert flight.followers("key") == 0
+    release.set()
+    leader.join(2.0)
+    assert results == [("answer", False)]
+
+
+def test_an_async_follower_stops_waiting_at_its_deadline():
+    flight = SingleFlight()
+
+    async def fn():
+        await asyncio.sleep(0.2)
+        return "answer"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("key", fn))
+        await asyncio.sleep(0)
+        with pytest.raises(DeadlineExceeded):
+            await flight.do_async("key", fn, Deadline(0.02))
+        return await leader
+
+    assert asyncio.run(main()) == ("answer", False)
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from bridge_tracing import (configure_tracing, current_traceparent, inject_traceparent, parse_traceparent,
+                            set_attributes, span)
+
+
+@pytest.fixture
+def trace_file(tmp_path):
+    path = tmp_path / "trace.json"
+    configure_tracing(str(path), service="tests")
+    yield path
+    configure_tracing(None)
+
+
+def events(path):
+    # The trailing "]" is optional in the Chrome trace format
+    return [e for e in json.loads(path.read_text().rstrip(",\n") + "]") if e["ph"] == "X"]
+
+
+def test_spans_nest_and_share_the_trace(trace_file):
+    with span("chat.completions", request_id="r1") as request:
+        with span("tool.call", tool="get_elf_name") as call:
+            set_attributes(call, prefetched=True)
+            headers = inject_traceparent({})
+    tool_event, request_event = events(trace_file)
+    assert (tool_event["name"], request_event["name"]) == ("tool.call", "chat.completions")
+    assert tool_event["args"]["trace_id"] == request_event["args"]["trace_id"] == request.trace_id
+    assert tool_event["args"]["parent_id"] == request.span_id
+    assert request_event["args"]["parent_id"] is None
+    assert tool_event["args"]["prefetched"] is True
+    assert tool_event["cat"] == "tool"
+    assert headers == {"traceparent": call.traceparent}
+    assert current_traceparent() is None
+
+
+def test_an_incoming_traceparent_is_continued(trace_file):
+    parent = parse_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+    with span("mcp_server.call_tool", parent=parent):
+        assert current_traceparent().startswith("00-0af7651916cd43dd8448eb211c80319c-")
+    [event] = events(trace_file)
+    assert event["args"]["parent_id"] == "b7ad6b7169203331"
+
+
+def test_errors_are_recorded(trace_file):
+    with pytest.raises(ValueError):
+        with span("tool.call"):
+            raise ValueError("boom")
+    assert events(trace_file)[0]["args"]["error"] == "ValueError: boom"
+
+
+def test_disabled_tracing_yields_no_span(tmp_path, monkeypatch):
+    monkeypatch.delenv("BRIDGE_TRACE_FILE", raising=False)
+    configure_tracing(None)
+    with span("chat.completions") as s:
+        set_attributes(s, status=200)
+        assert s is None
+        assert inject_traceparent({}) == {}
+
+
+@pytest.mark.parametrize("value", [
+    None, "", "garbage", "00-xyz-b7ad6b7169203331-01",
+    "00-00000000000000000000000000000000-b7ad6b7169203331-01",
+    "00-0af7651916cd43dd8448eb211c80319c-0000000000000000-01",
+])
+def test_invalid_traceparents_are_ignored(value):
+    assert parse_traceparent(value) is None
@@ -0,0 +1,60 @@
+import asyncio
+import time
+
+import pytest
+from mcp.types import TextContent, Tool
+
+from mcp_server import InProcessExecutor
+
+
+def tool(name):
+    return Tool(name=name, description=name, inputSchema={"type": "object"})
+
+
+async def slow_event(arguments):
+    await asyncio.sleep(arguments.get("seconds", 0))
+    return {"event": "A storm"}
+
+
+TOOLS = {
+    "get_elf_name": {"tool": tool("get_elf_name"), "handler": lambda arguments: "Luthien"},
+    "get_event": {"tool": tool("get_event"), "handler": slow_event},
+    "get_lines": {"tool": tool("get_lines"),
+                  "handler": lambda arguments: [TextContent(type="text", text="one"),
+                                                TextContent(type="text", text="two")]},
+}
+
+
+@pytest.fixture
+def executor():
+    return InProcessExecutor(TOOLS)
+
+
+def test_tool_definitions_come_from_the_mapping(executor):
+    assert [t.name for t in executor.tool_definitions] == ["get_elf_name", "get_event", "get_lines"]
+
+
+def test_sync_calls_return_text(executor):
+    assert executor("get_elf_name", {}) == "Luthien"
+    assert executor("get_event", {}) == "{'event': 'A storm'}"
+    assert executor("get_lines", {}) == "one\ntwo"
+
+
+def test_async_calls_return_the_same_text(executor):
+    async def main():
+        return [await executor.call_async(name, {}) for name in ("get_elf_name", "get_event", "get_lines")]
+
+    assert asyncio.run(main()) == ["Luthien", "{'event': 'A storm'}", "one\ntwo"]
+
+
+def test_unknown_tools_are_rejected(executor):
+    with pytest.raises(ValueError, match="Unknown tool"):
+        executor("get_dragon", {})
+
+
+def test_sync_calls_are_bounded_by_the_tool_timeout():
+    executor = InProcessExecutor(TOOLS, tool_timeout=0.1)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        executor("get_event", {"seconds": 5})
+    assert time.monotonic() - started < 2.0
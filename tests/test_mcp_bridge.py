@@ -0,0 +1,34 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+import mcp_bridge
+from bridge_backends import Backend
+from bridge_deadline import Deadline
+from bridge_mcp_pool import MCPUnavailableError
+
+
+def test_no_mcp_session_for_discovery_is_a_503(monkeypatch):
+    async def unavailable():
+        raise MCPUnavailableError("No MCP session ready after 0.1s")
+
+    monkeypatch.setattr(mcp_bridge, "current_tools", unavailable)
+    response = TestClient(mcp_bridge.app).post("/v1/chat/completions",
+                                               json={"messages": [{"role": "user", "content": "Hi"}]})
+    assert response.status_code == 503
+    assert response.json() == {"error": "No MCP session ready after 0.1s"}
+
+
+def test_an_unreachable_backend_counts_the_failed_call(monkeypatch):
+    monkeypatch.setattr(mcp_bridge, "http_client", None)
+    backend = Backend("http://127.0.0.1:9")
+
+    async def main():
+        try:
+            return await mcp_bridge.run_tool_loop({"messages": [], "tools": []}, backend, Deadline(5))
+        finally:
+            await mcp_bridge.http_client.aclose()
+
+    result = asyncio.run(main())
+    assert result.status == 503
+    assert result.llm_calls == 1
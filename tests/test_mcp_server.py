@@ -0,0 +1,212 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+
+import pytest
+import uvicorn
+from mcp.types import Tool
+
+from bridge_mcp_executor import MCPClientExecutor
+from mcp_server import ToolRunner, create_http_app
+
+
+def tool(name):
+    return Tool(name=name, description=name, inputSchema={"type": "object"})
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def worker_pid(arguments):
+    return os.getpid()
+
+
+def exit_worker(arguments):
+    os._exit(1)
+
+
+def scale(arguments, factor):
+    return arguments["n"] * factor
+
+
+def test_sync_handlers_do_not_block_the_loop():
+    runner = ToolRunner({"slow": {"tool": tool("slow"), "handler": lambda arguments: time.sleep(0.2) or "done"}})
+
+    async def main():
+        ticks = 0
+
+        async def tick():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticker = asyncio.ensure_future(tick())
+        result = await runner.run("slow", {})
+        ticker.cancel()
+        return result, ticks
+
+    result, ticks = run(main())
+    runner.shutdown()
+    assert result == "done"
+    assert ticks >= 5
+
+
+def test_inline_and_async_handlers_run_on_the_loop():
+    async def lookup(arguments):
+        return threading.current_thread().name
+
+    runner = ToolRunner({
+        "inline": {"tool": tool("inline"), "handler": lambda arguments: threading.current_thread().name,
+                   "executor": "inline"},
+        "async": {"tool": tool("async"), "handler": lookup},
+        "thread": {"tool": tool("thread"), "handler": lambda arguments: threading.current_thread().name},
+    })
+
+    async def main():
+        return [await runner.run(name, {}) for name in ("inline", "async", "thread")]
+
+    inline, async_, thread = run(main())
+    runner.shutdown()
+    assert inline == async_ == threading.current_thread().name
+    assert thread.startswith("mcp-tool")
+
+
+def test_a_slow_call_times_out():
+    release = threading.Event()
+    runner = ToolRunner({"stuck": {"tool": tool("stuck"), "handler": lambda arguments: release.wait(5)},
+                         "quick": {"tool": tool("quick"), "handler": lambda arguments: "ok", "timeout": None}},
+                        timeout=0.1)
+
+    async def main():
+        started = time.monotonic()
+        with pytest.raises(TimeoutError, match="Tool 'stuck' timed out after 0.1s"):
+            await runner.run("stuck", {})
+        return time.monotonic() - started, await runner.run("quick", {})
+
+    waited, quick = run(main())
+    release.set()
+    runner.shutdown()
+    assert waited < 1.0
+    assert quick == "ok"
+
+
+def test_max_concurrency_limits_calls_of_one_tool():
+    running = []
+    peak = []
+    lock = threading.Lock()
+
+    def handler(arguments):
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        time.sleep(0.05)
+        with lock:
+            running.pop()
+        return "ok"
+
+    runner = ToolRunner({"lookup": {"tool": tool("lookup"), "handler": handler, "max_concurrency": 2}})
+
+    async def main():
+        return await asyncio.gather(*(runner.run("lookup", {}) for _ in range(6)))
+
+    assert run(main()) == ["ok"] * 6
+    runner.shutdown()
+    assert max(peak) == 2
+
+
+def test_a_timed_out_call_keeps_its_slot_until_it_returns():
+    release = threading.Event()
+    runner = ToolRunner({"lookup": {"tool": tool("lookup"), "handler": lambda arguments: release.wait(5) and "ok",
+                                    "max_concurrency": 1, "timeout": 0.1}})
+
+    async def main():
+        with pytest.raises(TimeoutError):
+            await runner.run("lookup", {})
+        # The abandoned call still runs; the wait for its slot times out too
+        started = time.monotonic()
+        with pytest.raises(TimeoutError):
+            await runner.run("lookup", {})
+        waited = time.monotonic() - started
+        release.set()
+        await asyncio.sleep(0.05)
+        return waited, await runner.run("lookup", {})
+
+    waited, result = run(main())
+    runner.shutdown()
+    assert waited < 1.0
+    assert result == "ok"
+
+
+def test_unknown_tools_are_rejected():
+    runner = ToolRunner({})
+    with pytest.raises(ValueError, match="Unknown tool: missing"):
+        run(runner.run("missing", {}))
+
+
+def test_process_handlers_run_in_warm_worker_processes():
+    runner = ToolRunner({
+        "pid": {"tool": tool("pid"), "handler": worker_pid, "executor": "process"},
+        "scale": {"tool": tool("scale"), "handler": functools.partial(scale, factor=3), "executor": "process"},
+    }, process_workers=2)
+    runner.warm()
+
+    async def main():
+        pids = await asyncio.gather(*(runner.run("pid", {}) for _ in range(4)))
+        return set(pids), await runner.run("scale", {"n": 14})
+
+    pids, scaled = run(main())
+    runner.shutdown()
+    assert os.getpid() not in pids
+    assert scaled == 42
+
+
+def test_a_dead_worker_fails_only_its_call():
+    runner = ToolRunner({
+        "pid": {"tool": tool("pid"), "handler": worker_pid, "executor": "process"},
+        "exit": {"tool": tool("exit"), "handler": exit_worker, "executor": "process"},
+    }, process_workers=1)
+
+    async def main():
+        with pytest.raises(RuntimeError, match="worker process exited unexpectedly"):
+            await runner.run("exit", {})
+        return await runner.run("pid", {})
+
+    assert run(main()) != os.getpid()
+    runner.shutdown()
+    assert runner.process_restarts == 1
+
+
+def test_process_handlers_must_be_picklable():
+    with pytest.raises(ValueError, match="a process handler must be picklable"):
+        ToolRunner({"bad": {"tool": tool("bad"), "handler": lambda arguments: 1, "executor": "process"}})
+
+
+@pytest.fixture
+def http_server():
+    tools = {"echo": {"tool": tool("echo"), "handler": lambda arguments: arguments.get("text", "")},
+             "pid": {"tool": tool("pid"), "handler": lambda arguments: str(os.getpid())}}
+    server = uvicorn.Server(uvicorn.Config(create_http_app(tools), host="127.0.0.1", port=0,
+                                           log_level="warning", lifespan="on"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/mcp"
+    server.should_exit = True
+    thread.join(5)
+
+
+def test_clients_share_one_http_server(http_server):
+    executors = [MCPClientExecutor.for_url(http_server, size=2).start() for _ in range(2)]
+    try:
+        assert [t.name for t in executors[0].tool_definitions] == ["echo", "pid"]
+        assert [executor("echo", {"text": f"hi {i}"}) for i, executor in enumerate(executors)] == ["hi 0", "hi 1"]
+        assert len({executor("pid", {}) for executor in executors}) == 1
+    finally:
+        for executor in executors:
+            executor.close()
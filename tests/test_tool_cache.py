@@ -0,0 +1,157 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from mcp.types import Tool
+
+import tool_cache
+from mcp_server import ToolRunner
+from tool_cache import ToolResultCache, advertised, canonical_arguments, entry_policy, tool_policy
+
+
+def tool(name):
+    return Tool(name=name, description=name, inputSchema={"type": "object", "properties": {
+        "query": {"type": "string"}, "count": {"type": "integer", "default": 1}}})
+
+
+def counting_tools():
+    calls = {"search": 0, "roll": 0}
+
+    def search(arguments):
+        calls["search"] += 1
+        return f"lore about {arguments['query']}"
+
+    def roll(arguments):
+        calls["roll"] += 1
+        return f"roll {calls['roll']}"
+
+    tools = {
+        "search": {"tool": tool("search"), "handler": search, "cache_ttl": 60,
+                   "cache_key": lambda args: args["query"].lower()},
+        "roll": {"tool": tool("roll"), "handler": roll},
+    }
+    return tools, calls
+
+
+def test_runner_only_caches_tools_with_a_ttl():
+    tools, calls = counting_tools()
+    runner = ToolRunner(tools, max_workers=2)
+
+    async def main():
+        first = [await runner.run("search", {"query": q}) for q in ("Gondolin", "gondolin", "Doriath")]
+        rolls = [await runner.run("roll", {}) for _ in range(3)]
+        return first, rolls
+
+    try:
+        searches, rolls = asyncio.run(main())
+    finally:
+        runner.shutdown()
+    assert searches == ["lore about Gondolin", "lore about Gondolin", "lore about Doriath"]
+    assert calls == {"search": 2, "roll": 3}
+    assert rolls == ["roll 1", "roll 2", "roll 3"]
+    assert runner.cache_policies["roll"] is None
+    per_tool = {s["tool"]: s for s in runner.cache.tool_stats()}
+    assert set(per_tool) == {"search"}
+    assert per_tool["search"]["hits"] == 1
+
+
+def test_runner_does_not_cache_failures():
+    attempts = []
+
+    def flaky(arguments):
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise RuntimeError("lore archive offline")
+        return "lore"
+
+    runner = ToolRunner({"search": {"tool": tool("search"), "handler": flaky, "cache_ttl": 60}})
+
+    async def main():
+        try:
+            await runner.run("search", {"query": "x"})
+        except RuntimeError:
+            pass
+        return [await runner.run("search", {"query": "x"}) for _ in range(2)]
+
+    try:
+        assert asyncio.run(main()) == ["lore", "lore"]
+    finally:
+        runner.shutdown()
+    assert len(attempts) == 2
+
+
+def test_defaults_are_filled_before_the_key():
+    tools, calls = counting_tools()
+    tools["search"].pop("cache_key")
+    runner = ToolRunner(tools)
+
+    async def main():
+        await runner.run("search", {"query": "x"})
+        await runner.run("search", {"query": "x", "count": 1})
+
+    try:
+        asyncio.run(main())
+    finally:
+        runner.shutdown()
+    assert calls["search"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ToolResultCache(max_entries=2)
+    cache.store("search", "a", 1, ttl=60)
+    cache.store("search", "b", 2, ttl=60)
+    assert cache.lookup("search", "a") == (True, 1)
+    cache.store("search", "c", 3, ttl=60)
+    assert cache.lookup("search", "b") == (False, None)
+    assert cache.lookup("search", "a") == (True, 1)
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 2 and stats["misses"] == 1
+
+
+def test_entries_expire(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(tool_cache.time, "monotonic", lambda: now[0])
+    cache = ToolResultCache()
+    cache.store("search", "a", 1, ttl=10)
+    now[0] += 11
+    assert cache.lookup("search", "a") == (False, None)
+    assert cache.tool_stats()[0]["expired"] == 1
+    assert len(cache) == 0
+
+
+def test_clear_one_tool():
+    cache = ToolResultCache()
+    cache.store("search", "a", 1, ttl=60)
+    cache.store("lookup", "a", 2, ttl=60)
+    cache.clear("search")
+    assert cache.lookup("search", "a")[0] is False
+    assert cache.lookup("lookup", "a") == (True, 2)
+
+
+def test_policies():
+    assert entry_policy({"handler": print}) is None
+    assert entry_policy({"cache_ttl": 0}) is None
+    policy = entry_policy({"cache_ttl": 30})
+    assert policy.ttl == 30.0
+    assert policy.cache_key({"b": 1, "a": 2}) == canonical_arguments({"a": 2, "b": 1})
+
+    listed = advertised(tool("search"), policy)
+    assert listed.meta == {"cache": {"ttl": 30.0}}
+    assert tool_policy(listed).ttl == 30.0
+    assert tool_policy(tool("search")) is None
+    assert advertised(tool("roll"), None).meta is None
+
+
+def test_cache_is_thread_safe_under_concurrent_use():
+    cache = ToolResultCache(max_entries=8)
+
+    def work(offset):
+        for i in range(200):
+            cache.store("t", (offset + i) % 16, i, ttl=60)
+            cache.lookup("t", i % 16)
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(work, range(4)))
+    assert len(cache) == 8
+    assert cache.stats()["hits"] + cache.stats()["misses"] == 800
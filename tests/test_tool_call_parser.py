@@ -0,0 +1,88 @@
+import pytest
+
+from tool_call_parser import ToolCallStreamParser, parse_call_at, parse_tool_call, parse_tool_calls
+
+
+@pytest.mark.parametrize("text, name, arguments", [
+    ("TOOL_CALL: get_elf_name()", "get_elf_name", {}),
+    ("tool_call: get_elf_name()", "get_elf_name", {}),
+    ("TOOL_CALL: get_elf_name(count=2)", "get_elf_name", {"count": 2}),
+    ("TOOL_CALL: f(a=1, b=2.5, c=true, d=null, e=-3)", "f", {"a": 1, "b": 2.5, "c": True, "d": None, "e": -3}),
+    ("TOOL_CALL: f(style=detailed)", "f", {"style": "detailed"}),
+    ("TOOL_CALL: f(place=Misty Mountains)", "f", {"place": "Misty Mountains"}),
+    ("TOOL_CALL: f(a=1,)", "f", {"a": 1}),
+    ("TOOL_CALL:f( a = 1 )", "f", {"a": 1}),
+    ("TOOL_CALL: f(a: 1)", "f", {"a": 1}),
+    ("TOOL_CALL: f(name=é)", "f", {"name": "é"}),
+    ("TOOL_CALL: lore.search(q=x)", "lore.search", {"q": "x"}),
+    ("TOOL_CALL: f(text='one, two (three)')", "f", {"text": "one, two (three)"}),
+    ('TOOL_CALL: f(text="say \\"hi\\"")', "f", {"text": 'say "hi"'}),
+    ("TOOL_CALL: f(text='it\\'s\\nlate')", "f", {"text": "it's\nlate"}),
+    ('TOOL_CALL: f(tags=["a", "b"], opts={"x": 1})', "f", {"tags": ["a", "b"], "opts": {"x": 1}}),
+    ('TOOL_CALL: f({"mood": "dark", "n": [1, 2]})', "f", {"mood": "dark", "n": [1, 2]}),
+    ("Sure! Let me check.\nTOOL_CALL: f(a=1)\nThen I'll write.", "f", {"a": 1}),
+])
+def test_parses_one_call(text, name, arguments):
+    call = parse_tool_call(text)
+    assert (call.name, call.arguments) == (name, arguments)
+    assert parse_tool_calls(text) == [call]
+    assert text[call.start:call.end].lower().startswith("tool_call:")
+    assert text[call.start:call.end].endswith(")")
+
+
+@pytest.mark.parametrize("text", [
+    "No tools needed, here is the story.",
+    "TOOL_CALL: get_elf_name(count=1",
+    "TOOL_CALL: f(text='unterminated)",
+    "TOOL_CALL: (a=1)",
+    "TOOL_CALL:",
+])
+def test_incomplete_or_malformed_calls_are_ignored(text):
+    assert parse_tool_call(text) is None
+    assert parse_tool_calls(text) == []
+
+
+def test_several_calls_in_order():
+    text = "TOOL_CALL: f(a=1)\nTOOL_CALL: (oops)\nTOOL_CALL: g(b='x, y')"
+    calls = parse_tool_calls(text)
+    assert [(c.name, c.arguments) for c in calls] == [("f", {"a": 1}), ("g", {"b": "x, y"})]
+    assert parse_tool_calls(text, limit=1) == calls[:1]
+
+
+def test_parse_call_at_needs_no_marker():
+    text = "Call get_elf_name(count=1) first."
+    call = parse_call_at(text, text.index("get_elf_name"))
+    assert (call.name, call.arguments) == ("get_elf_name", {"count": 1})
+    assert parse_call_at(text, 0) is None
+
+
+CORPUS = ("Thinking...\nTOOL_CALL: get_elf_name(count=2, style='formal, old')\n"
+          'More text tool_call: get_event({"mood": "dark", "tags": ["a", ")"]})\n'
+          "TOOL_CALL: get_location_description(location=Rivendell)")
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 16, len(CORPUS)])
+def test_streaming_matches_one_shot(size):
+    parser = ToolCallStreamParser()
+    calls = []
+    for i in range(0, len(CORPUS), size):
+        calls.extend(parser.feed(CORPUS[i:i + size]))
+    assert parser.close() == []
+    assert calls == parse_tool_calls(CORPUS)
+    assert [c.name for c in calls] == ["get_elf_name", "get_event", "get_location_description"]
+
+
+def test_stream_returns_a_call_when_its_parenthesis_arrives():
+    parser = ToolCallStreamParser()
+    assert parser.feed("TOOL_CALL: get_elf_name(count") == []
+    assert parser.feed("=1") == []
+    [call] = parser.feed(")")
+    assert (call.name, call.arguments) == ("get_elf_name", {"count": 1})
+
+
+def test_every_prefix_parses_like_the_stream():
+    # Whatever arrives, a call is reported only once it is complete
+    for end in range(len(CORPUS) + 1):
+        prefix = CORPUS[:end]
+        parser = ToolCallStreamParser()
+        assert parser.feed(prefix) == parse_tool_calls(prefix)
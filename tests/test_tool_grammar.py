@@ -0,0 +1,157 @@
+import re
+from functools import lru_cache
+
+import pytest
+from mcp.types import Tool
+
+from tool_grammar import build_answer_grammar, build_tool_grammar
+
+TOOLS = [
+    Tool(name="get_elf_name", description="Elf names", inputSchema={
+        "type": "object", "properties": {"count": {"type": "integer"}, "formal": {"type": "boolean"}}}),
+    {"name": "get_location_description", "inputSchema": {
+        "type": "object", "required": ["style"],
+        "properties": {"style": {"type": "string", "enum": ["brief", "detailed"]}, "lang": {"type": "string"}}}},
+]
+
+_TOKEN_RE = re.compile(r'\s*(?:("(?:[^"\\]|\\.)*")|(\[(?:[^\]\\]|\\.)*\])|([\w-]+)|(.))')
+_ESCAPES = {"n": "\n", "t": "\t", "\\": "\\", '"': '"', "]": "]", "[": "[", "^": "^", "-": "-"}
+
+
+def _unescape(text):
+    return re.sub(r"\\(.)", lambda m: _ESCAPES[m.group(1)], text)
+
+
+def _char_class(text):
+    body, negated = text[1:-1], text[1:2] == "^"
+    if negated:
+        body = body[1:]
+    chars = re.findall(r"\\.|.", body)
+    singles, ranges, i = set(), [], 0
+    while i < len(chars):
+        c = _unescape(chars[i])
+        if i + 2 < len(chars) and chars[i + 1] == "-":
+            ranges.append((c, _unescape(chars[i + 2])))
+            i += 3
+        else:
+            singles.add(c)
+            i += 1
+    return lambda ch: (ch in singles or any(a <= ch <= b for a, b in ranges)) != negated
+
+
+class Grammar:
+    """A small GBNF matcher: enough of llama.cpp's syntax for the grammars built here."""
+
+    def __init__(self, text):
+        self.rules = {}
+        for line in text.strip().splitlines():
+            name, expr = line.split("::=", 1)
+            tokens = [t for t in _TOKEN_RE.findall(expr) if any(t)]
+            self.rules[name.strip()], rest = self._alternatives(tokens)
+            assert not rest, line
+        self.rule_ends = lru_cache(maxsize=None)(self._rule_ends)
+
+    def _alternatives(self, tokens):
+        options = []
+        while True:
+            sequence, tokens = self._sequence(tokens)
+            options.append(sequence)
+            if not tokens or tokens[0][3] != "|":
+                return ("alt", options), tokens
+            tokens = tokens[1:]
+
+    def _sequence(self, tokens):
+        items = []
+        while tokens and tokens[0][3] not in ("|", ")"):
+            literal, char_class, name, punct = tokens[0]
+            tokens = tokens[1:]
+            if literal:
+                item = ("lit", _unescape(literal[1:-1]))
+            elif char_class:
+                item = ("class", _char_class(char_class))
+            elif name:
+                item = ("rule", name)
+            else:
+                assert punct == "(", punct
+                item, tokens = self._alternatives(tokens)
+                tokens = tokens[1:]
+            if tokens and tokens[0][3] in ("?", "*", "+"):
+                item, tokens = (tokens[0][3], item), tokens[1:]
+            items.append(item)
+        return ("seq", items), tokens
+
+    def _rule_ends(self, name, start):
+        return frozenset(self._ends(self.rules[name], start))
+
+    def _ends(self, node, start):
+        kind = node[0]
+        if kind == "lit":
+            return {start + len(node[1])} if self.text.startswith(node[1], start) else set()
+        if kind == "class":
+            return {start + 1} if start < len(self.text) and node[1](self.text[start]) else set()
+        if kind == "rule":
+            return self.rule_ends(node[1], start)
+        if kind == "alt":
+            return set().union(*(self._ends(option, start) for option in node[1]))
+        if kind == "seq":
+            positions = {start}
+            for item in node[1]:
+                positions = set().union(*(self._ends(item, p) for p in positions))
+            return positions
+        item = node[1]
+        if kind == "?":
+            return {start} | self._ends(item, start)
+        ends = {start} if kind == "*" else set()
+        frontier = self._ends(item, start)
+        while frontier - ends:
+            new = frontier - ends
+            ends |= new
+            frontier = set().union(*(self._ends(item, p) for p in new))
+        return ends
+
+    def matches(self, text):
+        self.text = text
+        self.rule_ends.cache_clear()
+        return len(text) in self.rule_ends("root", 0)
+
+
+@pytest.fixture(scope="module")
+def grammar():
+    return Grammar(build_tool_grammar(TOOLS))
+
+
+@pytest.mark.parametrize("text", [
+    "Once upon a time.",
+    "Let me look that up.\nTOOL_CALL: get_elf_name()",
+    "TOOL_CALL: get_elf_name(count=2, formal=true)\n",
+    "TOOL_CALL: get_elf_name(formal=false)",
+    "TOOL_CALL: get_location_description(style='detailed')",
+    "TOOL_CALL: get_location_description(style='brief', lang=\"Sindarin\")",
+])
+def test_valid_calls_and_answers_match(grammar, text):
+    assert grammar.matches(text)
+
+
+@pytest.mark.parametrize("text", [
+    "TOOL_CALL: get_dragon()",
+    "TOOL_CALL: GetElfName()",
+    "TOOL_CALL: get_elf_name(count='two')",
+    "TOOL_CALL: get_elf_name(colour=1)",
+    "TOOL_CALL: get_location_description()",
+    "TOOL_CALL: get_location_description(style='epic')",
+    "TOOL_CALL: get_elf_name()\nAnd then the story.",
+    "TOOL_RESULT: Luthien",
+    "The elf said tool_call: hello",
+])
+def test_unregistered_tools_and_invented_lines_are_rejected(grammar, text):
+    assert not grammar.matches(text)
+
+
+def test_the_answer_grammar_allows_no_call():
+    answer = Grammar(build_answer_grammar())
+    assert answer.matches("Once upon a time,\nthere was an elf.")
+    assert not answer.matches("TOOL_CALL: get_elf_name()")
+
+
+def test_without_tools_only_answers_are_allowed():
+    assert build_tool_grammar([]) == build_answer_grammar()
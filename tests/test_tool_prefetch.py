@@ -0,0 +1,74 @@
+import concurrent.futures
+
+from mcp.types import Tool, ToolAnnotations
+
+from tool_prefetch import ToolPrefetcher, is_read_only
+
+ELF_NAME = Tool(name="get_elf_name", description="Elf names", annotations=ToolAnnotations(readOnlyHint=True),
+                inputSchema={"type": "object", "properties": {"count": {"type": "integer", "default": 1}}})
+EVENT = Tool(name="get_random_event", description="Events", annotations=ToolAnnotations(readOnlyHint=True),
+             inputSchema={"type": "object"})
+SAVE = Tool(name="save_story", description="Writes a file", inputSchema={"type": "object"})
+
+PROMPT = [{"role": "system", "content": "You tell stories."},
+          {"role": "user", "content": "STEP 1: Call get_elf_name(count=1)\nSTEP 2: Call get_random_event()\n"
+                                      "STEP 3: Call save_story(title='x')"}]
+
+
+def done(value):
+    future = concurrent.futures.Future()
+    future.set_result(value)
+    return future
+
+
+def test_only_read_only_tools_are_prefetched():
+    assert is_read_only(ELF_NAME) and not is_read_only(SAVE)
+    prefetcher = ToolPrefetcher([ELF_NAME, EVENT, SAVE])
+    assert prefetcher.predict(PROMPT) == [("get_elf_name", {"count": 1}), ("get_random_event", {})]
+    assert not ToolPrefetcher([SAVE]).enabled
+    assert ToolPrefetcher([SAVE], allow=["save_story"]).predict(PROMPT) == [("save_story", {"title": "x"})]
+
+
+def test_a_call_matches_once_schema_defaults_are_filled_in():
+    prefetcher = ToolPrefetcher([ELF_NAME, EVENT])
+    started = []
+    speculation = prefetcher.start(PROMPT, lambda name, arguments: started.append(name) or done(name.upper()))
+    assert started == ["get_elf_name", "get_random_event"]
+    # The model leaves out the default count=1
+    assert speculation.pop("get_elf_name", {}).result() == "GET_ELF_NAME"
+    assert speculation.pop("get_elf_name", {}) is None
+    assert speculation.pop("get_random_event", {"mood": "dark"}) is None
+    speculation.close()
+    assert prefetcher.stats() == {"started": 2, "hits": 1, "wasted": 1, "hit_rate": 0.5}
+
+
+def test_calls_made_earlier_are_not_prefetched_again():
+    prefetcher = ToolPrefetcher([ELF_NAME, EVENT])
+    messages = PROMPT + [{"role": "assistant", "content": "TOOL_CALL: get_elf_name()"},
+                         {"role": "user", "content": "TOOL_RESULT: Luthien\n\nNow call get_random_event()."}]
+    assert prefetcher.predict(messages) == [("get_random_event", {})]
+
+
+def test_native_tool_calls_count_as_made():
+    prefetcher = ToolPrefetcher([ELF_NAME])
+    messages = PROMPT + [{"role": "assistant", "content": None, "tool_calls": [
+        {"function": {"name": "get_elf_name", "arguments": '{"count": 1}'}}]}]
+    assert prefetcher.predict(messages) == []
+
+
+def test_unused_prefetches_are_cancelled():
+    prefetcher = ToolPrefetcher([ELF_NAME, EVENT], max_calls=1)
+    pending = concurrent.futures.Future()
+    speculation = prefetcher.start(PROMPT, lambda name, arguments: pending)
+    assert len(speculation) == 1
+    speculation.close()
+    assert pending.cancelled()
+    assert prefetcher.stats()["wasted"] == 1
+
+
+def test_set_tools_keeps_the_counters():
+    prefetcher = ToolPrefetcher([ELF_NAME])
+    prefetcher.start(PROMPT, lambda name, arguments: done(None)).close()
+    prefetcher.set_tools([EVENT])
+    assert prefetcher.predict(PROMPT) == [("get_random_event", {})]
+    assert prefetcher.stats()["started"] == 1
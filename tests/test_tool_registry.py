@@ -0,0 +1,83 @@
+import pytest
+from mcp.types import Tool
+
+from tool_registry import ToolCatalog, ToolRegistry, UnknownToolError, openai_function, tool_signature
+from tool_validation import ToolArgumentError
+
+ELF_NAME = Tool(name="get_elf_name", description="Generate  elf names", inputSchema={
+    "type": "object", "properties": {"count": {"type": "integer", "default": 1}}})
+LOCATION = {"type": "function", "function": {"name": "get_location_description", "parameters": {
+    "type": "object", "properties": {"style": {"type": "string", "enum": ["brief", "detailed"]}},
+    "required": ["style"]}}}
+
+
+@pytest.fixture
+def registry():
+    return ToolRegistry([ELF_NAME, LOCATION])
+
+
+def test_signatures_list_arguments_and_descriptions():
+    assert tool_signature(ELF_NAME) == "get_elf_name(count?: integer) - Generate elf names"
+    assert tool_signature(LOCATION) == "get_location_description(style: 'brief' | 'detailed')"
+
+
+@pytest.mark.parametrize("name, resolved", [
+    ("get_elf_name", "get_elf_name"),
+    ("GetElfName", "get_elf_name"),
+    ("get-elf-name", "get_elf_name"),
+    ("GET_LOCATION_DESCRIPTION", "get_location_description"),
+])
+def test_resolve_ignores_case_and_separators(registry, name, resolved):
+    assert registry.resolve(name) == resolved
+
+
+def test_resolve_suggests_the_closest_tool(registry):
+    with pytest.raises(UnknownToolError) as excinfo:
+        registry.resolve("get_elf_names")
+    assert excinfo.value.suggestion == "get_elf_name"
+    assert str(excinfo.value) == ("Unknown tool 'get_elf_names'. Did you mean 'get_elf_name'? "
+                                  "Valid tools: get_elf_name, get_location_description")
+
+
+def test_resolve_has_no_suggestion_for_unrelated_names(registry):
+    with pytest.raises(UnknownToolError) as excinfo:
+        registry.resolve("summon_dragon")
+    assert excinfo.value.suggestion is None
+
+
+def test_an_empty_registry_rejects_every_name():
+    registry = ToolRegistry([])
+    with pytest.raises(UnknownToolError, match="No tools are registered"):
+        registry.resolve("get_elf_name")
+    assert registry.call_grammar is None
+
+
+def test_validate_coerces_with_the_tool_schema(registry):
+    assert registry.validate("get_elf_name", {"count": "2"}) == {"count": 2}
+    with pytest.raises(ToolArgumentError, match="style: required argument is missing"):
+        registry.validate("get_location_description", {})
+
+
+def test_system_prompt_is_rendered_and_counted_once(registry):
+    rendered = []
+
+    def template(signatures):
+        rendered.append(signatures)
+        return "Tools:\n" + "\n".join(signatures)
+
+    prompt = registry.render_system_prompt(template)
+    assert registry.render_system_prompt(template) is prompt
+    assert len(rendered) == 1
+    count = registry.prompt_token_counter()
+    assert count(prompt) == registry.system_prompt_tokens > 0
+
+
+def test_catalog_swaps_definitions_and_bytes_together():
+    catalog = ToolCatalog([ELF_NAME])
+    functions, raw = catalog.snapshot()
+    assert functions == [openai_function(ELF_NAME)]
+    catalog.update([ELF_NAME, LOCATION])
+    functions, raw = catalog.snapshot()
+    assert [f["function"]["name"] for f in functions] == ["get_elf_name", "get_location_description"]
+    assert b"get_location_description" in raw
+    assert catalog.stats()["version"] == 2
@@ -0,0 +1,114 @@
+import pytest
+from mcp.types import Tool
+
+from tool_validation import ToolArgumentError, compile_validator
+
+ELF_NAME = Tool(name="get_elf_name", description="Random elf names", inputSchema={
+    "type": "object",
+    "properties": {
+        "count": {"type": "integer", "minimum": 1, "maximum": 5, "default": 1},
+        "formal": {"type": "boolean"},
+        "house": {"type": "string", "enum": ["Noldor", "Sindar", "Teleri"]},
+        "tags": {"type": "array", "items": {"type": "string"}, "maxItems": 3},
+        "weight": {"type": "number"},
+        "origin": {"type": "object", "properties": {"realm": {"type": "string"}}, "required": ["realm"]},
+    },
+})
+
+LOCATION = {"name": "get_location_description", "inputSchema": {
+    "type": "object",
+    "properties": {"location": {"type": "string", "minLength": 3, "pattern": "^[A-Z]"}},
+    "required": ["location"],
+}}
+
+
+@pytest.fixture
+def validate():
+    return compile_validator(ELF_NAME)
+
+
+@pytest.mark.parametrize("arguments, expected", [
+    ({"count": "2"}, {"count": 2}),
+    ({"count": 3.0}, {"count": 3}),
+    ({"count": " 4 "}, {"count": 4}),
+    ({"formal": "True"}, {"formal": True, "count": 1}),
+    ({"formal": "no"}, {"formal": False, "count": 1}),
+    ({"formal": 1}, {"formal": True, "count": 1}),
+    ({"house": "noldor"}, {"house": "Noldor", "count": 1}),
+    ({"tags": '["brave", "tall"]'}, {"tags": ["brave", "tall"], "count": 1}),
+    ({"tags": [1, "x"]}, {"tags": ["1", "x"], "count": 1}),
+    ({"weight": "2.5"}, {"weight": 2.5, "count": 1}),
+    ({"origin": '{"realm": "Valinor"}'}, {"origin": {"realm": "Valinor"}, "count": 1}),
+    ({"house": None}, {"count": 1}),
+    (None, {"count": 1}),
+])
+def test_coercions(validate, arguments, expected):
+    assert validate(arguments) == expected
+
+
+@pytest.mark.parametrize("arguments, error", [
+    ({"count": "two"}, "count: expected integer, got \"two\""),
+    ({"count": 2.5}, "count: expected integer"),
+    ({"count": True}, "count: expected integer"),
+    ({"count": 9}, "count: must be at most 5, got 9"),
+    ({"formal": "maybe"}, "formal: expected boolean"),
+    ({"house": "Vanyar"}, "house: expected one of \"Noldor\" | \"Sindar\" | \"Teleri\""),
+    ({"tags": ["a", "b", "c", "d"]}, "tags: must have at most 3 items, got 4"),
+    ({"tags": [{"x": 1}]}, "tags: item 0: expected string"),
+    ({"weight": "inf"}, "weight: expected number"),
+    ({"origin": {}}, "origin: realm: required argument is missing"),
+    ({"cuont": 2}, "cuont: unknown argument (did you mean 'count'?)"),
+])
+def test_rejections(validate, arguments, error):
+    with pytest.raises(ToolArgumentError) as excinfo:
+        validate(arguments)
+    assert error in str(excinfo.value)
+    assert "Arguments: count?: integer" in str(excinfo.value)
+
+
+def test_every_problem_is_reported(validate):
+    with pytest.raises(ToolArgumentError) as excinfo:
+        validate({"count": "x", "formal": "y", "colour": "red"})
+    assert [p["argument"] for p in excinfo.value.problems] == ["count", "formal", "colour"]
+    data = excinfo.value.to_dict()
+    assert data["error"] == "invalid_arguments"
+    assert data["tool"] == "get_elf_name"
+    assert data["problems"][2] == {"argument": "colour", "error": "unknown argument"}
+
+
+def test_arguments_must_be_an_object(validate):
+    with pytest.raises(ToolArgumentError, match="arguments must be a JSON object"):
+        validate([1, 2])
+
+
+def test_required_and_string_checks():
+    validate = compile_validator(LOCATION)
+    assert validate({"location": "Rivendell"}) == {"location": "Rivendell"}
+    with pytest.raises(ToolArgumentError, match="location: required argument is missing"):
+        validate({})
+    with pytest.raises(ToolArgumentError, match="location: expected string, got null"):
+        validate({"location": None})
+    with pytest.raises(ToolArgumentError, match="must have at least 3 characters"):
+        validate({"location": "Ri"})
+    with pytest.raises(ToolArgumentError, match="must match"):
+        validate({"location": "rivendell"})
+
+
+def test_schemas_without_properties_accept_anything():
+    validate = compile_validator({"name": "anything", "inputSchema": {"type": "object"}})
+    assert validate({"free": "form", "n": 1}) == {"free": "form", "n": 1}
+
+
+def test_additional_properties_are_kept_when_allowed():
+    validate = compile_validator({"name": "open", "inputSchema": {
+        "type": "object", "properties": {"n": {"type": "integer"}}, "additionalProperties": True}})
+    assert validate({"n": "1", "extra": "x"}) == {"n": 1, "extra": "x"}
+
+
+def test_union_types_prefer_the_type_the_value_has():
+    validate = compile_validator({"name": "union", "inputSchema": {
+        "type": "object", "properties": {"v": {"type": ["integer", "string"]}}}})
+    assert validate({"v": "abc"}) == {"v": "abc"}
+    assert validate({"v": "12"}) == {"v": "12"}
+    assert validate({"v": 12}) == {"v": 12}
+    assert validate({"v": 12.0}) == {"v": 12}
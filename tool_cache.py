@@ -0,0 +1,148 @@
+"""Result cache for idempotent tools.
+
+A lore lookup or a location catalog returns the same result for the same
+arguments, yet without a cache it runs again on every call. A tool opts in
+in its `create_mcp_server` mapping entry:
+
+    tools = {
+        "search_silmarillion": {
+            "tool": Tool(...),
+            "handler": search,
+            "cache_ttl": 600.0,                           # seconds a result stays fresh
+            "cache_key": lambda args: args["query"].lower(),  # optional; default: the arguments
+        },
+        "get_random_event": {"tool": ..., "handler": pick_event},  # no cache_ttl: always runs
+    }
+
+The server advertises the TTL in the tool's `_meta` (`{"cache": {"ttl": 600}}`),
+so MCP clients such as `MCPClientExecutor` can cache the same tools on
+their side of the wire. A key function cannot cross the wire; clients key
+on the arguments.
+
+`ToolResultCache` is a bounded LRU of `(tool, key) -> result` with a TTL
+per entry. Only successful results are stored. It is thread-safe, so one
+instance serves both event-loop and worker-thread callers. `stats()` and
+`tool_stats()` report hits, misses and the hit rate overall and per tool.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+from mcp.types import Tool
+
+# Most results kept across all tools
+DEFAULT_MAX_ENTRIES = 1024
+# Key of the cache policy in a tool's `_meta`
+CACHE_META_KEY = "cache"
+
+
+def canonical_arguments(arguments: dict) -> str:
+    """Arguments as a stable key: the same dict in any key order gives the same string."""
+    return json.dumps(arguments, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    ttl: float
+    key: Optional[Callable[[dict], Hashable]] = None
+
+    def cache_key(self, arguments: dict) -> Hashable:
+        return self.key(arguments) if self.key is not None else canonical_arguments(arguments)
+
+
+def entry_policy(entry: dict) -> Optional[CachePolicy]:
+    """Policy of a `create_mcp_server` mapping entry, or None if it is not cacheable."""
+    ttl = entry.get("cache_ttl")
+    if not ttl:
+        return None
+    return CachePolicy(float(ttl), entry.get("cache_key"))
+
+
+def tool_policy(tool: Tool) -> Optional[CachePolicy]:
+    """Policy a server advertised in the tool's `_meta`, or None."""
+    options = (tool.meta or {}).get(CACHE_META_KEY)
+    if not isinstance(options, dict) or not options.get("ttl"):
+        return None
+    return CachePolicy(float(options["ttl"]))
+
+
+def advertised(tool: Tool, policy: Optional[CachePolicy]) -> Tool:
+    """`tool` with `policy`'s TTL in its `_meta`, for `tools/list`."""
+    if policy is None:
+        return tool
+    meta = dict(tool.meta or {}, **{CACHE_META_KEY: {"ttl": policy.ttl}})
+    return tool.model_copy(update={"meta": meta})
+
+
+class ToolResultCache:
+    """Bounded LRU of tool results with per-entry expiry."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple[str, Hashable], tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._tools: dict[str, dict[str, int]] = {}
+        self.evictions = 0
+
+    def _counters(self, name: str) -> dict[str, int]:
+        if name not in self._tools:
+            self._tools[name] = {"hits": 0, "misses": 0, "expired": 0}
+        return self._tools[name]
+
+    def lookup(self, name: str, key: Hashable) -> tuple[bool, Any]:
+        """(True, result) for a fresh entry, else (False, None)."""
+        with self._lock:
+            counters = self._counters(name)
+            found = self._entries.get((name, key))
+            if found is not None:
+                expires, value = found
+                if expires > time.monotonic():
+                    self._entries.move_to_end((name, key))
+                    counters["hits"] += 1
+                    return True, value
+                del self._entries[(name, key)]
+                counters["expired"] += 1
+            counters["misses"] += 1
+            return False, None
+
+    def store(self, name: str, key: Hashable, value: Any, ttl: float) -> None:
+        with self._lock:
+            self._entries[(name, key)] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end((name, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self, name: Optional[str] = None) -> None:
+        """Drop every entry, or only those of tool `name`."""
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                for cache_key in [k for k in self._entries if k[0] == name]:
+                    del self._entries[cache_key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            hits = sum(c["hits"] for c in self._tools.values())
+            misses = sum(c["misses"] for c in self._tools.values())
+            return {"entries": len(self._entries), "max_entries": self.max_entries, "hits": hits,
+                    "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                    "evictions": self.evictions}
+
+    def tool_stats(self) -> list[dict[str, Any]]:
+        """Per-tool counters and hit rate (one dict per cached tool, labelled "tool")."""
+        with self._lock:
+            entries: dict[str, int] = {}
+            for name, _ in self._entries:
+                entries[name] = entries.get(name, 0) + 1
+            return [dict(counters, tool=name, entries=entries.get(name, 0),
+                         hit_rate=counters["hits"] / (counters["hits"] + counters["misses"])
+                         if counters["hits"] + counters["misses"] else 0.0)
+                    for name, counters in sorted(self._tools.items())]
@@ -0,0 +1,362 @@
+"""Parser for the simulated `TOOL_CALL:` protocol.
+
+The Flask bridge asks the model to emit calls as::
+
+    TOOL_CALL: function_name(arg1=value1, arg2='value, with comma')
+
+The previous parser matched `\\((.*?)\\)` and split the arguments on commas,
+so any value containing a comma or a parenthesis was mis-parsed and the model
+had to be asked again. This module tokenizes the text in a single pass
+instead. It understands:
+
+- quoted strings (single or double quotes, backslash escapes);
+- numbers, `true`/`false`/`True`/`False` and `null`/`None`;
+- bare words (`style=detailed`) as strings, as before;
+- JSON (or Python-literal) objects and arrays as values, and a single object
+  as the whole argument list: `get_event({"mood": "dark"})`;
+- several calls in one response.
+
+`ToolCallStreamParser` accepts the response in chunks (e.g. from a streamed
+completion) and returns each call as soon as its closing parenthesis arrives.
+"""
+import re
+from typing import Any, NamedTuple, Optional
+
+MARKER = "TOOL_CALL:"
+
+_MARKER_RE = re.compile(re.escape(MARKER), re.IGNORECASE)
+_MARKER_LOWER = MARKER.lower()
+# The name between the marker and `(`
+_CALL_NAME_RE = re.compile(r"\s*([A-Za-z_][\w.\-]*)\s*")
+# `key=` plus, when the value is a bare token (`count=1`), the token itself
+_ARG_RE = re.compile(r"([A-Za-z_][\w\-]*)\s*[=:]\s*([^\s'\"{\[,)\]}][^,)\]}\n]*)?")
+_KEY_RE = re.compile(r"[A-Za-z_][\w\-]*")
+# What a head or key can look like when the text is cut short
+_PARTIAL_HEAD_RE = re.compile(r"\s*(?:[A-Za-z_][\w.\-]*\s*)?")
+_PARTIAL_KEY_RE = re.compile(r"[A-Za-z_][\w\-]*\s*")
+_NUMBER_START = frozenset("+-.0123456789")
+_WHITESPACE = " \t\r\n"
+# A bare value ends at one of ",)]}" or a newline (outside quotes and brackets)
+_BARE_RE = re.compile(r"[^,)\]}\n]*")
+_ESCAPES = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "0": "\0"}
+_KEYWORDS = {"true": True, "false": False, "null": None, "none": None}
+
+
+class ToolCall(NamedTuple):
+    """One parsed call; `start`/`end` delimit it in the parsed text."""
+    name: str
+    arguments: dict
+    start: int = 0
+    end: int = 0
+
+
+# Builds a ToolCall without NamedTuple's keyword handling
+_new_call = tuple.__new__
+
+
+class _Incomplete(Exception):
+    """The text ended in the middle of a call."""
+
+
+class _Malformed(Exception):
+    """The text after the marker is not a valid call."""
+
+
+def _skip_ws(text: str, i: int) -> int:
+    n = len(text)
+    while i < n and text[i] in _WHITESPACE:
+        i += 1
+    return i
+
+
+def _find_marker(text: str, lowered: str, pos: int) -> int:
+    """Index of the next marker at or after `pos`, or -1."""
+    if lowered is not None:
+        # str.find is far faster than a case-insensitive regex scan
+        return lowered.find(_MARKER_LOWER, pos)
+    match = _MARKER_RE.search(text, pos)
+    return match.start() if match else -1
+
+
+def _lowered(text: str):
+    """Lower-cased text, or None when lowering would shift character offsets."""
+    lowered = text.lower()
+    return lowered if len(lowered) == len(text) else None
+
+
+def _peek(text: str, i: int) -> str:
+    if i >= len(text):
+        raise _Incomplete
+    return text[i]
+
+
+def _parse_string(text: str, i: int) -> tuple[str, int]:
+    quote = text[i]
+    i += 1
+    chunks = []
+    start = i
+    n = len(text)
+    while True:
+        j = text.find(quote, i)
+        k = text.find("\\", i, j if j >= 0 else n)
+        if k >= 0:
+            chunks.append(text[start:k])
+            if k + 1 >= n:
+                raise _Incomplete
+            escaped = text[k + 1]
+            if escaped == "u":
+                if k + 6 > n:
+                    raise _Incomplete
+                try:
+                    chunks.append(chr(int(text[k + 2:k + 6], 16)))
+                    i = start = k + 6
+                    continue
+                except ValueError:
+                    pass
+            chunks.append(_ESCAPES.get(escaped, escaped))
+            i = start = k + 2
+            continue
+        if j < 0:
+            raise _Incomplete
+        chunks.append(text[start:j])
+        return "".join(chunks), j + 1
+
+
+def _parse_bare(text: str, i: int) -> tuple[Any, int]:
+    j = _BARE_RE.match(text, i).end()
+    if j >= len(text):
+        raise _Incomplete
+    token = text[i:j].strip()
+    if not token:
+        raise _Malformed
+    return _bare_value(token), j
+
+
+def _bare_value(token: str) -> Any:
+    """Convert an unquoted token: number, boolean, null, else string."""
+    if token[0] in _NUMBER_START:
+        try:
+            return int(token)
+        except ValueError:
+            try:
+                return float(token)
+            except ValueError:
+                pass
+    lowered = token.lower()
+    if lowered in _KEYWORDS:
+        return _KEYWORDS[lowered]
+    return token.strip("'\"")
+
+
+def _parse_object(text: str, i: int) -> tuple[dict, int]:
+    result: dict = {}
+    i = _skip_ws(text, i + 1)
+    if _peek(text, i) == "}":
+        return result, i + 1
+    while True:
+        c = _peek(text, i)
+        if c in "'\"":
+            key, i = _parse_string(text, i)
+        else:
+            match = _KEY_RE.match(text, i)
+            if not match:
+                raise _Malformed
+            key, i = match.group(), match.end()
+        i = _skip_ws(text, i)
+        if _peek(text, i) not in ":=":
+            raise _Malformed
+        value, i = _parse_value(text, _skip_ws(text, i + 1))
+        result[key] = value
+        i = _skip_ws(text, i)
+        c = _peek(text, i)
+        if c == "}":
+            return result, i + 1
+        if c != ",":
+            raise _Malformed
+        i = _skip_ws(text, i + 1)
+
+
+def _parse_array(text: str, i: int) -> tuple[list, int]:
+    result: list = []
+    i = _skip_ws(text, i + 1)
+    if _peek(text, i) == "]":
+        return result, i + 1
+    while True:
+        value, i = _parse_value(text, i)
+        result.append(value)
+        i = _skip_ws(text, i)
+        c = _peek(text, i)
+        if c == "]":
+            return result, i + 1
+        if c != ",":
+            raise _Malformed
+        i = _skip_ws(text, i + 1)
+
+
+def _parse_value(text: str, i: int) -> tuple[Any, int]:
+    c = _peek(text, i)
+    if c in "'\"":
+        return _parse_string(text, i)
+    if c == "{":
+        return _parse_object(text, i)
+    if c == "[":
+        return _parse_array(text, i)
+    return _parse_bare(text, i)
+
+
+def _parse_arguments(text: str, i: int) -> tuple[dict, int]:
+    """Parse from just after `(` to just after the matching `)`."""
+    # The hot loop: whitespace skips and bare values are handled inline
+    arguments: dict = {}
+    n = len(text)
+    while i < n and text[i] in _WHITESPACE:
+        i += 1
+    c = text[i:i + 1]
+    if c == ")":
+        return arguments, i + 1
+    if c == "{":
+        # A single JSON object holding all the arguments
+        arguments, i = _parse_object(text, i)
+        i = _skip_ws(text, i)
+        if _peek(text, i) != ")":
+            raise _Malformed
+        return arguments, i + 1
+    while True:
+        match = _ARG_RE.match(text, i)
+        if match:
+            key, token = match.groups()
+            i = match.end()
+            if token is not None:
+                if i >= n:
+                    raise _Incomplete
+                arguments[key] = _bare_value(token.rstrip())
+            else:
+                arguments[key], i = _parse_value(text, i)
+        elif _PARTIAL_KEY_RE.fullmatch(text, i):
+            raise _Incomplete
+        else:
+            # Positional values have no parameter name; skip them
+            _, i = _parse_value(text, i)
+        while i < n and text[i] in _WHITESPACE:
+            i += 1
+        c = text[i:i + 1]
+        if c == ")":
+            return arguments, i + 1
+        if c != ",":
+            raise _Malformed if c else _Incomplete
+        i += 1
+        while i < n and text[i] in _WHITESPACE:
+            i += 1
+        c = text[i:i + 1]
+        if c == ")":
+            # Trailing comma
+            return arguments, i + 1
+        if not c:
+            raise _Incomplete
+
+
+def _parse_call(text: str, start: int, i: int) -> ToolCall:
+    """Parse one call whose marker spans text[start:i]."""
+    open_paren = text.find("(", i)
+    if open_paren < 0:
+        if _PARTIAL_HEAD_RE.fullmatch(text, i):
+            raise _Incomplete
+        raise _Malformed
+    name = text[i:open_paren].strip()
+    # Plain identifiers skip the regex; dotted or dashed names need it
+    if not (name.isascii() and name.isidentifier()):
+        match = _CALL_NAME_RE.fullmatch(text, i, open_paren)
+        if not match:
+            raise _Malformed
+        name = match.group(1)
+    arguments, end = _parse_arguments(text, open_paren + 1)
+    return _new_call(ToolCall, (name, arguments, start, end))
+
+
+def parse_tool_calls(text: str, limit: Optional[int] = None) -> list[ToolCall]:
+    """Return the complete, well-formed calls in `text` (at most `limit`), in order."""
+    calls = []
+    lowered = _lowered(text)
+    pos = 0
+    while limit is None or len(calls) < limit:
+        start = _find_marker(text, lowered, pos)
+        if start < 0:
+            break
+        try:
+            call = _parse_call(text, start, start + len(MARKER))
+        except (_Incomplete, _Malformed):
+            pos = start + len(MARKER)
+            continue
+        calls.append(call)
+        pos = call.end
+    return calls
+
+
+def parse_tool_call(text: str) -> Optional[ToolCall]:
+    """Return the first call in `text`, or None."""
+    lowered = _lowered(text)
+    pos = 0
+    while True:
+        start = _find_marker(text, lowered, pos)
+        if start < 0:
+            return None
+        try:
+            return _parse_call(text, start, start + len(MARKER))
+        except (_Incomplete, _Malformed):
+            pos = start + len(MARKER)
+
+
+def parse_call_at(text: str, pos: int) -> Optional[ToolCall]:
+    """Parse a call written without the marker, `name(...)` starting at `pos`."""
+    try:
+        return _parse_call(text, pos, pos)
+    except (_Incomplete, _Malformed):
+        return None
+
+
+class ToolCallStreamParser:
+    """Incremental parser: feed response chunks, get calls as they complete.
+
+    Text before an unfinished call is never rescanned; only the unfinished
+    call itself is re-parsed when more text arrives.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        # Start of the text that has not been consumed yet
+        self._pos = 0
+        self._offset = 0
+
+    def feed(self, chunk: str) -> list[ToolCall]:
+        """Add a chunk; return the calls completed by it."""
+        self._buffer += chunk
+        calls = []
+        text = self._buffer
+        while True:
+            marker = _MARKER_RE.search(text, self._pos)
+            if marker is None:
+                # Keep a possible partial marker at the end of the buffer
+                self._pos = max(self._pos, len(text) - len(MARKER) + 1)
+                break
+            try:
+                call = _parse_call(text, marker.start(), marker.end())
+            except _Incomplete:
+                self._pos = marker.start()
+                break
+            except _Malformed:
+                self._pos = marker.end()
+                continue
+            calls.append(call._replace(start=call.start + self._offset, end=call.end + self._offset))
+            self._pos = call.end
+        # Drop consumed text so the buffer only holds the unparsed tail
+        if self._pos:
+            self._offset += self._pos
+            self._buffer = text[self._pos:]
+            self._pos = 0
+        return calls
+
+    def close(self) -> list[ToolCall]:
+        """Finish the stream; an unterminated trailing call is discarded."""
+        self._buffer = ""
+        self._pos = 0
+        return []
@@ -0,0 +1,204 @@
+"""GBNF grammars that constrain llamafile to valid `TOOL_CALL:` lines.
+
+Gemma and DeepSeek regularly emit malformed calls, call tools that do not
+exist or invent their own `TOOL_RESULT:` lines, and every such reply costs
+another loop iteration. llamafile (like llama.cpp's server) accepts a
+`grammar` field on completions; `build_tool_grammar` turns the registered
+tool schemas into one that allows:
+
+- free text, except that no line may contain `TOOL_CALL`, `TOOL_RESULT` or
+  `TOOL_ERROR` (so results can't be invented and calls can't be malformed);
+- optionally, after that text, exactly one `TOOL_CALL: name(key=value, ...)`
+  line for a registered tool, with values typed from its JSON schema. The
+  grammar ends there, so generation stops right after the call.
+
+`build_answer_grammar` is the same without the call, for turns where no more
+tool calls are allowed.
+
+Tools are MCP `Tool` objects, OpenAI function definitions
+(`{"type": "function", "function": {...}}`) or `{"name": ..., "inputSchema":
+...}` dicts.
+"""
+import re
+from typing import Any, Iterable
+
+# Words that may not appear in free text (the protocol's reserved markers)
+RESERVED_WORDS = ("TOOL_CALL", "TOOL_RESULT", "TOOL_ERROR", "tool_call", "tool_result", "tool_error")
+
+_VALUE_RULES = r'''
+sq-string ::= "'" ( [^'\\\n] | "\\" [^\n] )* "'"
+dq-string ::= "\"" ( [^"\\\n] | "\\" [^\n] )* "\""
+integer ::= "-"? [0-9]+
+number ::= "-"? [0-9]+ ( "." [0-9]+ )?
+boolean ::= "true" | "false"
+json-value ::= json-object | json-array | dq-string | number | boolean | "null"
+json-object ::= "{" ( dq-string ": " json-value ( ", " dq-string ": " json-value )* )? "}"
+json-array ::= "[" ( json-value ( ", " json-value )* )? "]"
+'''.strip()
+
+
+def tool_schema(tool: Any) -> tuple[str, dict]:
+    """Return (name, JSON schema of the arguments) for any supported tool shape."""
+    if isinstance(tool, dict):
+        if "function" in tool:
+            function = tool["function"]
+            return function["name"], function.get("parameters") or {}
+        return tool["name"], tool.get("inputSchema") or tool.get("parameters") or {}
+    return tool.name, getattr(tool, "inputSchema", None) or {}
+
+
+def _literal(text: str) -> str:
+    return '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+
+
+def _negated_class(chars: Iterable[str]) -> str:
+    """Any character except newline and `chars`."""
+    escaped = "".join("\\" + c if c in "\\]^-[" else c for c in sorted(chars))
+    return f"[^{escaped}\\n]"
+
+
+def _rule_name(text: str) -> str:
+    return re.sub(r"[^A-Za-z0-9]+", "-", text).strip("-").lower() or "x"
+
+
+def _value_rule(schema: dict) -> str:
+    """Grammar expression for one argument value."""
+    enum = schema.get("enum")
+    if enum:
+        return " | ".join(_literal(repr(v) if isinstance(v, str) else str(v).lower() if isinstance(v, bool)
+                                   else str(v)) for v in enum)
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kinds = [k for k in kind if k != "null"]
+        kind = kinds[0] if len(kinds) == 1 else None
+    return {
+        "string": "sq-string | dq-string",
+        "integer": "integer",
+        "number": "number",
+        "boolean": "boolean",
+        "object": "json-object",
+        "array": "json-array",
+    }.get(kind, "json-value")
+
+
+def _arguments_expr(rule: str, schema: dict, rules: list[str]) -> str:
+    """Expression for `key=value, ...` following the schema's property order.
+
+    Required properties must appear; optional ones may be skipped.
+    """
+    properties = list((schema.get("properties") or {}).items())
+    required = set(schema.get("required") or [])
+    if not properties:
+        return ""
+    names = []
+    for key, prop in properties:
+        name = f"{rule}-{_rule_name(key)}"
+        value = _value_rule(prop or {})
+        rules.append(f"{name} ::= {_literal(key + '=')} {f'( {value} )' if '|' in value else value}")
+        names.append(name)
+
+    def tail(start: int) -> str:
+        parts = []
+        for (key, _), name in zip(properties[start:], names[start:]):
+            parts.append(f'", " {name}' if key in required else f'( ", " {name} )?')
+        return " ".join(parts)
+
+    # The first argument written is any property up to the first required one
+    alternatives = []
+    for i, (key, _) in enumerate(properties):
+        alternatives.append(f"{names[i]} {tail(i + 1)}".strip())
+        if key in required:
+            break
+    else:
+        alternatives.append("")
+    body = " | ".join(f"( {a} )" if " " in a else a for a in alternatives if a)
+    if required:
+        return body if len(alternatives) == 1 else f"( {body} )"
+    return f"( {body} )?"
+
+
+def _exclusion_rules(prefix: str, words: Iterable[str]) -> list[str]:
+    """Rules for a line that contains none of `words` (Aho-Corasick automaton).
+
+    `<prefix>-0` is the start rule. Each state rule consumes one character
+    and moves to the next state, or ends the line.
+    """
+    goto: list[dict[str, int]] = [{}]
+    terminal = [False]
+    for word in words:
+        state = 0
+        for c in word:
+            if c not in goto[state]:
+                goto.append({})
+                terminal.append(False)
+                goto[state][c] = len(goto) - 1
+            state = goto[state][c]
+        terminal[state] = True
+
+    fail = [0] * len(goto)
+    order = list(goto[0].values())
+    for state in order:
+        for c, child in goto[state].items():
+            f = fail[state]
+            while f and c not in goto[f]:
+                f = fail[f]
+            fail[child] = goto[f].get(c, 0)
+            terminal[child] = terminal[child] or terminal[fail[child]]
+            order.append(child)
+
+    alphabet = sorted({c for word in words for c in word})
+
+    def step(state: int, c: str) -> int:
+        while state and c not in goto[state]:
+            state = fail[state]
+        return goto[state].get(c, 0)
+
+    rules = []
+    for state in range(len(goto)):
+        if terminal[state]:
+            continue
+        alternatives = []
+        restart = []
+        for c in alphabet:
+            target = step(state, c)
+            if terminal[target]:
+                continue
+            if target == 0:
+                restart.append(c)
+            else:
+                alternatives.append(f"{_literal(c)} {prefix}-{target}")
+        # Any other character (except newline) goes back to the start state
+        excluded = [c for c in alphabet if c not in restart]
+        alternatives.insert(0, f"{_negated_class(excluded)} {prefix}-0")
+        rules.append(f"{prefix}-{state} ::= ( {' | '.join(alternatives)} )?")
+    return rules
+
+
+def build_answer_grammar(reserved_words: Iterable[str] = RESERVED_WORDS) -> str:
+    """Free text that never contains a reserved protocol word."""
+    rules = ['root ::= ( line "\\n" )* line', "line ::= line-0"]
+    rules += _exclusion_rules("line", list(reserved_words))
+    return "\n".join(rules) + "\n"
+
+
+def build_tool_grammar(tools: Iterable[Any], reserved_words: Iterable[str] = RESERVED_WORDS) -> str:
+    """Free text, optionally followed by one valid call to one of `tools`."""
+    rules: list[str] = []
+    calls = []
+    for index, tool in enumerate(tools):
+        name, schema = tool_schema(tool)
+        rule = f"call-{index}-{_rule_name(name)}"
+        argument_rules: list[str] = []
+        arguments = _arguments_expr(rule, schema, argument_rules)
+        rules.append(" ".join(part for part in (f"{rule} ::=", _literal(name + "("), arguments, '")"') if part))
+        rules.extend(argument_rules)
+        calls.append(rule)
+    if not calls:
+        return build_answer_grammar(reserved_words)
+
+    header = [
+        'root ::= ( line "\\n" )* ( call | line )',
+        f'call ::= "TOOL_CALL: " ( {" | ".join(calls)} ) "\\n"?',
+        "line ::= line-0",
+    ]
+    return "\n".join(header + rules + _exclusion_rules("line", list(reserved_words)) + [_VALUE_RULES]) + "\n"
@@ -0,0 +1,186 @@
+"""Speculative tool prefetch.
+
+Story prompts often spell out the calls they need ("STEP 1: Call
+get_elf_name(count=1)", see `llm_story_with_tools.py`), yet the tool loop
+waits for a whole llamafile turn before running the tool. With prefetch on,
+the bridge looks for calls to registered tools written out in the latest
+user message and the client's system messages, starts them in parallel with
+the first llamafile call and, when the model asks for the same call (same
+name, same arguments once schema defaults are filled in), uses the
+prefetched result instead of running the tool again.
+
+Only tools that are safe to run speculatively are prefetched: tools whose
+MCP `annotations` have `readOnlyHint=True` (our own tools, so the hint can be
+trusted), or the names given as `allow`. Calls that already appear earlier
+in the conversation are not prefetched again.
+
+`stats()` reports prefetches started, hits (used by the model) and wasted
+ones (never asked for).
+"""
+import json
+import re
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+from tool_call_parser import parse_call_at, parse_tool_calls
+from tool_grammar import tool_schema
+
+# Per-request override of speculative prefetch ("1" / "0")
+PREFETCH_HEADER = "X-Tool-Prefetch"
+# Most calls prefetched for one request
+DEFAULT_MAX_PREFETCH = 3
+
+
+def is_read_only(tool: Any) -> bool:
+    """True if the tool is annotated `readOnlyHint=True`."""
+    if isinstance(tool, dict):
+        annotations = tool.get("annotations") or (tool.get("function") or {}).get("annotations")
+        return bool(annotations and annotations.get("readOnlyHint"))
+    annotations = getattr(tool, "annotations", None)
+    return bool(annotations is not None and getattr(annotations, "readOnlyHint", False))
+
+
+def _message_text(message: dict) -> str:
+    content = message.get("content")
+    if isinstance(content, list):
+        # OpenAI content parts
+        return "\n".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return content if isinstance(content, str) else ""
+
+
+class Prefetch:
+    """Speculative calls started for one request.
+
+    `run` futures are `concurrent.futures.Future`s (Flask bridge) or asyncio
+    tasks (FastAPI bridge); this class only hands them out.
+    """
+
+    def __init__(self, prefetcher: "ToolPrefetcher", calls: dict[str, tuple[str, Any]]):
+        self._prefetcher = prefetcher
+        self._calls = calls
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def pop(self, name: str, arguments: dict) -> Optional[Any]:
+        """The future of a matching prefetched call, or None (a miss)."""
+        entry = self._calls.pop(self._prefetcher.key(name, arguments), None)
+        if entry is None:
+            return None
+        self._prefetcher._record(hits=1)
+        return entry[1]
+
+    def close(self) -> None:
+        """Cancel or discard the prefetches nobody asked for."""
+        for _, future in self._calls.values():
+            future.cancel()
+            if future.done() and not future.cancelled():
+                # Retrieve the outcome so a failure is not reported as unhandled
+                future.exception()
+        self._prefetcher._record(wasted=len(self._calls))
+        self._calls = {}
+
+
+class ToolPrefetcher:
+    """Predicts tool calls from the prompt and starts them early."""
+
+    def __init__(self, tools: Iterable[Any], allow: Optional[Iterable[str]] = None,
+                 max_calls: int = DEFAULT_MAX_PREFETCH):
+        self.allow = None if allow is None else list(allow)
+        self.max_calls = max_calls
+        self._lock = threading.Lock()
+        self.started = 0
+        self.hits = 0
+        self.wasted = 0
+        self.set_tools(tools)
+
+    def set_tools(self, tools: Iterable[Any]) -> None:
+        """(Re)build the call patterns for a new tool list; counters are kept."""
+        tools = list(tools)
+        if self.allow is not None:
+            allowed = set(self.allow)
+        else:
+            allowed = {tool_schema(t)[0] for t in tools if is_read_only(t)}
+        # Schema defaults, so `f()` and `f(count=1)` match when count defaults to 1
+        defaults: dict[str, dict] = {name: {} for name in allowed}
+        for tool in tools:
+            name, schema = tool_schema(tool)
+            if name in allowed:
+                defaults[name] = {key: prop["default"] for key, prop in (schema.get("properties") or {}).items()
+                                  if isinstance(prop, dict) and "default" in prop}
+        names = sorted(allowed, key=len, reverse=True)
+        self._defaults = defaults
+        self._mention_re = re.compile(r"\b(" + "|".join(map(re.escape, names)) + r")\s*\(") if names else None
+
+    @property
+    def enabled(self) -> bool:
+        return self._mention_re is not None
+
+    def key(self, name: str, arguments: dict) -> str:
+        return json.dumps([name, {**self._defaults.get(name, {}), **arguments}], sort_keys=True, default=str)
+
+    def _record(self, started: int = 0, hits: int = 0, wasted: int = 0) -> None:
+        with self._lock:
+            self.started += started
+            self.hits += hits
+            self.wasted += wasted
+
+    def _done_keys(self, messages: list[dict]) -> set[str]:
+        """Calls the model already made earlier in the conversation."""
+        done = set()
+        for message in messages:
+            if message.get("role") != "assistant":
+                continue
+            for call in parse_tool_calls(_message_text(message)):
+                done.add(self.key(call.name, call.arguments))
+            for tool_call in message.get("tool_calls") or []:
+                function = tool_call.get("function") or {}
+                try:
+                    arguments = json.loads(function.get("arguments") or "{}")
+                except ValueError:
+                    continue
+                if isinstance(arguments, dict):
+                    done.add(self.key(function.get("name", ""), arguments))
+        return done
+
+    def predict(self, messages: list[dict]) -> list[tuple[str, dict]]:
+        """Calls written out in the latest user message and the system messages."""
+        if self._mention_re is None:
+            return []
+        texts = [_message_text(m) for m in messages if m.get("role") == "system"]
+        users = [m for m in messages if m.get("role") == "user"]
+        if users:
+            texts.append(_message_text(users[-1]))
+        seen = self._done_keys(messages)
+        calls = []
+        for text in texts:
+            for match in self._mention_re.finditer(text):
+                call = parse_call_at(text, match.start())
+                if call is None or call.name != match.group(1):
+                    continue
+                key = self.key(call.name, call.arguments)
+                if key in seen:
+                    continue
+                seen.add(key)
+                calls.append((call.name, call.arguments))
+                if len(calls) >= self.max_calls:
+                    return calls
+        return calls
+
+    def start(self, messages: list[dict], run: Callable[[str, dict], Any]) -> Optional[Prefetch]:
+        """Start the predicted calls with `run(name, arguments) -> future`."""
+        calls = self.predict(messages)
+        if not calls:
+            return None
+        self._record(started=len(calls))
+        return Prefetch(self, {self.key(name, arguments): (name, run(name, arguments)) for name, arguments in calls})
+
+    def stats(self) -> dict:
+        with self._lock:
+            finished = self.hits + self.wasted
+            return {
+                "started": self.started,
+                "hits": self.hits,
+                "wasted": self.wasted,
+                "hit_rate": round(self.hits / finished, 4) if finished else 0.0,
+            }
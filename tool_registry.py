@@ -0,0 +1,202 @@
+"""Tool registry for the Flask bridge.
+
+The bridge used to know nothing about its tools: the system prompt said
+"tools are available" without naming them, the model guessed names and
+arguments, and unknown names reached the executor. `ToolRegistry` holds the
+tool schemas (the same MCP `Tool` objects `mcp_server.create_mcp_server`
+takes, or OpenAI function dicts) and, once at startup:
+
+- renders the system prompt with every tool's signature and caches it
+  together with its token count;
+- builds the GBNF grammars used for constrained tool selection.
+
+During the loop `resolve()` checks a call's tool name before dispatch. Only
+a difference in case or separators (`GetElfName`) is accepted; anything
+else raises `UnknownToolError`, whose message suggests the closest tool and
+lists the valid ones, without ever reaching the executor. `validate()` then
+checks and coerces the arguments with a validator compiled once per tool
+(`tool_validation.py`), raising `ToolArgumentError` for what cannot be
+fixed. A registry never changes; when the tool list does, build a new one.
+"""
+import difflib
+import re
+import threading
+from typing import Any, Callable, Iterable, Optional
+
+import bridge_json
+from bridge_compaction import estimate_tokens
+from tool_grammar import build_answer_grammar, build_tool_grammar, tool_schema
+from tool_validation import ArgumentValidator, compile_validators
+
+# Minimum difflib similarity for suggesting a tool in place of an unknown name
+DEFAULT_SUGGESTION_CUTOFF = 0.6
+
+
+class UnknownToolError(Exception):
+    """Raised when a call names a tool that is not registered."""
+
+    def __init__(self, name: str, valid: list[str], suggestion: Optional[str] = None):
+        self.name = name
+        self.valid = valid
+        self.suggestion = suggestion
+        hint = f" Did you mean '{suggestion}'?" if suggestion else ""
+        listed = f"Valid tools: {', '.join(valid)}" if valid else "No tools are registered."
+        super().__init__(f"Unknown tool '{name}'.{hint} {listed}")
+
+
+def _normalized(name: str) -> str:
+    """Compare names ignoring case and separators (GetElfName == get_elf_name)."""
+    return re.sub(r"[^a-z0-9]", "", name.lower())
+
+
+def _type_label(schema: dict) -> str:
+    if schema.get("enum"):
+        return " | ".join(repr(v) for v in schema["enum"])
+    kind = schema.get("type", "any")
+    return "/".join(kind) if isinstance(kind, list) else kind
+
+
+def tool_signature(tool: Any) -> str:
+    """One prompt line for a tool, e.g. `get_elf_name(count?: integer) - Generate names`."""
+    name, schema = tool_schema(tool)
+    required = set(schema.get("required") or [])
+    params = ", ".join(
+        f"{key}{'' if key in required else '?'}: {_type_label(prop or {})}"
+        for key, prop in (schema.get("properties") or {}).items()
+    )
+    if isinstance(tool, dict):
+        description = (tool.get("function") or tool).get("description")
+    else:
+        description = getattr(tool, "description", None)
+    line = f"{name}({params})"
+    return f"{line} - {' '.join(description.split())}" if description else line
+
+
+def openai_function(tool: Any) -> dict:
+    """OpenAI function definition (`{"type": "function", ...}`) for any supported tool shape."""
+    if isinstance(tool, dict) and tool.get("type") == "function":
+        return tool
+    name, schema = tool_schema(tool)
+    description = tool.get("description") if isinstance(tool, dict) else getattr(tool, "description", None)
+    function = {"name": name, "parameters": schema or {"type": "object", "properties": {}}}
+    if description:
+        function["description"] = description
+    return {"type": "function", "function": function}
+
+
+class ToolCatalog:
+    """OpenAI function definitions of a changing tool list, converted once.
+
+    For bridges that discover their tools at runtime (`tools/list`):
+    `update()` converts a new list, serializes it and compiles the argument
+    validators; requests then reuse `functions` and `functions_json` as
+    they are until the next update.
+    """
+
+    def __init__(self, tools: Iterable[Any] = ()):
+        self._lock = threading.Lock()
+        self.tools: list[Any] = []
+        self.functions: list[dict] = []
+        self.functions_json = b"[]"
+        self.validators: dict[str, ArgumentValidator] = {}
+        self.version = 0
+        self.update(tools)
+
+    def __len__(self) -> int:
+        return len(self.functions)
+
+    def update(self, tools: Iterable[Any]) -> None:
+        tools = list(tools)
+        functions = [openai_function(t) for t in tools]
+        functions_json = bridge_json.dumps(functions)
+        validators = compile_validators(tools)
+        with self._lock:
+            # Swapped together, so a reader never pairs new definitions with old bytes
+            self.tools, self.functions, self.functions_json = tools, functions, functions_json
+            self.validators = validators
+            self.version += 1
+
+    def snapshot(self) -> tuple[list[dict], bytes]:
+        with self._lock:
+            return self.functions, self.functions_json
+
+    def validate(self, name: str, arguments: Optional[dict]) -> dict:
+        """Coerced arguments; raises ToolArgumentError. Unknown tools pass through unchanged."""
+        validator = self.validators.get(name)
+        return validator(arguments) if validator is not None else arguments
+
+    def stats(self) -> dict:
+        return {"tools": len(self.functions), "version": self.version, "bytes": len(self.functions_json)}
+
+
+class ToolRegistry:
+    """Tool schemas plus the prompt and grammars derived from them."""
+
+    def __init__(self, tools: Iterable[Any], executor: Optional[Callable[[str, dict], Any]] = None,
+                 count_tokens: Callable[[str], int] = estimate_tokens,
+                 suggestion_cutoff: float = DEFAULT_SUGGESTION_CUTOFF):
+        self.tools = list(tools)
+        self.executor = executor
+        self.count_tokens = count_tokens
+        self.suggestion_cutoff = suggestion_cutoff
+        self.names = [tool_schema(t)[0] for t in self.tools]
+        self._names = set(self.names)
+        self._by_normalized = {_normalized(n): n for n in self.names}
+        self.signatures = [tool_signature(t) for t in self.tools]
+        self.validators = compile_validators(self.tools)
+        self.call_grammar = build_tool_grammar(self.tools) if self.tools else None
+        self.answer_grammar = build_answer_grammar() if self.tools else None
+        self.system_prompt: Optional[str] = None
+        self.system_prompt_tokens = 0
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._names
+
+    def render_system_prompt(self, template: Callable[[Optional[list[str]]], str]) -> str:
+        """Render the system prompt once with `template(signatures)` and cache it."""
+        if self.system_prompt is None:
+            self.system_prompt = template(self.signatures or None)
+            self.system_prompt_tokens = self.count_tokens(self.system_prompt)
+        return self.system_prompt
+
+    def prompt_token_counter(self) -> Callable[[str], int]:
+        """`count_tokens` that reuses the cached count for the system prompt."""
+        def count(text: str) -> int:
+            if text is self.system_prompt:
+                return self.system_prompt_tokens
+            return self.count_tokens(text)
+        return count
+
+    def resolve(self, name: str) -> str:
+        """Return the registered name for `name`, ignoring case and separators.
+
+        Any other name raises UnknownToolError, with the closest registered
+        tool as a suggestion for the model; it is never called in its place.
+        An empty registry rejects every name.
+        """
+        if name in self._names:
+            return name
+        normalized = _normalized(name)
+        if normalized in self._by_normalized:
+            return self._by_normalized[normalized]
+        matches = difflib.get_close_matches(normalized, list(self._by_normalized), n=1,
+                                            cutoff=self.suggestion_cutoff)
+        raise UnknownToolError(name, self.names, self._by_normalized[matches[0]] if matches else None)
+
+    def validate(self, name: str, arguments: Optional[dict]) -> dict:
+        """Arguments of a call to `name` (a resolved name), checked and coerced.
+
+        Raises ToolArgumentError when they cannot be made to fit the schema.
+        """
+        validator = self.validators.get(name)
+        return validator(arguments) if validator is not None else arguments
+
+    def stats(self) -> dict:
+        return {
+            "tools": list(self.names),
+            "system_prompt_tokens": self.system_prompt_tokens,
+            "grammar": self.call_grammar is not None,
+        }
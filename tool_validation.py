@@ -0,0 +1,375 @@
+"""Precompiled validation and coercion of tool arguments.
+
+Models often get arguments almost right: `{"count": "2"}` for an integer,
+`"True"` for a boolean, a misspelled or invented key. Unchecked, these
+reach the handler, fail there, and cost a whole extra LLM iteration to
+recover from an unhelpful traceback. `compile_validator(tool)` turns a
+tool's `inputSchema` into a chain of small coercion functions once, at
+registration, so that each call only runs the checks its schema needs:
+
+- values are coerced where the intent is unambiguous ("2" -> 2, 2.0 -> 2,
+  "true" -> True, 3 -> "3", a JSON string for an array or object, a
+  case-insensitive enum match); `null` for an optional argument counts as
+  omitted;
+- schema defaults are filled in, so `get_elf_name()` and
+  `get_elf_name(count=1)` reach the handler (and caches) identically;
+- when a tool declares `properties`, other keys are rejected unless the
+  schema sets `additionalProperties`; a schema without `properties`
+  accepts anything;
+- `enum`, `minimum`/`maximum`, `minLength`/`maxLength`, `pattern`,
+  `minItems`/`maxItems` and nested `items`/`properties` are checked.
+
+What cannot be coerced raises `ToolArgumentError`, whose message names
+each bad argument, what was expected and the tool's argument list, so the
+model can correct the call in its next turn; `to_dict()` is the same
+information as structured data.
+"""
+import difflib
+import json
+import math
+import re
+from typing import Any, Callable, Optional
+
+from tool_grammar import tool_schema
+
+Coercer = Callable[[Any], Any]
+
+
+class ToolArgumentError(ValueError):
+    """A call's arguments do not match the tool's input schema."""
+
+    def __init__(self, tool: str, problems: list[dict], expected: str = ""):
+        self.tool = tool
+        self.problems = problems
+        self.expected = expected
+        details = "; ".join(f"{p['argument']}: {p['error']}" if p.get("argument") else p["error"]
+                            for p in problems)
+        message = f"Invalid arguments for '{tool}': {details}."
+        if expected:
+            message += f" Arguments: {expected}."
+        super().__init__(message)
+
+    def to_dict(self) -> dict:
+        return {"error": "invalid_arguments", "tool": self.tool, "problems": self.problems,
+                "expected": self.expected}
+
+
+class _Invalid(Exception):
+    """One value failed its schema (the message says why)."""
+
+
+def _show(value: Any) -> str:
+    text = json.dumps(value, ensure_ascii=False, default=str)
+    return text if len(text) <= 40 else text[:37] + "..."
+
+
+def _type_names(schema: dict) -> list[str]:
+    kind = schema.get("type")
+    if kind is None:
+        return []
+    return list(kind) if isinstance(kind, list) else [kind]
+
+
+def _label(schema: dict) -> str:
+    if schema.get("enum"):
+        return " | ".join(_show(v) for v in schema["enum"])
+    return "/".join(_type_names(schema)) or "any"
+
+
+def _parse_json(value: str, kind: type) -> Any:
+    try:
+        parsed = json.loads(value)
+    except ValueError:
+        raise _Invalid(f"expected {'array' if kind is list else 'object'}, got {_show(value)}") from None
+    if not isinstance(parsed, kind):
+        raise _Invalid(f"expected {'array' if kind is list else 'object'}, got {_show(value)}")
+    return parsed
+
+
+def _to_integer(value: Any) -> int:
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            try:
+                number = float(text)
+            except ValueError:
+                number = math.nan
+            if number.is_integer():
+                return int(number)
+    raise _Invalid(f"expected integer, got {_show(value)}")
+
+
+def _to_number(value: Any) -> float:
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        text = value.strip()
+        try:
+            return int(text)
+        except ValueError:
+            try:
+                number = float(text)
+                if math.isfinite(number):
+                    return number
+            except ValueError:
+                pass
+    raise _Invalid(f"expected number, got {_show(value)}")
+
+
+_TRUE = frozenset({"true", "yes", "on", "1"})
+_FALSE = frozenset({"false", "no", "off", "0"})
+
+
+def _to_boolean(value: Any) -> bool:
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        text = value.strip().lower()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+    if isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    raise _Invalid(f"expected boolean, got {_show(value)}")
+
+
+def _to_string(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    raise _Invalid(f"expected string, got {_show(value)}")
+
+
+def _to_array(value: Any) -> list:
+    if isinstance(value, list):
+        return value
+    if isinstance(value, tuple):
+        return list(value)
+    if isinstance(value, str):
+        return _parse_json(value, list)
+    raise _Invalid(f"expected array, got {_show(value)}")
+
+
+def _to_object(value: Any) -> dict:
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        return _parse_json(value, dict)
+    raise _Invalid(f"expected object, got {_show(value)}")
+
+
+def _to_null(value: Any) -> None:
+    if value is None:
+        return None
+    raise _Invalid(f"expected null, got {_show(value)}")
+
+
+_BASE = {"integer": _to_integer, "number": _to_number, "boolean": _to_boolean, "string": _to_string,
+         "array": _to_array, "object": _to_object, "null": _to_null}
+
+
+def _typed(names: list[str]) -> Optional[Coercer]:
+    coercers = [_BASE[name] for name in names if name in _BASE]
+    if not coercers:
+        return None
+    if len(coercers) == 1:
+        return coercers[0]
+    label = "/".join(names)
+
+    def any_of(value: Any) -> Any:
+        # Prefer a type the value already has, then the first that coerces
+        for coerce in coercers:
+            try:
+                result = coerce(value)
+            except _Invalid:
+                continue
+            if type(result) is type(value):
+                return result
+        for coerce in coercers:
+            try:
+                return coerce(value)
+            except _Invalid:
+                continue
+        raise _Invalid(f"expected {label}, got {_show(value)}")
+    return any_of
+
+
+def _enum(values: list) -> Coercer:
+    allowed = list(values)
+    by_folded = {v.casefold(): v for v in allowed if isinstance(v, str)}
+    label = " | ".join(_show(v) for v in allowed)
+
+    def check(value: Any) -> Any:
+        if value in allowed and not (isinstance(value, bool) and not any(isinstance(v, bool) for v in allowed)):
+            return value
+        if isinstance(value, str) and value.strip().casefold() in by_folded:
+            return by_folded[value.strip().casefold()]
+        raise _Invalid(f"expected one of {label}, got {_show(value)}")
+    return check
+
+
+def _bounds(schema: dict) -> list[Callable[[Any], None]]:
+    """Checks for numeric, string and array limits (only those the schema sets)."""
+    checks = []
+    for key, fails, text in (
+        ("minimum", lambda v, b: v < b, "at least"),
+        ("maximum", lambda v, b: v > b, "at most"),
+        ("exclusiveMinimum", lambda v, b: v <= b, "greater than"),
+        ("exclusiveMaximum", lambda v, b: v >= b, "less than"),
+    ):
+        bound = schema.get(key)
+        if isinstance(bound, (int, float)) and not isinstance(bound, bool):
+            def check(value, bound=bound, fails=fails, text=text):
+                if isinstance(value, (int, float)) and fails(value, bound):
+                    raise _Invalid(f"must be {text} {bound}, got {_show(value)}")
+            checks.append(check)
+    for key, fails, text, kind in (
+        ("minLength", lambda n, b: n < b, "at least", str),
+        ("maxLength", lambda n, b: n > b, "at most", str),
+        ("minItems", lambda n, b: n < b, "at least", list),
+        ("maxItems", lambda n, b: n > b, "at most", list),
+    ):
+        bound = schema.get(key)
+        if isinstance(bound, int):
+            unit = "characters" if kind is str else "items"
+
+            def check(value, bound=bound, fails=fails, text=text, kind=kind, unit=unit):
+                if isinstance(value, kind) and fails(len(value), bound):
+                    raise _Invalid(f"must have {text} {bound} {unit}, got {len(value)}")
+            checks.append(check)
+    pattern = schema.get("pattern")
+    if isinstance(pattern, str):
+        compiled = re.compile(pattern)
+
+        def check(value):
+            if isinstance(value, str) and not compiled.search(value):
+                raise _Invalid(f"must match /{pattern}/, got {_show(value)}")
+        checks.append(check)
+    return checks
+
+
+def _compile(schema: Any) -> Coercer:
+    """One coercion function for a property schema."""
+    if not isinstance(schema, dict):
+        return lambda value: value
+    steps: list[Coercer] = []
+    names = _type_names(schema)
+    typed = _typed(names)
+    if typed is not None:
+        steps.append(typed)
+    if schema.get("enum"):
+        steps.append(_enum(schema["enum"]))
+    if "array" in names and isinstance(schema.get("items"), dict):
+        item = _compile(schema["items"])
+
+        def items(value):
+            if not isinstance(value, list):
+                return value
+            out = []
+            for i, element in enumerate(value):
+                try:
+                    out.append(item(element))
+                except _Invalid as e:
+                    raise _Invalid(f"item {i}: {e}") from None
+            return out
+        steps.append(items)
+    if "object" in names and isinstance(schema.get("properties"), dict):
+        nested = ArgumentValidator("", schema)
+
+        def fields(value):
+            if not isinstance(value, dict):
+                return value
+            try:
+                return nested(value)
+            except ToolArgumentError as e:
+                raise _Invalid("; ".join(f"{p['argument']}: {p['error']}" for p in e.problems)) from None
+        steps.append(fields)
+    for check in _bounds(schema):
+        def bounded(value, check=check):
+            check(value)
+            return value
+        steps.append(bounded)
+    if not steps:
+        return lambda value: value
+    if len(steps) == 1:
+        return steps[0]
+
+    def chain(value):
+        for step in steps:
+            value = step(value)
+        return value
+    return chain
+
+
+class ArgumentValidator:
+    """Compiled validator for one tool: `validator(arguments) -> coerced arguments`."""
+
+    def __init__(self, tool: str, schema: dict):
+        self.tool = tool
+        properties = schema.get("properties") or {}
+        self.coercers = {key: _compile(prop) for key, prop in properties.items()}
+        self.required = tuple(key for key in schema.get("required") or () if key in properties)
+        self.defaults = {key: prop["default"] for key, prop in properties.items()
+                         if isinstance(prop, dict) and "default" in prop}
+        extra = schema.get("additionalProperties", False)
+        self.open = not properties or extra is True or isinstance(extra, dict)
+        self.expected = ", ".join(
+            f"{key}{'' if key in self.required else '?'}: {_label(prop if isinstance(prop, dict) else {})}"
+            for key, prop in properties.items())
+
+    def _unknown(self, key: str) -> dict:
+        error = "unknown argument"
+        matches = difflib.get_close_matches(key, list(self.coercers), n=1, cutoff=0.6)
+        if matches:
+            error += f" (did you mean '{matches[0]}'?)"
+        return {"argument": key, "error": error}
+
+    def __call__(self, arguments: Optional[dict]) -> dict:
+        if arguments is None:
+            arguments = {}
+        elif not isinstance(arguments, dict):
+            raise ToolArgumentError(self.tool, [{"argument": None, "error": "arguments must be a JSON object, "
+                                                 f"got {_show(arguments)}"}], self.expected)
+        result = {}
+        problems = []
+        for key, value in arguments.items():
+            coerce = self.coercers.get(key)
+            if coerce is None:
+                if self.open:
+                    result[key] = value
+                else:
+                    problems.append(self._unknown(key))
+                continue
+            if value is None and key not in self.required:
+                continue  # null for an optional argument: treat as omitted
+            try:
+                result[key] = coerce(value)
+            except _Invalid as e:
+                problems.append({"argument": key, "error": str(e)})
+        for key in self.required:
+            if key not in result and not any(p["argument"] == key for p in problems):
+                problems.append({"argument": key, "error": "required argument is missing"})
+        if problems:
+            raise ToolArgumentError(self.tool, problems, self.expected)
+        for key, default in self.defaults.items():
+            if key not in result:
+                result[key] = default
+        return result
+
+
+def compile_validator(tool: Any) -> ArgumentValidator:
+    """Validator for an MCP `Tool`, OpenAI function dict or `{"name", "inputSchema"}` dict."""
+    name, schema = tool_schema(tool)
+    return ArgumentValidator(name, schema if isinstance(schema, dict) else {})
+
+
+def compile_validators(tools: Any) -> dict[str, ArgumentValidator]:
+    return {validator.tool: validator for validator in map(compile_validator, tools)}